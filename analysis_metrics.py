@@ -0,0 +1,125 @@
+import os
+import glob
+import gzip
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Trajanje svake faze analize kao JSON red (JSON-lines) u fajlu pored log fajla sesije:
+# <log>.metrics.jsonl. Log sesije se prazni posle svake analize, metrike ostaju za pregled.
+METRICS_SUFFIX = ".metrics.jsonl"
+# upload-i na Google Drive idu iz pozadinske niti, van sesije, pa imaju svoj fajl
+OUTBOX_METRICS_NAME = "outbox" + METRICS_SUFFIX
+
+_lock = threading.Lock()
+
+
+def metrics_path_for_log(log_path):
+    root, _ = os.path.splitext(log_path)
+    return root + METRICS_SUFFIX
+
+
+def write(path, record):
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+class AnalysisMetrics:
+    """Merenje faza jedne analize; svaka faza se odmah upisuje kao jedan JSON red."""
+
+    def __init__(self, path, analysis_id, user, logger=None, **fields):
+        self.path = path
+        self.analysis_id = analysis_id
+        self.user = user
+        self.logger = logger
+        self.fields = fields
+
+    def emit(self, stage, duration_s, **fields):
+        record = {
+            'ts': time.time(),
+            'analysis': self.analysis_id,
+            'user': self.user,
+            'stage': stage,
+            'ms': round(duration_s * 1000, 1),
+            **self.fields,
+            **fields,
+        }
+        try:
+            write(self.path, record)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Metrika faze '{stage}' nije upisana: {e}")
+        if self.logger:
+            self.logger.info(f"Faza {stage}: {record['ms']:.0f} ms")
+        return record
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """with metrics.span('parse') as extra: ... ; u extra se mogu dodati polja (npr. tokeni).
+        Faza se upisuje i kad blok baci izuzetak, sa poljem error."""
+        extra = dict(fields)
+        started = time.perf_counter()
+        try:
+            yield extra
+        except Exception as e:
+            extra['error'] = type(e).__name__
+            raise
+        finally:
+            self.emit(stage, time.perf_counter() - started, **extra)
+
+
+def read(log_dir, since=None):
+    """Svi zapisi iz *.metrics.jsonl u log_dir (opciono samo noviji od since, unix vreme).
+    Čitaju se i arhivirani (komprimovani) fajlovi, *.metrics.jsonl.gz (artifact_store)."""
+    records = []
+    paths = glob.glob(os.path.join(log_dir, "*" + METRICS_SUFFIX)) + glob.glob(os.path.join(log_dir, "*" + METRICS_SUFFIX + ".gz"))
+    for path in paths:
+        if since and os.path.getmtime(path) < since:
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # red upisan do pola (npr. prekid procesa)
+                    continue
+                if not since or record.get('ts', 0) >= since:
+                    records.append(record)
+    return pd.DataFrame(records)
+
+
+def stage_summary(records, last_analyses=200):
+    """p50/p95 trajanja po fazi za poslednjih last_analyses analiza."""
+    if records.empty:
+        return pd.DataFrame(columns=['faza', 'broj', 'p50_ms', 'p95_ms', 'max_ms'])
+    if 'analysis' in records and records['analysis'].notna().any():
+        recent = (records.dropna(subset=['analysis']).groupby('analysis')['ts'].max()
+                  .sort_values().tail(last_analyses).index)
+        records = records[records['analysis'].isin(recent) | records['analysis'].isna()]
+    grouped = records.groupby('stage')['ms']
+    summary = pd.DataFrame({
+        'broj': grouped.count(),
+        'p50_ms': grouped.quantile(0.5),
+        'p95_ms': grouped.quantile(0.95),
+        'max_ms': grouped.max(),
+    }).round(0)
+    return summary.sort_values('p95_ms', ascending=False).rename_axis('faza').reset_index()
+
+
+def token_summary(records):
+    """Tokeni po nivou rizika za LLM faze bez pogotka keša komentara."""
+    if records.empty or 'tier' not in records:
+        return pd.DataFrame()
+    llm = records[records['stage'] == 'llm']
+    if 'from_cache' in llm:
+        llm = llm[llm['from_cache'] != True]
+    columns = [c for c in ('input_tokens', 'cached_tokens', 'output_tokens', 'reasoning_tokens', 'ms') if c in llm]
+    if llm.empty or not columns:
+        return pd.DataFrame()
+    return llm.groupby('tier')[columns].median().round(0)
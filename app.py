@@ -1,30 +1,55 @@
 import os
-import sys
-import shutil
 from datetime import datetime
 from pathlib import Path
 import pandas as pd
-import json
 import hashlib
 import uuid
+import time
+import sqlite3
 
 import streamlit as st
-import logging
 
-from openai import OpenAI
 from openai import OpenAIError
 
-from excel_processor import to_JSON, generate_AIcomment
-from google_drive_utils import upload_drive, google_drive_auth
+from excel_processor import to_JSON_cached
+from model_routing import generate_routed, classify, policy_version
+from prompts import build_prompt, build_delta_prompt, PROMPT_VERSION
+import client_delta
+import job_runner
+import upload_outbox
+import analysis_metrics
+import artifact_store
+import session_logging
+import portfolio_index
+import risk_metrics
+from analysis_metrics import AnalysisMetrics
+from llm_client import CircuitOpenError
 
 
 
 LOCAL_OUTPUT_BASE_DIR = "output"
 LOG_PATH = os.path.join(LOCAL_OUTPUT_BASE_DIR, "app.log")
 LOG_DIR = os.path.join('.', LOCAL_OUTPUT_BASE_DIR, 'logs')
+# uploadovani fajl ostaje u memoriji (parser i Drive ga čitaju iz bafera); na disk ide samo
+# jednom, u red za upload. IN_MEMORY_UPLOAD=0 vraća stari način preko temp_uploaded_files/.
+IN_MEMORY_UPLOAD = os.getenv("IN_MEMORY_UPLOAD", "1") != "0"
+# ponovna analiza klijenta šalje modelu samo promene u odnosu na poslednju sačuvanu (client_delta);
+# DELTA_MODE=0 uvek radi punu analizu
+DELTA_MODE = os.getenv("DELTA_MODE", "1") != "0"
+TEMP_UPLOAD_DIR = 'temp_uploaded_files'
+UPLOAD_MAX_BYTES = 500 * 1024 * 1024
+UPLOAD_MAX_AGE_SECONDS = 7 * 24 * 3600
 os.makedirs(LOCAL_OUTPUT_BASE_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
 API_KEY = st.secrets["api_keys"]["openai"]
+# nit koja šalje red za upload na Google Drive (i zaostale fajlove iz prethodnog pokretanja)
+upload_outbox.start_shipper()
+# JSON-i, komentari, logovi i uploadovani fajlovi: kvota, starost, kompresija arhive (artifact_store)
+artifacts = artifact_store.get_store(LOCAL_OUTPUT_BASE_DIR, dirs=('json', 'komentari', 'logs'))
+upload_artifacts = artifact_store.get_store(TEMP_UPLOAD_DIR, max_bytes=UPLOAD_MAX_BYTES, max_age_seconds=UPLOAD_MAX_AGE_SECONDS)
+artifact_store.start_compactor()
+# indeks portfolija (SQLite): analize sačuvane pre uvođenja indeksa se dodaju jednom, u pozadini
+portfolio_index.start_backfill(artifacts)
 
 def hesiraj_lozinku(lozinka: str) -> str:
     # Pretvaramo lozinku u bajtove
@@ -67,6 +92,180 @@ def check_password():
             st.warning("Molimo unesite šifru.")
     return False
 
+
+# upload na Google Drive nije faza analize: fajlovi idu u red (upload_outbox) koji se šalje u pozadini
+ANALYSIS_STAGES = ['parse', 'ai_comment', 'save']
+BATCH_DONE_LABELS = {
+    'unchanged': "Bez bitnih promena (prethodni komentar)",
+    'delta': "Završeno (samo promene)",
+}
+STAGE_LABELS = {
+    'parse': "Čitanje Excel fajla...",
+    'ai_comment': "Generisanje AI komentara...",
+    'save': "Čuvanje rezultata...",
+}
+
+
+def load_previous_analysis(client_json, client_name, logger):
+    """Poslednji sačuvani JSON i komentar klijenta (nađeni preko indeksa portfolija) ili None."""
+    try:
+        found = client_delta.find_previous(artifacts, client_json, client_name)
+    except sqlite3.Error as e:
+        logger.warning(f"Prethodna analiza klijenta {client_name} nije tražena (indeks portfolija): {e}")
+        return None
+    if not found:
+        return None
+    try:
+        return {'json': artifacts.read_json(found['json_name']), 'comment': artifacts.read_text(found['comment_name']),
+                'timestamp': found['analizirano'], 'index_row': found}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Prethodna analiza klijenta {client_name} nije pročitana: {e}")
+        return None
+
+
+def run_analysis(job, excel_file_path, user, timestamp, drive_folder_id, regenerate, upload_input, logger, metrics_path,
+                 excel_file_data=None):
+    """Ceo tok analize; izvršava se u pozadinskoj niti (job_runner), bez pristupa st.session_state.
+    Sa excel_file_data (bytes) fajl se ne čita sa diska, a excel_file_path daje samo ime."""
+    analysis_started = time.perf_counter()
+    warnings = []
+    uploads = []
+    client_name = os.path.basename(excel_file_path).split("_")[3]
+    # svaka faza se meri i upisuje kao JSON red pored log fajla sesije (analysis_metrics)
+    metrics = AnalysisMetrics(metrics_path, f"{timestamp}_{user}", user, logger, job=job.id, regenerate=regenerate)
+    metrics.emit('queue', max(0.0, time.time() - job.created))
+
+    if upload_input:
+        with metrics.span('enqueue_input'):
+            if excel_file_data is not None:
+                uploads.append(upload_outbox.enqueue_data(excel_file_path, excel_file_data, drive_folder_id))
+            else:
+                uploads.append(upload_outbox.enqueue(excel_file_path, drive_folder_id))
+
+    job.start_stage('parse')
+    logger.info(f"Pokrenuta analiza za klijenta: {client_name}, fajl: {excel_file_path}")
+
+    file_bytes = len(excel_file_data) if excel_file_data is not None else os.path.getsize(excel_file_path)
+    with metrics.span('parse', file_bytes=file_bytes, in_memory=excel_file_data is not None):
+        json_content_for_ai = to_JSON_cached(excel_file_path, logger, executor=job_runner.parse_pool(), data=excel_file_data)
+    logger.info("JSON sadržaj uspešno generisan.")
+
+    try:
+        client_name_from_json = json_content_for_ai['osnovne_informacije'][1]['Vrednost']
+        if isinstance(client_name_from_json, list) and client_name_from_json: # If Naziv Kupca is a list
+            client_name_from_json = client_name_from_json[0]
+        elif not isinstance(client_name_from_json, str) : # if it's not a string (e.g. NaN)
+            client_name_from_json = client_name # fallback to filename derived
+    except:
+        client_name_from_json = client_name # fallback
+
+    # ponovna analiza: poređenje sa poslednjom sačuvanom analizom istog klijenta
+    analyzed_at = datetime.strptime(timestamp[:19], "%Y-%m-%d_%H-%M-%S")
+    routing_policy = policy_version()
+    delta_mode, changes, previous, stale = 'full', None, None, []
+    if DELTA_MODE and not regenerate:
+        with metrics.span('delta') as span:
+            previous = load_previous_analysis(json_content_for_ai, client_name_from_json, logger)
+            if previous:
+                changes = client_delta.diff(previous['json'], json_content_for_ai)
+                # komentar zavisi i od verzije prompta, politike modela i DTS ocene na dan analize
+                stale = client_delta.stale(previous['index_row'], previous['json'], json_content_for_ai,
+                                           PROMPT_VERSION, routing_policy, analyzed_at)
+                delta_mode = client_delta.mode(changes, stale)
+                span.update(changes=changes['ukupno_promena'], sections=len(changes['sekcije']), stale=stale)
+            span['mode'] = delta_mode
+        if previous:
+            logger.info(f"Prethodna analiza klijenta od {previous['timestamp']}: promenjene sekcije "
+                        f"{', '.join(changes['sekcije']) or '-'} ({changes['ukupno_promena']} promena), "
+                        f"promenjeno i: {', '.join(stale) or '-'}, režim {delta_mode}")
+
+    # statični prefiks prompta je isti za sve klijente (OpenAI prompt keš), podaci klijenta idu na kraj
+    prompt_version = PROMPT_VERSION
+    if delta_mode != 'unchanged':
+        with metrics.span('prompt', mode=delta_mode) as span:
+            if delta_mode == 'delta':
+                prompt_text = build_delta_prompt(
+                    client_name_from_json, json_content_for_ai, changes,
+                    client_delta.changed_sections(json_content_for_ai, changes),
+                    previous['comment'], previous['timestamp'], logger=logger
+                )
+                # komentar zavisi i od prethodne analize, ne samo od novog JSON-a (ključ keša)
+                prompt_version = f"{PROMPT_VERSION}+delta-{client_delta.fingerprint(previous['json'], previous['comment'])}"
+            else:
+                prompt_text = build_prompt(client_name_from_json, json_content_for_ai, logger=logger)
+            span['prompt_chars'] = len(prompt_text)
+
+    job.start_stage('ai_comment')
+    # komentar se strimuje u job.partial_text; UI ga prikazuje dok stiže
+    ttfo = None
+
+    def show_delta(delta):
+        nonlocal ttfo
+        if ttfo is None:
+            ttfo = time.perf_counter() - analysis_started
+            logger.info(f"Vreme do prvog prikaza AI komentara: {ttfo:.2f} s")
+        job.partial_text += delta
+
+    if delta_mode == 'unchanged':
+        # nema bitnih promena: prethodni komentar i dalje važi, LLM se ne poziva
+        ai_comment, from_cache = previous['comment'], False
+        usage = {'tier': classify(json_content_for_ai)[0]}
+        show_delta(ai_comment)
+        logger.info(f"Nema bitnih promena u odnosu na analizu od {previous['timestamp']}; koristi se prethodni AI komentar.")
+    else:
+        # model i reasoning effort zavise od nivoa rizika klijenta (model_routing)
+        with metrics.span('llm', mode=delta_mode) as span:
+            usage = {}
+            ai_comment, from_cache = generate_routed(
+                prompt_text, API_KEY, json_content_for_ai, prompt_version,
+                regenerate=regenerate, logger=logger, on_delta=show_delta, usage=usage
+            )
+            span.update(usage, from_cache=from_cache, ttfo_ms=round(ttfo * 1000, 1) if ttfo is not None else None)
+        logger.info(f"Ukupno vreme generisanja AI komentara: {time.perf_counter() - analysis_started:.2f} s")
+        logger.info("AI komentar uspešno generisan.")
+
+    job.start_stage('save')
+    with metrics.span('save'):
+        ai_comment_local_file = artifacts.write_text(
+            f"komentari/{client_name}/{timestamp}_{user}_{client_name_from_json}_ai_comment.txt", ai_comment)
+        json_output_path = artifacts.write_json(
+            f"json/{timestamp}_{user}_{client_name_from_json}_data_for_ai.json", json_content_for_ai, indent=4)
+
+    # red u indeksu portfolija; greška u indeksu ne obara analizu (backfill ga dopunjuje kasnije)
+    with metrics.span('index'):
+        try:
+            portfolio_index.record_analysis(
+                json_content_for_ai, artifacts.name_for(json_output_path), artifacts.name_for(ai_comment_local_file),
+                user, client_name_from_json, analyzed_at=analyzed_at, tier=usage.get('tier'),
+                mode=delta_mode if previous else None, prompt_version=PROMPT_VERSION, policy_version=routing_policy,
+            )
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Analiza nije upisana u indeks portfolija: {e}")
+
+    # --- Upload JSON i AI komentar na Google Drive (u pozadini) ---
+    with metrics.span('enqueue_outputs'):
+        uploads.append(upload_outbox.enqueue(json_output_path, drive_folder_id))
+        uploads.append(upload_outbox.enqueue(ai_comment_local_file, drive_folder_id))
+    logger.info("JSON i AI komentar dodati u red za upload na Google Drive.")
+
+    logger.info(f"TXT uspešno generisan: {ai_comment_local_file}")
+    metrics.emit('total', time.perf_counter() - analysis_started)
+
+    return {
+        'client_name': client_name_from_json,
+        'json_content_for_display': json_content_for_ai,
+        'ai_comment': ai_comment,
+        'ai_comment_path': ai_comment_local_file,
+        'ai_comment_from_cache': from_cache,
+        'risk_tier': usage.get('tier'),
+        'delta_mode': delta_mode if previous else None,
+        'delta_sections': changes['sekcije'] if changes else [],
+        'previous_timestamp': previous['timestamp'] if previous else None,
+        'ttfo': ttfo,
+        'warnings': warnings,
+        'uploads': uploads,
+    }
+
 # --- GLAVNI DEO APLIKACIJE ---
 
 if "authenticated" not in st.session_state:
@@ -81,36 +280,14 @@ else:
     # --- LOGGING SETTINGS ---
 
     def initialize_logger(user_name: str):
+        # zapisi idu kroz red u pozadinsku nit (session_logging); na stdout za Streamlit Cloud
+        # logove i u lokalni log fajl koji se šalje na Google Drive
+        logfile = st.session_state['log_path']
+        logger = session_logging.get_session_logger(logfile)
+        artifacts.add(artifacts.name_for(logfile))
 
-        #session_id = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        logger_name = f"FinAiApp_{timestamp}"
-        logger = logging.getLogger(logger_name)
-        logger.setLevel(logging.INFO)
-        logger.propagate = False
-
-        if not logger.handlers:
-            #logger.setLevel(logging.INFO)
-            #logger.propagate = False
-
-            log_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-
-            # Stream handler za prikaz u Streamlit Cloud logovima
-            stream_handler = logging.StreamHandler(sys.stdout)
-            stream_handler.setFormatter(log_formatter)
-            logger.addHandler(stream_handler)
-
-            # File handler za lokalni log koji ćeš slati na Google Drive
-            #logfile = os.path.join(LOG_DIR, f"{timestamp}_{user_name}_{session_id}.log")
-            logfile = st.session_state['log_path']
-            file_handler = logging.FileHandler(logfile, encoding="utf-8")
-            file_handler.setFormatter(log_formatter)
-            logger.addHandler(file_handler)
-
-            st.session_state['log_path'] = logfile
-
-            logger.info("--- Aplikacija pokrenuta ---")
-            logger.info("--- Logger inicijalizovan ---")
+        logger.info("--- Aplikacija pokrenuta ---")
+        logger.info("--- Logger inicijalizovan ---")
 
         return logger
 
@@ -129,16 +306,216 @@ else:
         st.session_state['pdf_path'] = ''
         st.session_state['client_name'] = ''
         st.session_state['uploaded_file_path'] = ''
+        st.session_state['uploaded_file_data'] = None
         st.session_state['original_file_name'] = ''
         st.session_state['json_content_for_display'] = ''
         st.session_state['timestamp'] = ''
         st.session_state['log_uploaded'] = False
         st.session_state['file_error'] =''
         st.session_state['openai_error']=''
-        st.session_state['upload_in_progress'] = False
         st.session_state['analysis_no'] = 0
+        st.session_state['ai_comment_from_cache'] = False
+        st.session_state['ttfo'] = None
+        st.session_state['warnings'] = []
+        st.session_state['job_id'] = ''
+        st.session_state['uploads'] = []
+        st.session_state['submitted_at'] = None
+        # upload više fajlova: jedan zapis po fajlu (ime, putanja, timestamp, ID posla)
+        st.session_state['batch'] = []
         logger.info("Session state inicijalizovan. Aplikacija čeka fajl.")
 
+        # posle osvežavanja stranice nastavlja se praćenje posla koji je još u pozadini
+        pending_job = job_runner.active_job_for_user(st.session_state['user'])
+        if pending_job:
+            st.session_state['job_id'] = pending_job.id
+            st.session_state['uploaded_file_path'] = pending_job.params['excel_file_path']
+            st.session_state['uploaded_file_data'] = pending_job.params.get('excel_file_data')
+            st.session_state['original_file_name'] = pending_job.params['original_file_name']
+            st.session_state['timestamp'] = pending_job.params['timestamp']
+            st.session_state['current_stage'] = 'analysis_in_progress'
+            logger.info(f"Nastavljeno praćenje posla {pending_job.id} u pozadini.")
+
+        batch_jobs = job_runner.batch_jobs_for_user(st.session_state['user'])
+        if not pending_job and batch_jobs:
+            st.session_state['batch'] = [
+                {'file_name': j.params['original_file_name'], 'path': j.params['excel_file_path'], 'data': None,
+                 'timestamp': j.params['timestamp'], 'job_id': j.id}
+                for j in batch_jobs
+            ]
+            st.session_state['current_stage'] = 'batch_in_progress'
+            logger.info(f"Nastavljeno praćenje grupe od {len(batch_jobs)} analiza u pozadini.")
+
+    metrics_path = analysis_metrics.metrics_path_for_log(st.session_state['log_path'])
+
+    def session_metrics(timestamp=None):
+        return AnalysisMetrics(metrics_path, f"{timestamp or st.session_state['timestamp']}_{st.session_state['user']}",
+                               st.session_state['user'], logger)
+
+    def store_upload(uploaded_file, timestamp):
+        """(putanja, sadržaj) uploadovanog fajla; sa IN_MEMORY_UPLOAD sadržaj ostaje u memoriji,
+        inače se fajl upisuje u temp_uploaded_files/ i sadržaj je None."""
+        temp_file_name = timestamp + '_' + st.session_state['user'] + '_' + uploaded_file.name
+        with session_metrics(timestamp).span('upload', file_bytes=uploaded_file.size, in_memory=IN_MEMORY_UPLOAD):
+            if IN_MEMORY_UPLOAD:
+                # putanja služi samo kao ime (klijent, ime na Drive-u); fajl se ne upisuje
+                return upload_artifacts.path(temp_file_name), uploaded_file.getvalue()
+            return upload_artifacts.write_bytes(temp_file_name, uploaded_file.getbuffer()), None
+
+    def ship_session_log():
+        """Log sesije do ove analize se odvaja i šalje u pozadini, zajedno sa logovima drugih sesija."""
+        try:
+            drive_folder_id = st.secrets["google_drive_folder"]["folder_id"]
+        except KeyError:
+            st.error("Nije pronađen ID Google Drive foldera u secrets.toml!")
+            return
+        pom = Path(st.session_state['log_path'])
+        log_segment_path = pom.with_name(f"{pom.stem}_{st.session_state['analysis_no']}{pom.suffix}")
+        session_logging.rotate(logger, str(log_segment_path), drive_folder_id)
+        logger.info("Log fajl odvojen za upload na Google Drive.")
+        st.session_state['log_uploaded'] = True
+
+    def show_upload_status(entry_ids):
+        upload_pending = any(e['status'] == 'pending' for e in upload_outbox.status(entry_ids))
+
+        # status se osvežava samo dok ima fajlova koji čekaju
+        @st.fragment(run_every=3 if upload_pending else None)
+        def upload_status(entry_ids):
+            entries = upload_outbox.status(entry_ids)
+            done = sum(e['status'] == 'done' for e in entries)
+            failed = [e for e in entries if e['status'] == 'failed']
+            waiting = [e for e in entries if e['status'] == 'pending']
+            if waiting:
+                retrying = [e for e in waiting if e['attempts']]
+                note = f" ({len(retrying)} čeka ponovni pokušaj)" if retrying else ""
+                st.caption(f"Google Drive: uploadovano {done}/{len(entries)} fajlova{note}...")
+            elif failed:
+                st.caption(f"Google Drive: uploadovano {done}/{len(entries)} fajlova, neuspešno: {', '.join(e['name'] for e in failed)}")
+            else:
+                st.caption(f"Google Drive: svi fajlovi uploadovani ({done}).")
+            if upload_pending and not waiting:
+                st.rerun(scope="app")
+
+        upload_status(entry_ids)
+
+    def batch_error_message(error):
+        if isinstance(error, (CircuitOpenError, OpenAIError)):
+            return "AI servis (OpenAI) nije dostupan"
+        if isinstance(error, (ValueError, KeyError, AttributeError, TypeError, IndexError)):
+            return "fajl nije u ispravnom formatu"
+        return "neočekivana greška"
+
+    def submit_analysis(upload_input, regenerate=False):
+        drive_folder_id = st.secrets["google_drive_folder"]["folder_id"]
+        job_id = job_runner.submit(
+            st.session_state['user'], ANALYSIS_STAGES, run_analysis,
+            fn_kwargs={
+                'excel_file_path': st.session_state['uploaded_file_path'],
+                'user': st.session_state['user'],
+                'timestamp': st.session_state['timestamp'],
+                'drive_folder_id': drive_folder_id,
+                'regenerate': regenerate,
+                'upload_input': upload_input,
+                'logger': logger,
+                'metrics_path': metrics_path,
+                'excel_file_data': st.session_state.get('uploaded_file_data'),
+            },
+            params={
+                'excel_file_path': st.session_state['uploaded_file_path'],
+                'excel_file_data': st.session_state.get('uploaded_file_data'),
+                'original_file_name': st.session_state['original_file_name'],
+                'timestamp': st.session_state['timestamp'],
+            },
+            # sadržaj fajla posao drži samo dok radi (nastavak posle osvežavanja stranice);
+            # za regenerisanje ga čuva sesija
+            transient_params=('excel_file_data',),
+        )
+        st.session_state['job_id'] = job_id
+        st.session_state['submitted_at'] = time.time()
+        st.session_state['current_stage'] = 'analysis_in_progress'
+        logger.info(f"Analiza pokrenuta u pozadini, posao: {job_id}")
+
+    def submit_batch():
+        """Sve analize grupe odjednom; istovremeno ih radi najviše job_runner.BATCH_PARALLELISM."""
+        drive_folder_id = st.secrets["google_drive_folder"]["folder_id"]
+        batch = st.session_state['batch']
+        batch_id, job_ids = job_runner.submit_batch(
+            st.session_state['user'], ANALYSIS_STAGES, run_analysis,
+            [{
+                'excel_file_path': record['path'],
+                'user': st.session_state['user'],
+                'timestamp': record['timestamp'],
+                'drive_folder_id': drive_folder_id,
+                'regenerate': False,
+                'upload_input': True,
+                'logger': logger,
+                'metrics_path': metrics_path,
+                'excel_file_data': record['data'],
+            } for record in batch],
+            [{
+                'excel_file_path': record['path'],
+                'original_file_name': record['file_name'],
+                'timestamp': record['timestamp'],
+            } for record in batch],
+        )
+        for record, job_id in zip(batch, job_ids):
+            record['job_id'] = job_id
+            # sadržaj fajla sada drži posao, dok se ne završi
+            record['data'] = None
+        st.session_state['submitted_at'] = time.time()
+        st.session_state['current_stage'] = 'batch_in_progress'
+        logger.info(f"Grupa od {len(batch)} analiza pokrenuta u pozadini ({batch_id}), "
+                    f"istovremeno najviše {job_runner.BATCH_PARALLELISM}.")
+
+    # --- PORTFOLIO: UPITI NAD INDEKSOM SVIH ANALIZA ---
+    if st.sidebar.toggle("Portfolio"):
+        st.header("Portfolio klijenata")
+        client_filter = st.sidebar.text_input("Klijent (naziv ili PIB)")
+        user_filter = st.sidebar.selectbox("Korisnik", [''] + portfolio_index.users())
+        period = st.sidebar.date_input("Period analize", value=())
+        grades = st.sidebar.multiselect("Bonitetna ocena (klasa)", ['A', 'B', 'C', 'D', 'E'])
+        blockage_days = st.sidebar.number_input("Blokada u poslednjih dana (0 = bez uslova)", min_value=0, value=0, step=30)
+        below_threshold = st.sidebar.checkbox(f"Samo DTS ispod praga ({risk_metrics.DTS_THRESHOLD})")
+        latest_only = st.sidebar.checkbox("Samo poslednja analiza klijenta", value=True)
+        started = time.perf_counter()
+        portfolio = portfolio_index.query(
+            client=client_filter or None, user=user_filter or None,
+            since=period[0] if len(period) > 0 else None, until=period[1] if len(period) > 1 else None,
+            grades=grades, blockage_within_days=blockage_days or None, below_threshold=below_threshold,
+            latest_only=latest_only,
+        )
+        st.caption(f"Analiza: {len(portfolio)} od {portfolio_index.count()} u indeksu, "
+                   f"upit {(time.perf_counter() - started) * 1000:.1f} ms")
+        if portfolio.empty:
+            st.info("Nema analiza za izabrane uslove.")
+        else:
+            st.dataframe(portfolio.drop(columns=['klijent_kljuc', 'json_name', 'comment_name']), hide_index=True)
+        st.stop()
+
+    # --- ADMIN: TRAJANJE FAZA ANALIZE ---
+    admin_users = st.secrets.get("admin", {}).get("users", [])
+    if st.session_state['user'] in admin_users and st.sidebar.toggle("Metrike analiza"):
+        st.header("Trajanje faza analize")
+        days = st.sidebar.number_input("Poslednjih dana", min_value=1, max_value=90, value=7)
+        last_analyses = st.sidebar.number_input("Najviše analiza", min_value=10, max_value=5000, value=200, step=10)
+        records = analysis_metrics.read(LOG_DIR, since=time.time() - days * 24 * 3600)
+        if records.empty:
+            st.info("Još nema zapisanih metrika.")
+        else:
+            st.caption(f"Analiza: {records['analysis'].nunique()}, zapisa: {len(records)}")
+            st.dataframe(analysis_metrics.stage_summary(records, last_analyses), hide_index=True)
+            tokens = analysis_metrics.token_summary(records)
+            if not tokens.empty:
+                st.subheader("Medijane tokena po nivou rizika")
+                st.dataframe(tokens)
+        st.subheader("Skladište fajlova")
+        st.dataframe(pd.DataFrame([
+            {'direktorijum': store.root, 'fajlova': store.usage()['files'],
+             'MB': round(store.usage()['bytes'] / 1024 / 1024, 1), 'kvota_MB': store.max_bytes // (1024 * 1024),
+             'poslednja_kompakcija_oslobodila_MB': round(store.last_report['reclaimed_bytes'] / 1024 / 1024, 1) if store.last_report else None}
+            for store in (artifacts, upload_artifacts)
+        ]), hide_index=True)
+        st.stop()
+
     # --- KONTROLA TOKA APLIKACIJE ---
 
     # --- FAZA 1: ČEKANJE FAJLA ---
@@ -148,29 +525,43 @@ else:
             st.error(st.session_state['file_error'])
             st.session_state['file_error'] = ''
             
-        uploaded_file = st.file_uploader(
-            "Izaberi Excel fajl",
-            type=["xls", "xlsx", "xlsm"]
-        )
-        if uploaded_file is not None:
-            temp_dir = 'temp_uploaded_files'
+        uploaded_files = st.file_uploader(
+            "Izaberi Excel fajl (jedan ili više)",
+            type=["xls", "xlsx", "xlsm"],
+            accept_multiple_files=True
+        ) or []
+        if len(uploaded_files) == 1:
+            uploaded_file = uploaded_files[0]
             st.session_state['timestamp'] = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            os.makedirs(temp_dir, exist_ok=True)
-            temp_file_path = os.path.join(temp_dir, st.session_state['timestamp'] +'_'+ st.session_state['user'] + '_' + uploaded_file.name)
-
-            with open(temp_file_path, 'wb') as f:
-                f.write(uploaded_file.getbuffer())
+            temp_file_path, st.session_state['uploaded_file_data'] = store_upload(uploaded_file, st.session_state['timestamp'])
 
             # Update session state
             st.session_state['uploaded_file_path'] = temp_file_path
             st.session_state['original_file_name'] = uploaded_file.name
             st.session_state['current_stage'] = 'file_uploaded'
             
-            logger.info(f"Fajl uspešno sačuvan: {uploaded_file.name} na putanji {temp_file_path}")
+            if IN_MEMORY_UPLOAD:
+                logger.info(f"Fajl uspešno učitan u memoriju: {uploaded_file.name} ({uploaded_file.size} B)")
+            else:
+                logger.info(f"Fajl uspešno sačuvan: {uploaded_file.name} na putanji {temp_file_path}")
             
             st.rerun()
 
-# TODO iskljuci dugme za pokretanje analize dok traje ubacivanje na drive
+        elif len(uploaded_files) > 1:
+            st.session_state['timestamp'] = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            batch = []
+            for i, uploaded_file in enumerate(uploaded_files, start=1):
+                # svaki fajl ima svoj timestamp: imena izlaznih fajlova i ID analize u metrikama
+                file_timestamp = f"{st.session_state['timestamp']}-{i:02d}"
+                path, data = store_upload(uploaded_file, file_timestamp)
+                batch.append({'file_name': uploaded_file.name, 'path': path, 'data': data,
+                              'timestamp': file_timestamp, 'job_id': ''})
+            st.session_state['batch'] = batch
+            st.session_state['current_stage'] = 'batch_uploaded'
+            logger.info(f"Učitano {len(batch)} fajlova za grupnu analizu: {', '.join(r['file_name'] for r in batch)}")
+            st.rerun()
+
+
     # --- FAZA 2: FAJL UBAČEN, ČEKA SE ANALIZA ---
     elif st.session_state['current_stage'] == 'file_uploaded':
 
@@ -180,333 +571,234 @@ else:
 
         st.success(f"Fajl '{st.session_state['original_file_name']}' je spreman za analizu.")
 
-        if not st.session_state.get('upload_in_progress', False):
-            if st.button('Pokreni analizu'):
-                st.session_state['upload_in_progress'] = True
-                st.rerun()
-        else:
-            #  upload_in_progress postavljen
-            creds = google_drive_auth(logger)
-            if creds:
-                drive_folder_id = st.secrets["google_drive_folder"]["folder_id"]
-                file_id = upload_drive(st.session_state['uploaded_file_path'], creds, drive_folder_id, logger)
-                if file_id:
-                    st.success(f"Fajl uspešno uploadovan! ID: {file_id}")
-                    st.session_state['current_stage'] = 'analysis_in_progress'
-                    st.rerun()
+        if st.button('Pokreni analizu'):
+            submit_analysis(upload_input=True)
+            st.rerun()
+
+    # --- FAZA 2b: VIŠE FAJLOVA UBAČENO, ČEKA SE ANALIZA ---
+    elif st.session_state['current_stage'] == 'batch_uploaded':
+        st.success(f"{len(st.session_state['batch'])} fajlova je spremno za analizu.")
+        st.dataframe(pd.DataFrame({'Fajl': [r['file_name'] for r in st.session_state['batch']]}), hide_index=True)
+
+        if st.button(f"Pokreni analizu ({len(st.session_state['batch'])} fajlova)"):
+            submit_batch()
+            st.rerun()
+
+        if st.button("Poništi"):
+            st.session_state['batch'] = []
+            st.session_state['current_stage'] = 'waiting_for_file'
+            st.rerun()
+
+    # --- FAZA 3b: GRUPNA ANALIZA, REZULTATI SE POPUNJAVAJU KAKO KOJI KLIJENT ZAVRŠI ---
+    elif st.session_state['current_stage'] == 'batch_in_progress':
+        st.header("Rezultati analize")
+        batch = st.session_state['batch']
+        jobs = [job_runner.get_job(record['job_id']) for record in batch]
+        batch_running = any(job is not None and job.status in ('queued', 'running') for job in jobs)
+
+        if not batch_running and not st.session_state.get('log_uploaded'):
+            st.session_state['analysis_no'] = st.session_state['analysis_no'] + 1
+            ship_session_log()
+
+        @st.fragment(run_every=1 if batch_running else None)
+        def show_batch_results(batch):
+            rows = []
+            finished = 0
+            for record in batch:
+                job = job_runner.get_job(record['job_id'])
+                row = {'Fajl': record['file_name'], 'Klijent': '', 'Status': '', 'Nivo rizika': '', 'Trajanje (s)': None}
+                if job is None:
+                    row['Status'] = "Nije pronađena"
+                elif job.status == 'queued':
+                    row['Status'] = "Čeka"
+                elif job.status == 'running':
+                    row['Status'] = STAGE_LABELS.get(job.stage, "Analiza čeka na slobodan resurs...")
+                elif job.status == 'done':
+                    row.update({'Klijent': job.result['client_name'], 'Nivo rizika': job.result.get('risk_tier') or '',
+                                'Status': BATCH_DONE_LABELS.get(job.result.get('delta_mode'), "Završeno")})
+                    if job.result['ai_comment_from_cache']:
+                        row['Status'] += " (iz keša)"
                 else:
-                    st.error("Upload fajla nije uspeo.")
-                    st.session_state['upload_in_progress'] = False  # Resetuj
-            else:
-                st.error("Nije uspela autentifikacija za Google Drive.")
-                st.session_state['upload_in_progress'] = False
-                
+                    row['Status'] = f"Greška: {batch_error_message(job.error)}"
+                if job is not None and job.finished:
+                    finished += 1
+                    row['Trajanje (s)'] = round(job.finished - job.created, 1)
+                    if not record.get('reported'):
+                        record['reported'] = True
+                        if job.status == 'error':
+                            logger.error(f"Analiza fajla {record['file_name']} nije uspela: {job.error}")
+                        elif st.session_state.get('submitted_at'):
+                            session_metrics(record['timestamp']).emit(
+                                'end_to_end', time.time() - st.session_state['submitted_at'], job=job.id)
+                rows.append(row)
+
+            st.progress(finished / len(batch), text=f"Završeno {finished}/{len(batch)}")
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+            for record in batch:
+                job = job_runner.get_job(record['job_id'])
+                if job is None or job.status != 'done':
+                    continue
+                with st.expander(f"{job.result['client_name']} ({record['file_name']})"):
+                    st.markdown(job.result['ai_comment'])
+                    for warning in job.result.get('warnings', []):
+                        st.warning(warning)
+                    try:
+                        st.download_button(
+                            label="Preuzmi TXT",
+                            data=artifacts.read_bytes(artifacts.name_for(job.result['ai_comment_path'])),
+                            file_name=os.path.basename(job.result['ai_comment_path']),
+                            mime="text/plain",
+                            key=f"download_{job.id}",
+                        )
+                    except FileNotFoundError:
+                        st.error("TXT fajl nije pronađen.")
+
+            if batch_running and finished == len(batch):
+                st.rerun(scope="app")
+
+        show_batch_results(batch)
+
+        uploads = [entry_id for job in jobs if job is not None and job.status == 'done' for entry_id in job.result['uploads']]
+        if uploads and not batch_running:
+            show_upload_status(uploads)
+
+        if st.button("Pokreni novu analizu"):
+            for job in jobs:
+                if job is not None:
+                    job.collected = True
+            st.session_state['current_stage'] = 'waiting_for_file'
+            st.session_state['log_uploaded'] = False
+            st.session_state['batch'] = []
+            logger.info("Pokretanje nove analize.")
+            st.rerun()
 
     # --- FAZA 3: ANALIZA U TOKU ---
     elif st.session_state['current_stage'] == 'analysis_in_progress':
-        with st.spinner("Analiziram podatke i generišem izveštaj..."):
-            try:
-                excel_file_path = st.session_state['uploaded_file_path']
-                client_name = os.path.basename(excel_file_path).split("_")[3]
-
-                logger.info(f"Pokrenuta analiza za klijenta: {client_name}, fajl: {excel_file_path}")
-
-                # --- OVDE IDE VAŠA LOGIKA ZA ANALIZU ---
-                json_content_for_ai = to_JSON(excel_file_path)
-                logger.info("JSON sadržaj uspešno generisan.")
-                #st.write("Prikaz JSON sadržaja:")
-                #st.json(json_content_for_ai)
-                st.session_state['json_content_for_display'] = json_content_for_ai
-
-                try:
-                    client_name_from_json = json_content_for_ai['osnovne_informacije'][1]['Vrednost']
-                    if isinstance(client_name_from_json, list) and client_name_from_json: # If Naziv Kupca is a list
-                        client_name_from_json = client_name_from_json[0]
-                    elif not isinstance(client_name_from_json, str) : # if it's not a string (e.g. NaN)
-                        client_name_from_json = client_name # fallback to filename derived
-                except:
-                    client_name_from_json = client_name # fallback
-                st.session_state['client_name'] = client_name_from_json
-
-                # trenutni datum i vreme
-                now = datetime.now()
-                # konvertovanje u string u formatu "YYYY-MM-DD HH:MM:SS"
-                current_datetime_str = now.strftime("%Y-%m-%d %H:%M:%S")
-
-
-                prompt_text = f"""
-                        You are an expert Credit Risk Analyst AI. Your task is to analyze the provided JSON data for a client and generate a concise "AI Comment" **in Serbian** for a human credit risk analyst. Use a professional and consistent style throughout the comment. All bullet points should be concise, structured, and uniform in tone. Write entirely in Serbian.
-                        This comment should highlight key insights, potential risks, positive indicators, and any anomalies relevant to a credit decision. Your language should be professional and direct, avoiding unnecessary jargon explanations or raw data markers in the final comment unless specifically instructed.
-
-                        **Input Data:**
-                        You will receive a JSON object containing various details about the client. Key sections include:
-                        - `osnovne_informacije`: Basic company information (name, establishment date, ownership, representative).
-                        - `prometRSD`: Turnover data in RSD (annual, quarterly), planned monthly turnover, current debt ("Dug na dan obrade zahteva" - note: a negative value here, like "29,990.04-", indicates a credit balance or overpayment by the client, which is positive), and average payment delay. At present, historical turnover data is missing, so the field does not include past performance figures.
-                        - `predlogRSD`: Proposed credit limit, existing limit, and justification for changes.
-                        - `ocena_rizika`: Risk assessment data (NBS blockage, risky persons, disputes, PPL (This stands for "Povezana pravna lica" (related legal entities). If the value is "Ima" (Has/Yes), it indicates the client is linked to such entities; "Nema" (None/No) indicates no such flagged connections. `Status PPL-ova` (e.g., "Aktivan", "u blokadi", "u stečaju") provides crucial context: if the status of PPLs indicates a direct risk (e.g., "u blokadi", "u stečaju", "neaktivan sa dugovanjima"), this should be treated as a key risk factor and listed within the "Ključni faktori rizika" section, prioritized accordingly; if PPLs exist and their status does not indicate a direct risk (e.g., "Aktivan"), their existence should be noted as the last bullet point in the "Ključni faktori rizika" section, ideally prefixed with "Napomena:" (e.g., "Napomena: Klijent ima povezana pravna lica (status: Aktivan).") to distinguish it from direct risk factors.)).
-                        - `bonitetna_ocena`: Creditworthiness scores (e.g., "E1 - Preduzeće posluje loše i ima veliku verovatnoću neuspeha u budućnosti." indicates poor performance and high failure probability. "E2", "E3" are progressively worse than 'A' or 'B' ratings if those existed). **When referring to the creditworthiness score in the AI Comment, use only the rating code (e.g., 'E1'). However, you MUST use the full description provided with the rating for your internal analysis to understand its implications and severity. Provide the full credit score history.** The "Ocena rizika" here is a numerical score where higher might mean higher risk; interpret this based on context if available.
-                        - `finansijska_analizaEUR`: Financial analysis data in EUR (Capital, Total Revenue, EBITDA, Net Working Capital, Cash, Receivables, Liabilities, Liquidity Ratios, etc.). Pay close attention to trends (22/21 %, 23/22 %), negative values (e.g., EBITDA, Net Working Capital), and key ratios. ** The year keys in finansijska_analizaEUR  are fixed and do not reflect the actual fiscal years of the financial data. The true (valid) years must be taken from rezimeEUR, where actual fiscal years are explicitly stated.**
-                        - `rezimeEUR`: Summary of financial data in EUR over several years. **Unlike `finansijska_analizaEUR`, the year labels in `rezimeEUR` represent actual fiscal years. These years must be used to determine the correct temporal context for the data.**
-                        - `sudski_sporovi`: History of legal disputes, containing information about past and ongoing court cases.
-                        - `povezana_lica`: Section contains information about related entities, including company name, type of relationship, APR (Business Registry) status, and NBS (National Bank of Serbia) status.
-                        - `istorija_blokada`: History of blockages, containing information about past and ongoing blockages.
-                        - `istorijaKL`: History of credit limits the client has had with us.
-
-                        **NOTE:** DTS credit score ranges 0–5 (DTS bonitetna ocena). Threshold is 3.2; clients below are not accepted. Primarily used for new clients, updated annually for existing ones.
-                                This value is calculated in field ['bonitetna_ocena'][0]['DTS bonitetna ocena']; the following explanation is provided for your reference:
-                                Scoring components (1–5, then weighted):
-                                    * Incorporation Date (5%) - current date: {current_datetime_str}:
-                                        * 1 – 0–3 months
-                                        * 2 – 3–12 months
-                                        * 3 – 1–2 years
-                                        * 4 – 2–5 years
-                                        * 5 – more than 5 years
-                                        Weighted score: X × 5%
-                                    * Litigation (10%):
-                                        * 1 – claims > 100,000
-                                        * 2 – claims 50,000–100,000
-                                        * 3 – claims 10,000–50,000
-                                        * 4 – claims 0–10,000
-                                        * 5 – no litigation
-                                        Weighted score: X × 10%
-                                    * Blockage Days (35%):
-                                        * 1 – more than 30 days
-                                        * 2 – 20–30 days
-                                        * 3 – 10–20 days
-                                        * 4 – 0–10 days
-                                        * 5 – no blockage
-                                        Weighted score: X × 35%
-                                    * Collateral Type (30%):
-                                        * 1 – no collateral
-                                        * 2 – promissory notes
-                                        * 3 – compensation
-                                        * 4 – validated promissory notes
-                                        * 5 – bank guarantees or advance payments
-                                        Weighted score: X × 30%
-                                    * Liquidity (20%):
-                                        * 1 – less than 0
-                                        * 2 – 0–1
-                                        * 3 – 1.1–1.5
-                                        * 4 – 1.5–2
-                                        * 5 – greater than 2
-                                        Weighted score: X × 20%
-                                Each component is scored 1–5 and then multiplied by its weight.
-                                Total Score = sum of all weighted components.
-
-
-                        **Analysis Guidelines:**
-                        1.  **Overall Assessment:** Start with a brief overall sentiment (e.g., nizak rizik, srednji rizik, visok rizik, značajne zabrinutosti). This assessment should reflect the most critical findings.
-                        2.  **Positive Indicators:** Identify strengths (e.g., consistent revenue growth, positive net working capital if present, no blockages, overpayment of dues, strong justification for credit if supported by data).
-                        3.  **Key Risk Factors & Concerns:** Pinpoint weaknesses or areas of concern. Quantify where possible. **Prioritize the risks you list, starting with the most critical ones. Factors like NBS blockages, severe creditworthiness ratings (e.g., 'E' categories), significant negative financial trends (e.g., declining revenue, negative EBITDA, poor liquidity), and substantial legal disputes should generally be considered high priority.** Examples:
-                            *   Poor creditworthiness rating (e.g., "E1", "E2", "E3").
-                            *   Negative EBITDA or declining profitability.
-                            *   Negative or very low net working capital.
-                            *   High or increasing debt.
-                            *   Significant payment delays.
-                            *   Discrepancies between requested credit limit and financial capacity (e.g., large increase requested with poor financials).
-                            *   Presence of NBS blockages or legal disputes.
-                            *   Low liquidity ratios.
-                        4.  **Red Flags/Anomalies:** Highlight any unusual data points, inconsistencies, or information that requires immediate attention (e.g., a very high credit limit request despite clear indicators of financial distress, recent establishment with high turnover/requests, missing critical data if observable).
-                        5.  **Specific Data Points to Consider:**
-                            *   Evaluate the `Tražena korekcija kredit limita` (requested credit limit) against the `Postojeća visina kredit limta` (existing limit) and the company's financial health (EBITDA, `bonitetna_ocena` code, `Neto radni kapital`, `Ukupni prihodi`, `Dug na dan obrade zahteva`).
-                            *   Comment on the implications of the `bonitetna_ocena` code in your overall analysis, even if only the code is stated in the risk factors.
-                            *   Analyze trends in `prometRSD` (turnover) and `finansijska_analizaEUR` (financials like revenue, EBITDA).
-                            *   Note the `Dug na dan obrade zahteva` and `Prosečan broj dana kašnjenja`. Compare the latter with the allowed delay tolerance—if it exceeds the tolerance, state so explicitly; if no tolerance is provided ('-'), indicate that the comparison is not applicable.
-                            *   Check `ocena_rizika` for blockages (`NBS blokada`) or disputes (`Sporovi u poslednje 3 godine`).
-                        6.  **Formulating the Recommendation:** The recommendation should be **actionable and provide clear guidance** to the human analyst. Based on the overall risk assessment, suggest concrete next steps, such as approval (with or without conditions like a reduced limit or additional collateral/guarantees), rejection, or the need for specific further investigation (e.g., requesting additional documents, clarifying specific financial items) before a decision can be made.
-
-                        **Output Format ("AI Comment"):**
-                        **IMPORTANT: The entire output comment MUST be in Serbian.**
-                        Structure your comment clearly:
-
-                        **AI komentar kreditnog rizika za [{client_name_from_json}]**
-
-                        *   **Kratak pregled:**
-                            * Naša ocena – rezultat analize (važi i za nove i za postojeće klijente).
-                            * Da bi se proverilo da li je klijent postojeći, koristi se ['osnovne_informacije'][8]['Vrednost'] – ako vrednost pokazuje da poslujemo sa klijentom, uključuju se stavke
-                                * Valuta plaćanja u danima (samo za postojeće klijente, preuzima se iz ['osnovne_informacije'][12]['Vrednost'])
-                                * Ukupan dug i dospeli dug iz SAP-a, kao i prosečno kašnjenje dospelog duga u danima (samo za postojeće klijente, gde se ukupan dug preuzima iz ['prometRSD'][19]['Vrednost'], a dospeli dug iz ['prometRSD'][20]['Vrednost']).
-                                * DTS ocena - koristi se ['bonitetna_ocena'][0]['DTS bonitetna ocena'].
-
-                        *   **Ukupna procena:** (e.g., Visok rizik zbog loše bonitetne ocene i negativnog EBITDA...)
-                        *   **Pozitivni indikatori:**
-                            *   (Tačka 1, sa kratkom referencom na podatke, npr., "Nema prijavljenih NBS blokada.")
-                            *   (Tačka 2, npr., "Klijent ima preplatu/kreditni saldo od [iznos].")
-                        *   **Ključni faktori rizika:** (Navesti počevši od najkritičnijih. **Ako PPL postoji i ne predstavlja direktan rizik, navesti ga kao poslednju stavku sa napomenom.**)
-                            *   (Tačka 1, npr., "Registrovana NBS blokada u poslednjih godinu dana.")
-                            *   (Tačka 2, npr., "Bonitetna ocena: [oznaka_ocene].")
-                            *   (Tačka 3, npr., "Značajno negativan EBITDA od [iznos] EUR u 2023.")
-                            *   (Tačka 4, npr., "Zahtevano povećanje kreditnog limita sa [postojeći] na [zahtevani] RSD deluje veoma visoko s obzirom na finansijske pokazatelje.")
-                            *   (Tačka 5, npr., "Sudski spor [tuženi] [strana] [datum] [iznos]")
-                            ** *   (Primer ako je PPL rizik: "Povezano pravno lice [Naziv PPL-a ako je dostupan] je u blokadi/stečaju.")**
-                            ** *   ...**
-                            ** *   (Poslednja tačka, ako PPL postoji i nije sam po sebi rizik): "Napomena: Klijent ima povezana pravna lica (status: [status_PPL-a, npr. Aktivan])."**
-                        *   **Crvene zastavice / anomalije:**
-                            *   (Tačka 1, ako postoji)
-                        *   **Preporuka:** (Primeri akcionih preporuka, prilagoditi na osnovu analize)
-                            *   (Za visok rizik): "Preporučuje se odbijanje zahteva zbog [ključni razlog 1] i [ključni razlog 2]. Alternativno, ukoliko se izuzetno razmatra odobrenje, neophodno je obezbediti [vrsta dodatne garancije/kolaterala] i smanjiti traženi limit na maksimalno [iznos] RSD."
-                            *   (Za visok/srednji rizik sa potrebom za daljom analizom): "Visok/Srednji rizik. Preporučuje se detaljna provera [specifična oblast, npr. strukture potraživanja ili obaveza] i zahtevanje [dodatni dokument, npr. najnovijeg preseka stanja ili biznis plana za naredni period] pre konačne odluke. Razmotriti odobrenje samo uz limit ne veći od [iznos] RSD i pojačan monitoring."
-                            *   (Za srednji rizik): "Srednji rizik. Moguće je razmotriti odobrenje traženog limita, ali se savetuje oprez. Predlaže se odobrenje limita od [nešto niži iznos od traženog ili traženi iznos] RSD uz obavezan kvartalni monitoring [ključnog pokazatelja, npr. EBITDA ili likvidnosti]."
-                            *   (Za nizak rizik): "Nizak rizik. Finansijski pokazatelji i istorija poslovanja podržavaju zahtev. Preporučuje se odobrenje traženog kreditnog limita od [iznos] RSD uz standardne uslove praćenja."
-
-                            Uz opštu preporuku, navesti i dodatne procene:
-                            - **Na osnovu prometa:** da li je predlog kreditnog limita opravdan u odnosu na ostvareni godišnji promet (poslednja dostupna godina ili prosek).
-
-                        Be factual, objective, and derive your insights directly from the provided JSON data.
-                        The financial data in `finansijska_analizaEUR` and `rezimeEUR` is in EUR, while `prometRSD` and `predlogRSD` are in RSD. Be mindful of this but focus on the qualitative interpretation and trends unless direct comparison is essential and possible.
-
-                        --- START OF CLIENT JSON DATA ---
-                        {json.dumps(json_content_for_ai, indent=2, ensure_ascii=False)}
-                        --- END OF CLIENT JSON DATA ---
-                """
-
-                ai_comment = generate_AIcomment(prompt_text, API_KEY)
-                logger.info("AI komentar uspešno generisan.")
-
-                ai_comment_output_base_dir = os.path.join(LOCAL_OUTPUT_BASE_DIR, "komentari")
-                ai_comment_firm_specific_dir = os.path.join(ai_comment_output_base_dir, client_name)
-                os.makedirs(ai_comment_firm_specific_dir, exist_ok=True)
-                ai_comment_local_file = os.path.join(ai_comment_firm_specific_dir, f'{st.session_state['timestamp'] +'_'+ st.session_state['user'] + '_' +  client_name_from_json}_ai_comment.txt')
-
-                with open(ai_comment_local_file, 'w', encoding='utf-8') as f_comment:
-                    f_comment.write(ai_comment)
-
-                os.makedirs(os.path.join(LOCAL_OUTPUT_BASE_DIR, 'json'), exist_ok=True)
-                json_output_path = os.path.join(LOCAL_OUTPUT_BASE_DIR, 'json', f'{st.session_state['timestamp'] +'_'+ st.session_state['user'] + '_' + client_name_from_json}_data_for_ai.json')
-                with open(json_output_path, 'w', encoding='utf-8') as json_file:
-                    json.dump(json_content_for_ai, json_file, ensure_ascii=False, indent=4)
-
-                st.session_state['ai_comment_path'] = ai_comment_local_file
+        job = job_runner.get_job(st.session_state['job_id'])
 
-                
-                # --- Upload JSON i AI komentar na Google Drive ---
-                creds = google_drive_auth(logger)
-                if creds:
-                        # Upload JSON (.json)
-                        drive_folder_id = st.secrets["google_drive_folder"]["folder_id"]
-                        file_id = upload_drive(json_output_path, creds, drive_folder_id, logger)
-                        if file_id:
-                            st.success(f"Fajl uspešno uploadovan! ID: {file_id}")
-                            logger.info(f"JSON uspešno uploadovan na Google Drive. ID: {drive_folder_id }")
-                        else:
-                            st.error("Upload fajla nije uspeo.")
-                        
-                        # Upload AI komentara (.txt)
-                        drive_folder_id = st.secrets["google_drive_folder"]["folder_id"]
-                        file_id = upload_drive(ai_comment_local_file, creds, drive_folder_id, logger)
-                        if file_id:
-                            st.success(f"Fajl ai kom uspešno uploadovan! ID: {file_id}")
-                            logger.info(f"AI komentar uspešno uploadovan na Google Drive. ID: {drive_folder_id }")
-                        else:
-                            st.error("Upload fajla nije uspeo.")
-
-                            
-                else:
-                    st.error("Autentifikacija za Google Drive nije uspela. Fajlovi nisu uploadovani.")
-                    logger.error("Google Drive autentifikacija nije uspela.")
-                    
-
-                #short_ai_text_for_pdf = shorter_text(ai_comment)
-                #print(short_ai_text_for_pdf)
-                
-                #pdf_output_dir = os.path.join('output', 'pdf')
-                #os.makedirs(pdf_output_dir, exist_ok=True)
-                #pdf_file_path = os.path.join(pdf_output_dir, f'{st.session_state["client_name"]}_kreditna_analiza.pdf')
+        if job is None:
+            logger.error(f"Posao {st.session_state['job_id']} nije pronađen.")
+            st.session_state['current_stage'] = 'waiting_for_file'
+            st.session_state['file_error'] = "Analiza nije pronađena. Molimo pokrenite je ponovo."
+            st.rerun()
 
-                #generate_PDF(pdf_file_path, excel_file_path, short_ai_text_for_pdf)
-                logger.info(f"TXT uspešno generisan: {ai_comment_local_file}")
+        elif job.status == 'done':
+            job.collected = True
+            for key, value in job.result.items():
+                st.session_state[key] = value
+            st.session_state['current_stage'] = 'analysis_done'
+            st.session_state['analysis_no'] = st.session_state['analysis_no'] + 1
+            # od klika do prikaza rezultata, uključujući čekanje na osvežavanje UI-ja
+            if st.session_state.get('submitted_at'):
+                session_metrics().emit('end_to_end', time.time() - st.session_state['submitted_at'], job=job.id)
+            st.rerun()
 
-                # Saving result
-                st.session_state['ai_comment'] = ai_comment
-                #st.session_state['pdf_path'] = pdf_file_path
-                st.session_state['current_stage'] = 'analysis_done'
-                st.session_state['analysis_no'] = st.session_state['analysis_no'] + 1
-                st.rerun()
+        elif job.status == 'error':
+            job.collected = True
+            error = job.error
+            if isinstance(error, CircuitOpenError):
+                logger.error(f"AI servis označen kao nedostupan: {error}")
+                st.session_state['current_stage'] = 'file_uploaded'
+                st.session_state['openai_error'] = 'AI servis (OpenAI) je trenutno preopterećen ili nedostupan. Pokušajte ponovo za minut.'
 
-            
-            except OpenAIError as oe:
-                logger.error(f"Greška prilikom poziva OpenAI API-ja: {oe}")
-                st.error("Došlo je do problema sa AI servisom (OpenAI). Pokušajte ponovo kasnije.")
+            elif isinstance(error, OpenAIError):
+                logger.error(f"Greška prilikom poziva OpenAI API-ja: {error}")
                 st.session_state['current_stage'] = 'file_uploaded'
                 st.session_state['openai_error'] = 'Došlo je do problema sa AI servisom (OpenAI). Pokušajte ponovo kasnije.'
-                st.rerun()
 
-            except (ValueError, KeyError, AttributeError, TypeError, IndexError) as ex:
-                logger.error(f"Greška prilikom čitanja fajla: {ex}")
-                st.error("Fajl nije u ispravnom formatu. Molimo izaberite ispravan fajl.")
+            elif isinstance(error, (ValueError, KeyError, AttributeError, TypeError, IndexError)):
+                logger.error(f"Greška prilikom čitanja fajla: {error}")
                 st.session_state['current_stage'] = 'waiting_for_file'
                 st.session_state['file_error'] = "Fajl nije u ispravnom formatu. Molimo izaberite ispravan fajl."
-                st.rerun()
 
-            except Exception as e:
-                logger.error(f"Neočekivana greška tokom analize: {e}")
-                st.error("Došlo je do neočekivane greške tokom analize. Pokušajte ponovo.")
+            else:
+                logger.error(f"Neočekivana greška tokom analize: {error}")
                 st.session_state['current_stage'] = 'waiting_for_file'
-                st.rerun()
+                st.session_state['file_error'] = "Došlo je do neočekivane greške tokom analize. Pokušajte ponovo."
+            st.rerun()
+
+        else:
+            # posao radi u pozadini; fragment osvežava samo prikaz statusa, ne ceo skript
+            @st.fragment(run_every=1)
+            def show_job_progress(job_id):
+                job = job_runner.get_job(job_id)
+                if job is None or job.status not in ('queued', 'running'):
+                    st.rerun(scope="app")
+                st.progress(job.progress, text=STAGE_LABELS.get(job.stage, "Analiza čeka na slobodan resurs..."))
+                if job.partial_text:
+                    st.subheader("AI Komentar:")
+                    st.markdown(job.partial_text)
+
+            show_job_progress(job.id)
 
     # --- FAZA 4: ANALIZA ZAVRŠENA, PRIKAZ REZULTATA ---
     elif st.session_state['current_stage'] == 'analysis_done':
         st.header("Rezultati analize")
         st.success("Analiza je uspešno završena!")
+        if st.session_state.get('ttfo') is not None:
+            st.caption(f"Vreme do prvog prikaza komentara: {st.session_state['ttfo']:.1f} s")
+        for warning in st.session_state.get('warnings', []):
+            st.warning(warning)
         
         # Ovde prikažite rezultate koje ste sačuvali u session_state
         st.subheader("AI Komentar:")
+        if st.session_state.get('delta_mode') == 'unchanged':
+            st.info(f"Nema bitnih promena u odnosu na analizu od {st.session_state['previous_timestamp']}; prikazan je prethodni komentar. "
+                    "Za novi komentar kliknite 'Regeneriši AI komentar'.")
+        elif st.session_state.get('delta_mode') == 'delta':
+            st.info(f"Komentar je ažuriran u odnosu na analizu od {st.session_state['previous_timestamp']} "
+                    f"(promenjeno: {', '.join(st.session_state['delta_sections'])}).")
+        if st.session_state.get('ai_comment_from_cache'):
+            st.info("Komentar je preuzet iz keša (isti podaci i ista verzija prompta). Za novi komentar kliknite 'Regeneriši AI komentar'.")
         st.text_area("Generisani AI Komentar:", st.session_state['ai_comment'], height=300, key="ai_comment_display")
 
         if not st.session_state.get('log_uploaded'):
 
             if st.session_state.get('ai_comment_path'):
-                creds = google_drive_auth(logger)
-                if creds:
-                    try:
-                        DRIVE_FOLDER_ID = st.secrets["google_drive_folder"]["folder_id"]
-                    except KeyError:
-                        st.error("Nije pronađen ID Google Drive foldera u secrets.toml!")
-                        DRIVE_FOLDER_ID = None
-
-                    if DRIVE_FOLDER_ID:
-                        #log_temp_path = f"{st.session_state['timestamp'] +'_'+ st.session_state['user']}_app.log"
-                        pom = Path(st.session_state['log_path'])
-                        print(st.session_state['log_path'])
-                        log_temp_path = pom.with_name(f"{pom.stem}_{st.session_state['analysis_no']}{pom.suffix}")
-                        shutil.copy(st.session_state['log_path'], log_temp_path)
-
-                        log_drive_id = upload_drive(log_temp_path, creds, DRIVE_FOLDER_ID, logger)
-                        if log_drive_id:
-                            logger.info(f"Log fajl uspešno uploadovan na Google Drive. ID: {log_drive_id}")
-                        else:
-                            st.error("Došlo je do greške prilikom upload-a log fajla na Google Drive.")
-
-                        os.remove(log_temp_path)
-                        st.session_state['log_uploaded'] = True
-
-            #Ciscenje log fajla
-            open(st.session_state['log_path'], 'w').close()
-            logger.info("Log fajl uspešno ispražnjen.")
-            
+                ship_session_log()
+
             try:
-                # Open the generated PDF file and provide download button
-                with open(st.session_state['ai_comment_path'], "rb") as file:
-                    btn = st.download_button(
-                        label="Preuzmi TXT",
-                        data=file,
-                        file_name=os.path.basename(st.session_state['ai_comment_path']),
-                        mime="application/pdf"
-                    )
+                # komentar može biti i arhiviran (komprimovan) ako je stranica dugo otvorena
+                comment_bytes = artifacts.read_bytes(artifacts.name_for(st.session_state['ai_comment_path']))
+                btn = st.download_button(
+                    label="Preuzmi TXT",
+                    data=comment_bytes,
+                    file_name=os.path.basename(st.session_state['ai_comment_path']),
+                    mime="application/pdf"
+                )
                 
             except FileNotFoundError:
                 st.error("PDF fajl nije pronađen. Molimo pokrenite analizu ponovo.")
                 logger.error(f"TXT fajl nije pronađen na putanji: {st.session_state.get('ai_comment_path')}")
 
         st.write(f"Klijent: {st.session_state['client_name']}")
+
+        if st.session_state.get('uploads'):
+            show_upload_status(st.session_state['uploads'])
         # st.write(f"Komentar AI: {st.session_state['ai_comment']}")
 
     
+        # sesija nastavljena posle završenog posla nema sadržaj fajla (IN_MEMORY_UPLOAD)
+        can_regenerate = (st.session_state.get('uploaded_file_data') is not None
+                          or os.path.exists(st.session_state['uploaded_file_path']))
+        if not can_regenerate:
+            st.caption("Za regenerisanje AI komentara ponovo uploadujte fajl.")
+        elif st.button("Regeneriši AI komentar"):
+            # ista analiza, ali bez keša AI komentara; ulazni fajl je već na Drive-u
+            st.session_state['timestamp'] = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            st.session_state['log_uploaded'] = False
+            st.session_state['uploads'] = []
+            submit_analysis(upload_input=False, regenerate=True)
+            logger.info("Regenerisanje AI komentara (keš preskočen).")
+            st.rerun()
+
         if st.button("Pokreni novu analizu"):
 
             #Resetovanje stanja
             st.session_state['current_stage'] = 'waiting_for_file'
             st.session_state['log_uploaded'] = False
-            st.session_state['upload_in_progress'] = False 
+            st.session_state['uploads'] = []
+            st.session_state['uploaded_file_data'] = None
             logger.info("Pokretanje nove analize.")
             st.rerun()
\ No newline at end of file
@@ -0,0 +1,421 @@
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import shutil
+import logging
+import threading
+
+# Fajlovi koje aplikacija ostavlja za sobom (JSON za AI, komentari, logovi, uploadovani fajlovi)
+# idu kroz ArtifactStore: indeks na disku (bez prolaska kroz direktorijume pri traženju),
+# ograničenje veličine i starosti sa LRU izbacivanjem, i gzip za arhivirane JSON-e i logove.
+INDEX_NAME = "index.json"
+MAX_BYTES = int(os.getenv("ARTIFACT_MAX_MB", "2048")) * 1024 * 1024
+MAX_AGE_SECONDS = int(os.getenv("ARTIFACT_MAX_AGE_DAYS", "180")) * 24 * 3600
+# arhiviran = nije menjan ovoliko dugo; tek tada se komprimuje
+COMPRESS_AFTER_SECONDS = 24 * 3600
+COMPRESS_SUFFIXES = ('.json', '.jsonl', '.log')
+# pisac koji je otvorio fajl pre nego što je sklonjen za komprimovanje završava upis za ovoliko
+COMPRESS_GRACE_SECONDS = 0.05
+# novi fajlovi (rezultat koji korisnik upravo gleda, fajl koji čeka analizu) se ne izbacuju
+MIN_AGE_SECONDS = 3600
+COMPACT_INTERVAL_SECONDS = int(os.getenv("ARTIFACT_COMPACT_INTERVAL", "3600"))
+GZ_SUFFIX = ".gz"
+# poslednji JSON i komentar svakog klijenta se ne izbacuju ni zbog kvote ni zbog starosti: na njima
+# se zasnivaju ponovna analiza (client_delta.find_previous) i indeks portfolija (portfolio_index.backfill).
+# Ime analize: '{timestamp}_{korisnik}_{klijent}_data_for_ai.json' / '..._ai_comment.txt'
+_ANALYSIS_NAME = re.compile(r'^(.*/)?\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(?:-\d+)?_(.+_(?:data_for_ai\.json|ai_comment\.txt))$')
+
+_lock = threading.Lock()
+_stores = {}
+_compactor = None
+
+
+def _get_logger():
+    logger = logging.getLogger("FinAiApp.artifacts")
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _analysis_key(name):
+    """Ime JSON-a ili komentara analize bez vremena (direktorijum, korisnik, klijent); None za ostale fajlove."""
+    match = _ANALYSIS_NAME.match(name)
+    return (match.group(1) or '') + match.group(2) if match else None
+
+
+class ArtifactStore:
+    """Fajlovi pod root/dirs, sa indeksom u root/index.json.
+    Ime fajla je putanja relativna u odnosu na root ('komentari/Firma/x.txt'). Komprimovan fajl
+    ima isto ime (na disku ime + .gz); read_* ga čitaju transparentno. Fajl u koji se i dalje
+    dopisuje (log sesije, metrike) može imati oba dela: stariji u .gz i noviji nekomprimovan."""
+
+    def __init__(self, root, dirs=('.',), max_bytes=MAX_BYTES, max_age_seconds=MAX_AGE_SECONDS,
+                 compress_after_seconds=COMPRESS_AFTER_SECONDS, min_age_seconds=MIN_AGE_SECONDS):
+        self.root = root
+        self.dirs = tuple(dirs)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress_after_seconds = compress_after_seconds
+        self.min_age_seconds = min_age_seconds
+        self.last_report = None
+        self._lock = threading.RLock()
+        self._index_path = os.path.join(root, INDEX_NAME)
+        os.makedirs(root, exist_ok=True)
+        self._entries = self._load_index()
+        self._total = sum(e['size'] for e in self._entries.values())
+
+    # --- indeks ---
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)['entries']
+        except (OSError, ValueError, KeyError):
+            # nema indeksa (prvo pokretanje) ili je oštećen: prva kompakcija ga pravi iz fajlova
+            return {}
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self._entries}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self._index_path)
+
+    def name_for(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def _parts(self, name):
+        path = self.path(name)
+        return path + GZ_SUFFIX, path
+
+    def _set(self, name, size, created=None):
+        now = time.time()
+        previous = self._entries.get(name)
+        self._total += size - (previous['size'] if previous else 0)
+        self._entries[name] = {
+            'size': size,
+            'created': created or (previous['created'] if previous else now),
+            'accessed': now,
+        }
+
+    def _drop(self, name):
+        entry = self._entries.pop(name, None)
+        if entry:
+            self._total -= entry['size']
+        return entry
+
+    # --- upis ---
+
+    def write_bytes(self, name, data):
+        """Upisuje fajl (atomično) i vraća njegovu putanju; po potrebi izbacuje najstarije fajlove."""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            # stara komprimovana verzija istog imena više ne važi
+            _remove(path + GZ_SUFFIX)
+            self._set(name, len(data), created=time.time())
+            self._evict_over_quota()
+            self._save_index()
+        return path
+
+    def write_text(self, name, text):
+        return self.write_bytes(name, text.encode('utf-8'))
+
+    def write_json(self, name, value, **kwargs):
+        kwargs.setdefault('ensure_ascii', False)
+        return self.write_text(name, json.dumps(value, **kwargs))
+
+    def add(self, name):
+        """Upisuje u indeks fajl koji je napravio neko drugi (npr. FileHandler loga)."""
+        gz_path, path = self._parts(name)
+        size = _size(gz_path) + _size(path)
+        with self._lock:
+            self._set(name, size)
+            self._save_index()
+
+    # --- čitanje ---
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._entries
+
+    def names(self, prefix=''):
+        """Imena iz indeksa (bez obilaska direktorijuma), od najnovijeg."""
+        with self._lock:
+            items = [(e['created'], n) for n, e in self._entries.items() if n.startswith(prefix)]
+        return [n for _, n in sorted(items, reverse=True)]
+
+    def read_bytes(self, name):
+        gz_path, path = self._parts(name)
+        chunks = []
+        if os.path.exists(gz_path):
+            with gzip.open(gz_path, 'rb') as f:
+                chunks.append(f.read())
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                chunks.append(f.read())
+        if not chunks:
+            with self._lock:
+                self._drop(name)
+            raise FileNotFoundError(path)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry:
+                # LRU: poslednji pristup; indeks se snima pri sledećem upisu ili kompakciji
+                entry['accessed'] = time.time()
+        return b''.join(chunks)
+
+    def read_text(self, name):
+        return self.read_bytes(name).decode('utf-8')
+
+    def read_json(self, name):
+        return json.loads(self.read_bytes(name))
+
+    def remove(self, name):
+        gz_path, path = self._parts(name)
+        freed = _size(gz_path) + _size(path)
+        _remove(gz_path)
+        _remove(path)
+        with self._lock:
+            self._drop(name)
+            self._save_index()
+        return freed
+
+    def usage(self):
+        with self._lock:
+            return {'files': len(self._entries), 'bytes': self._total, 'max_bytes': self.max_bytes}
+
+    # --- izbacivanje i kompakcija ---
+
+    def _delete(self, name):
+        gz_path, path = self._parts(name)
+        freed = _size(gz_path) + _size(path)
+        _remove(gz_path)
+        _remove(path)
+        self._drop(name)
+        return freed
+
+    def _latest_analyses(self):
+        """Imena najnovijeg JSON-a i komentara za svakog klijenta."""
+        latest = {}
+        for name, entry in self._entries.items():
+            key = _analysis_key(name)
+            if key is not None and (key not in latest or entry['created'] > latest[key][0]):
+                latest[key] = (entry['created'], name)
+        return {name for _, name in latest.values()}
+
+    def _evict_over_quota(self):
+        if self._total <= self.max_bytes:
+            return 0
+        now = time.time()
+        freed = 0
+        keep = self._latest_analyses()
+        for name, entry in sorted(self._entries.items(), key=lambda item: item[1]['accessed']):
+            if self._total <= self.max_bytes:
+                break
+            if now - entry['created'] < self.min_age_seconds or name in keep:
+                continue
+            freed += self._delete(name)
+        return freed
+
+    def _scan(self):
+        """Imena svih fajlova pod dirs (jedan obilazak, samo u kompakciji)."""
+        found = set()
+        for directory in self.dirs:
+            top = os.path.join(self.root, directory)
+            for dirpath, _, filenames in os.walk(top):
+                for filename in filenames:
+                    if filename == INDEX_NAME or filename.endswith('.tmp'):
+                        continue
+                    name = self.name_for(os.path.join(dirpath, filename))
+                    found.add(name[:-len(GZ_SUFFIX)] if name.endswith(GZ_SUFFIX) else name)
+        return found
+
+    def _compress(self, name):
+        """Dodaje nekomprimovani deo u .gz (novi gzip član, ako .gz već postoji); vraća uštedu u bajtovima."""
+        gz_path, path = self._parts(name)
+        modified = _mtime(path)
+        before = _size(gz_path) + _size(path)
+        # deo se prvo skloni (rename je atomičan): ko dopisuje po imenu (WatchedFileHandler loga sesije,
+        # metrike) od tada piše u novi fajl, koji ostaje nekomprimovan deo; ništa se ne briše posle provere
+        aside = f"{path}.{threading.get_ident()}.compress.tmp"
+        try:
+            os.replace(path, aside)
+        except FileNotFoundError:
+            return 0
+        tmp_path = f"{gz_path}.{threading.get_ident()}.tmp"
+        try:
+            if os.path.exists(gz_path):
+                shutil.copyfile(gz_path, tmp_path)
+            with open(aside, 'rb') as src, gzip.open(tmp_path, 'ab') as dst:
+                # ko je otvorio fajl pre rename-a još piše u sklonjeni: čita se dok ne prestane da raste
+                while True:
+                    shutil.copyfileobj(src, dst)
+                    time.sleep(COMPRESS_GRACE_SECONDS)
+                    if src.tell() == os.fstat(src.fileno()).st_size:
+                        break
+            os.replace(tmp_path, gz_path)
+        except OSError:
+            _remove(tmp_path)
+            self._restore(aside, path)
+            raise
+        os.utime(gz_path, (modified, modified))
+        _remove(aside)
+        return before - _size(gz_path) - _size(path)
+
+    @staticmethod
+    def _restore(aside, path):
+        # komprimovanje nije uspelo: sklonjeni deo se vraća, ispred onoga što je u međuvremenu upisano
+        if not os.path.exists(path):
+            os.replace(aside, path)
+            return
+        with open(aside, 'ab') as dst, open(path, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(aside, path)
+
+    def compact(self):
+        """Usklađuje indeks sa diskom, komprimuje arhivirane JSON-e i logove, briše fajlove starije
+        od max_age_seconds i izbacuje najdavnije korišćene preko kvote (osim poslednje analize svakog
+        klijenta). Vraća izveštaj."""
+        started = time.perf_counter()
+        report = {'added': 0, 'missing': 0, 'compressed': 0, 'expired': 0, 'evicted': 0, 'reclaimed_bytes': 0}
+        now = time.time()
+        found = self._scan()
+
+        with self._lock:
+            for name in set(self._entries) - found:
+                self._drop(name)
+                report['missing'] += 1
+
+        # nekomprimovani delovi koji se više ne menjaju
+        for name in sorted(found):
+            if not name.endswith(COMPRESS_SUFFIXES):
+                continue
+            modified = _mtime(self.path(name))
+            if modified is None or now - modified < self.compress_after_seconds:
+                continue
+            try:
+                saved = self._compress(name)
+            except OSError as e:
+                _get_logger().warning(f"Komprimovanje {name} nije uspelo: {e}")
+                continue
+            report['compressed'] += 1
+            report['reclaimed_bytes'] += saved
+
+        with self._lock:
+            for name in found:
+                gz_path, path = self._parts(name)
+                size = _size(gz_path) + _size(path)
+                entry = self._entries.get(name)
+                if entry is None:
+                    # fajl od pre uvođenja indeksa ili upisan mimo store-a (logovi, metrike)
+                    times = [t for t in (_mtime(gz_path), _mtime(path)) if t is not None]
+                    created = min(times) if times else now
+                    self._set(name, size, created=created)
+                    self._entries[name]['accessed'] = created
+                    report['added'] += 1
+                else:
+                    self._total += size - entry['size']
+                    entry['size'] = size
+
+            keep = self._latest_analyses()
+            for name, entry in list(self._entries.items()):
+                if now - entry['created'] > self.max_age_seconds and name not in keep:
+                    report['reclaimed_bytes'] += self._delete(name)
+                    report['expired'] += 1
+
+            files_before = len(self._entries)
+            total_before = self._total
+            self._evict_over_quota()
+            report['evicted'] = files_before - len(self._entries)
+            report['reclaimed_bytes'] += total_before - self._total
+            self._save_index()
+            report.update(self.usage())
+
+        report['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        self.last_report = report
+        return report
+
+
+def get_store(root, **kwargs):
+    """Jedan ArtifactStore po direktorijumu za ceo proces (Streamlit ponovo izvršava app.py
+    pri svakoj interakciji, a indeks mora da ima jednog vlasnika)."""
+    with _lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = ArtifactStore(root, **kwargs)
+        return store
+
+
+def compact_all(logger=None):
+    reports = {}
+    with _lock:
+        stores = list(_stores.values())
+    for store in stores:
+        report = store.compact()
+        reports[store.root] = report
+        message = (f"Kompakcija '{store.root}': oslobođeno {report['reclaimed_bytes'] / 1024 / 1024:.1f} MB "
+                   f"(komprimovano {report['compressed']}, isteklo {report['expired']}, izbačeno {report['evicted']}), "
+                   f"ukupno {report['bytes'] / 1024 / 1024:.1f} MB u {report['files']} fajlova")
+        if logger:
+            logger.info(message)
+        else:
+            print(message)
+    return reports
+
+
+def _compact_forever(interval_seconds):
+    logger = _get_logger()
+    while True:
+        try:
+            compact_all(logger)
+        except Exception as e:
+            logger.error(f"Greška u kompakciji artefakata: {e}")
+        time.sleep(interval_seconds)
+
+
+def start_compactor(interval_seconds=COMPACT_INTERVAL_SECONDS):
+    """Pozadinska nit koja periodično kompaktira sve store-ove (jednom po procesu); prva
+    kompakcija odmah, da bi se indeks napravio i za fajlove od ranije."""
+    global _compactor
+    with _lock:
+        if _compactor is None or not _compactor.is_alive():
+            _compactor = threading.Thread(target=_compact_forever, args=(interval_seconds,),
+                                          name="fin-app-artifacts", daemon=True)
+            _compactor.start()
+    return _compactor
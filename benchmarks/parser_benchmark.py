@@ -0,0 +1,125 @@
+"""Vreme i vršna memorija parsera (to_JSON, clean_df, ClientRecord.to_json) po veličini radne sveske.
+
+    python -m benchmarks.parser_benchmark --sizes 0 10 100 1000 5000 --save output/parser_baseline.json
+    python -m benchmarks.parser_benchmark --compare output/parser_baseline.json
+
+Veličina je broj sudskih sporova i broj blokada u sintetičkoj svesci (workbook_generator).
+Sa --compare se rezultat poredi sa sačuvanim i izlazni kod je 1 ako je neka mera sporija ili
+zauzima više memorije od dozvoljenog odstupanja (--tolerance), pa skripta može da stoji u CI-ju.
+"""
+import gc
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+import statistics
+
+import pandas as pd
+
+from excel_processor import to_JSON, clean_df, parse_record
+from benchmarks.workbook_generator import make_workbook
+
+DEFAULT_SIZES = [0, 10, 100, 1000, 5000]
+# ispod ovih vrednosti razlika je šum merenja, ne regresija
+MIN_TIME_DELTA_MS = 5
+MIN_MEMORY_DELTA_KB = 256
+
+
+def _quiet(fn, *args):
+    # to_JSON ispisuje svaki list koji obrađuje
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def measure(fn, *args, runs=3):
+    """Medijana vremena (ms) u runs ponavljanja i vršna memorija (KB) u posebnom pokretanju,
+    jer tracemalloc usporava izvršavanje."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _quiet(fn, *args)
+        times.append((time.perf_counter() - start) * 1000)
+
+    # smeće iz prethodnih poziva ne sme da uđe u vršnu memoriju ovog merenja
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _quiet(fn, *args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'ms': statistics.median(times), 'peak_kb': peak / 1024}
+
+
+def run(sizes, runs, workdir):
+    results = {}
+    for size in sizes:
+        path = make_workbook(os.path.join(workdir, f"sveska_{size}.xlsm"), disputes=size, blockades=size,
+                             related=max(1, size // 5), history=min(size, 50), seed=size)
+        record = _quiet(parse_record, path)
+        # clean_df nad tabelom iste veličine kakvu to_JSON dobija iz lista Blokade
+        frame = pd.read_excel(path, sheet_name='Blokade', engine='openpyxl')
+
+        results[str(size)] = {
+            'to_JSON': measure(to_JSON, path, runs=runs),
+            'clean_df': measure(clean_df, frame, runs=runs),
+            'to_json': measure(record.to_json, runs=runs),
+        }
+        row = results[str(size)]
+        print(f"{size:>6} redova: " + ", ".join(
+            f"{name} {m['ms']:.1f} ms / {m['peak_kb']:.0f} KB" for name, m in row.items()))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lista regresija u odnosu na baseline (samo veličine i funkcije izmerene u oba)."""
+    regressions = []
+    for size, functions in results.items():
+        for name, current in functions.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous:
+                continue
+            checks = [('ms', MIN_TIME_DELTA_MS), ('peak_kb', MIN_MEMORY_DELTA_KB)]
+            for metric, min_delta in checks:
+                if current[metric] > previous[metric] * (1 + tolerance) and current[metric] - previous[metric] > min_delta:
+                    regressions.append(f"{name} @ {size} redova: {metric} {previous[metric]:.1f} -> {current[metric]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsera radnih svesaka po veličini.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Broj sporova/blokada po svesci")
+    parser.add_argument('--runs', type=int, default=3, help="Broj ponavljanja za merenje vremena")
+    parser.add_argument('--save', help="Upiši rezultat kao JSON (baseline)")
+    parser.add_argument('--compare', help="Uporedi sa sačuvanim JSON rezultatom")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Dozvoljeno pogoršanje (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.sizes, args.runs, workdir)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Rezultat sačuvan: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegresije:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nBez regresija u odnosu na {args.compare} (tolerancija {args.tolerance:.0%}).")
+
+
+if __name__ == '__main__':
+    main()
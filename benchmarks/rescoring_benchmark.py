@@ -0,0 +1,116 @@
+"""Protok ponovnog računanja DTS ocene (portfolio_rescoring) po veličini portfolija.
+
+    python -m benchmarks.rescoring_benchmark --sizes 100 1000 10000 50000
+    python -m benchmarks.rescoring_benchmark --save output/rescoring_baseline.json
+
+Portfolio je N izmišljenih klijenata napravljenih iz jednog JSON-a (to_JSON nad sintetičkom
+sveskom iz workbook_generator) sa različitim datumom osnivanja, sporovima, blokadama,
+obezbeđenjem i likvidnošću. Poredi se računanje klijent po klijent (dts_inputs + score_components,
+kao u compute_risk_metrics) sa jednim vektorskim prolazom (dts_raw, dts_frame, score_components).
+"""
+import io
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import statistics
+from datetime import datetime, timedelta
+
+from excel_processor import to_JSON
+from risk_metrics import dts_raw, dts_frame, dts_inputs, score_components
+from benchmarks.workbook_generator import make_workbook, COLLATERAL
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+# klijent po klijent je spor; iznad ovoga se meri samo vektorski prolaz
+LOOP_MAX = 10000
+NOW = datetime(2026, 1, 1)
+
+
+def template_client():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_workbook(os.path.join(workdir, "sveska.xlsm"), disputes=20, blockades=20, related=5, history=10, seed=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return to_JSON(path)
+
+
+def _replace(rows, needle, column, value):
+    return [dict(row, **{column: value}) if needle in str(next(iter(row.values()), '')).lower() else row for row in rows]
+
+
+def make_portfolio(template, n, seed=0):
+    """n klijenata: kopije šablona sa izmenjenim poljima od kojih zavisi DTS ocena."""
+    r = random.Random(seed)
+    clients = []
+    for _ in range(n):
+        client = dict(template)
+        founded = NOW - timedelta(days=r.randint(30, 8 * 365))
+        client['osnovne_informacije'] = _replace(template['osnovne_informacije'], 'osniv', 'Vrednost',
+                                                 founded.strftime('%Y-%m-%d %H:%M:%S'))
+        client['predlogRSD'] = _replace(template['predlogRSD'], 'obezbe', 'Vrednost RSD', r.choice(COLLATERAL))
+        client['finansijska_analizaEUR'] = _replace(template['finansijska_analizaEUR'], 'likvid', '2024',
+                                                    round(r.uniform(-0.5, 3.0), 2))
+        summary = dict(template['zbirni_pregled'])
+        summary['sudski sporovi'] = dict(summary['sudski sporovi'], ukupan_iznos=r.choice([0, 5_000, 30_000, 80_000, 250_000]))
+        summary['istorija_blokada'] = dict(summary['istorija_blokada'], ukupno_dana=float(r.choice([0, 5, 15, 25, 60])))
+        client['zbirni_pregled'] = summary
+        clients.append(client)
+    return clients
+
+
+def per_client(clients):
+    return [score_components(dts_inputs(client, NOW)) for client in clients]
+
+
+def vectorized(clients):
+    return score_components(dts_frame([dts_raw(client) for client in clients], NOW))
+
+
+def measure(fn, *args, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run(sizes, runs, loop_max):
+    template = template_client()
+    results = {}
+    for size in sizes:
+        clients = make_portfolio(template, size, seed=size)
+        inputs = dts_frame([dts_raw(client) for client in clients], NOW)
+        row = {
+            'vektorski': measure(vectorized, clients, runs=runs),
+            'samo_ocena': measure(score_components, inputs, runs=runs),
+        }
+        if size <= loop_max:
+            row['po_klijentu'] = measure(per_client, clients, runs=1)
+        results[str(size)] = row
+        print(f"{size:>7} klijenata: " + ", ".join(
+            f"{name} {ms:.1f} ms ({size / ms * 1000:,.0f} klijenata/s)" for name, ms in row.items()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ponovnog računanja DTS ocene po veličini portfolija.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Broj klijenata u portfoliju")
+    parser.add_argument('--runs', type=int, default=3, help="Broj ponavljanja za merenje vremena")
+    parser.add_argument('--loop-max', type=int, default=LOOP_MAX, help="Najveći portfolio za merenje klijent po klijent")
+    parser.add_argument('--save', help="Upiši rezultat kao JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.runs, args.loop_max)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Rezultat sačuvan: {args.save}")
+
+
+if __name__ == '__main__':
+    main()
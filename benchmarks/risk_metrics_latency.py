@@ -0,0 +1,80 @@
+"""Poređenje latencije AI komentara bez i sa unapred izračunatim metrikama rizika.
+
+    python -m benchmarks.risk_metrics_latency inputs/*.xlsm --runs 2
+
+Stari način: prompt bez bloka metrika, reasoning effort "high".
+Novi način: prompt sa blokom iz risk_metrics, reasoning iz AI_REASONING ("medium").
+Poziva pravi OpenAI API (OPENAI_API_KEY iz .env); keš komentara se zaobilazi.
+"""
+import time
+import argparse
+
+import pandas as pd
+
+import llm_client
+from comment_generator import parse_file, openai_api_key
+from prompts import build_prompt
+from excel_processor import AI_MODEL, AI_REASONING, AI_TEXT, AI_MAX_OUTPUT_TOKENS
+from risk_metrics import compute_risk_metrics
+
+VARIANTS = {
+    'bez_metrika': {'include_metrics': False, 'reasoning': {"effort": "high"}},
+    'sa_metrikama': {'include_metrics': True, 'reasoning': AI_REASONING},
+}
+
+
+def run_variant(prompt_text, reasoning):
+    start = time.perf_counter()
+    response = llm_client.create_response(
+        openai_api_key,
+        model=AI_MODEL,
+        input=prompt_text,
+        reasoning=reasoning,
+        text=AI_TEXT,
+        max_output_tokens=AI_MAX_OUTPUT_TOKENS,
+    )
+    usage = response.usage
+    details = getattr(usage, 'output_tokens_details', None) if usage else None
+    return {
+        'latencija_s': time.perf_counter() - start,
+        'ulazni_tokeni': usage.input_tokens if usage else None,
+        'izlazni_tokeni': usage.output_tokens if usage else None,
+        'reasoning_tokeni': getattr(details, 'reasoning_tokens', None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: AI komentar bez i sa metrikama rizika.")
+    parser.add_argument('files', nargs='+', help="Excel fajlovi klijenata")
+    parser.add_argument('--runs', type=int, default=1, help="Broj ponavljanja po fajlu i varijanti")
+    args = parser.parse_args()
+
+    rows = []
+    for file_path in args.files:
+        name, result_json, _ = parse_file(file_path)
+
+        start = time.perf_counter()
+        compute_risk_metrics(result_json)
+        metrics_ms = (time.perf_counter() - start) * 1000
+
+        for run in range(args.runs):
+            # varijante se smenjuju da bi promena opterećenja API-ja uticala na obe podjednako
+            for variant, settings in VARIANTS.items():
+                prompt_text = build_prompt(name, result_json, include_metrics=settings['include_metrics'])
+                row = {'klijent': name, 'varijanta': variant, 'ponavljanje': run + 1, 'metrike_ms': metrics_ms}
+                row.update(run_variant(prompt_text, settings['reasoning']))
+                rows.append(row)
+                print(f"{name} [{variant}] {row['latencija_s']:.1f} s, reasoning tokena: {row['reasoning_tokeni']}")
+
+    df = pd.DataFrame(rows)
+    summary = df.groupby('varijanta')[['latencija_s', 'reasoning_tokeni', 'izlazni_tokeni', 'ulazni_tokeni']].median()
+    print('\nMedijane po varijanti:')
+    print(summary.round(2).to_string())
+    if {'bez_metrika', 'sa_metrikama'} <= set(summary.index):
+        before, after = summary.loc['bez_metrika', 'latencija_s'], summary.loc['sa_metrikama', 'latencija_s']
+        print(f"\nLatencija: {before:.1f} s -> {after:.1f} s ({1 - after / before:.0%} manje); "
+              f"izračunavanje metrika: {df['metrike_ms'].median():.1f} ms po klijentu")
+
+
+if __name__ == '__main__':
+    main()
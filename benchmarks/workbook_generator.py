@@ -0,0 +1,211 @@
+"""Sintetičke radne sveske sa rasporedom koji to_JSON očekuje (list 'Kupac' sa regionima,
+'Sudski sporovi', 'Rezime (EUR)', 'Povezana lica', 'Blokade').
+
+    python -m benchmarks.workbook_generator out.xlsm --disputes 1000 --blockades 1000
+
+Podaci su izmišljeni, ali nazivi redova prate prave fajlove, pa nad izlazom rade i
+risk_metrics i model_routing.
+"""
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+YEARS = [2022, 2023, 2024]
+
+BASIC_INFO = [
+    'Datum izveštaja', 'Naziv kupca', 'PIB', 'Matični broj', 'Adresa', 'Datum osnivanja',
+    'Vlasnik', 'Zastupnik', 'Poslujemo od', 'Delatnost', 'Region', 'Komercijalista',
+]
+TURNOVER = [
+    f'Promet {YEARS[0]}. godina', f'Promet {YEARS[1]}. godina', f'Promet {YEARS[2]}. godina',
+    'Promet tekuća godina', 'Prosečno kašnjenje (dana)', 'Ukupno dugovanje', 'Dospelo dugovanje',
+    'Nedospelo dugovanje', 'Dospelo do 30 dana', 'Dospelo 31-60 dana', 'Dospelo 61-90 dana',
+    'Dospelo preko 90 dana', 'Broj faktura', 'Prosečan iznos fakture', 'Rok plaćanja (dana)',
+    'Uplate tekuća godina', 'Reklamacije', 'Odobrenja', 'Kamate', 'Utužena potraživanja',
+    'Otpisana potraživanja', 'Avansne uplate', 'Kompenzacije', 'Cesije', 'Asignacije',
+    'Broj opomena', 'Poslednja uplata', 'Najveće kašnjenje (dana)', 'Napomena',
+]
+RISK = [
+    'NBS blokada', 'Sudski sporovi', 'Povezana lica u blokadi', 'Povezana lica u stečaju', 'Promena vlasnika',
+    'Promena zastupnika', 'Promena sedišta', 'Poreski dug', 'Hipoteke', 'Zaloge', 'Finansijski lizing',
+]
+FINANCIALS = [
+    'Poslovni prihodi', 'Poslovni rashodi', 'Poslovni rezultat', 'Neto rezultat', 'EBITDA',
+    'Ukupna aktiva', 'Stalna imovina', 'Obrtna imovina', 'Zalihe', 'Potraživanja od kupaca',
+    'Gotovina', 'Kapital', 'Dugoročne obaveze', 'Kratkoročne obaveze', 'Obaveze prema dobavljačima',
+    'Opšti racio likvidnosti', 'Rigorozni racio likvidnosti', 'Zaduženost', 'Neto marža',
+    'Broj zaposlenih', 'Dani vezivanja kupaca',
+]
+PROPOSAL = ['Postojeći limit', 'Traženi limit', 'Predlog limita', 'Sredstvo obezbeđenja', 'Rok plaćanja', 'Napomena']
+COLLATERAL = ['Menice', 'Avalirane menice', 'Bankarska garancija', 'Avansno plaćanje', 'Kompenzacija', 'Nema']
+GRADES = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2', 'D1', 'E1']
+
+
+def _set(sheet, row, column, value):
+    if value is not None:
+        sheet.cell(row, column, value)
+
+
+def _kupac(sheet, r, history):
+    # E5:F16 osnovne informacije
+    founded = datetime(2024, 6, 1) - timedelta(days=r.randint(30, 30 * 365))
+    basic = {
+        'Datum izveštaja': datetime(2025, 1, 15),
+        'Naziv kupca': f"KOMPANIJA {r.choice(['TAKOVO', 'MORAVA', 'DUNAV', 'ZLATIBOR', 'TIMOK'])} DOO",
+        'PIB': str(r.randint(100000000, 999999999)),
+        'Matični broj': str(r.randint(10000000, 99999999)),
+        'Datum osnivanja': founded,
+        'Poslujemo od': founded + timedelta(days=r.randint(0, 2000)),
+    }
+    for i, label in enumerate(BASIC_INFO):
+        _set(sheet, 5 + i, 5, label)
+        _set(sheet, 5 + i, 6, basic.get(label, f"{label} {r.randint(1, 99)}"))
+
+    # E19:F47 promet; redovi bez vrednosti se u to_JSON izbacuju
+    for i, label in enumerate(TURNOVER):
+        _set(sheet, 19 + i, 5, label)
+        if r.random() < 0.15:
+            continue
+        if 'dana' in label:
+            value = r.randint(0, 90)
+        elif r.random() < 0.1:
+            # negativan iznos kako ga izvozi knjigovodstvo: minus na kraju, kao tekst
+            value = f"{r.uniform(1, 1e5):,.2f}-"
+        else:
+            value = round(r.uniform(0, 5e7), 2)
+        _set(sheet, 19 + i, 6, value)
+
+    # I10:J20 ocena rizika
+    for i, label in enumerate(RISK):
+        _set(sheet, 10 + i, 9, label)
+        _set(sheet, 10 + i, 10, 'Nema' if r.random() < 0.7 else r.choice(['Ima', r.randint(1, 5)]))
+
+    # I27:N48 finansijska analiza: zaglavlje + 21 red
+    header = ['Pozicija', *YEARS] + [f"{str(b)[2:]}/{str(a)[2:]} %" for a, b in zip(YEARS, YEARS[1:])]
+    for j, value in enumerate(header):
+        _set(sheet, 27, 9 + j, value)
+    for i, label in enumerate(FINANCIALS):
+        _set(sheet, 28 + i, 9, label)
+        values = [None if r.random() < 0.1 else round(r.uniform(-2e5, 5e6), 2) for _ in YEARS]
+        if 'likvidnost' in label.lower():
+            values = [round(r.uniform(0.3, 3), 2) for _ in YEARS]
+        for j, value in enumerate(values):
+            _set(sheet, 28 + i, 10 + j, value)
+        for j, (a, b) in enumerate(zip(values, values[1:])):
+            _set(sheet, 28 + i, 10 + len(YEARS) + j, round((b - a) / abs(a) * 100, 1) if a and b is not None else None)
+
+    # E51:F56 predlog kreditnog limita
+    existing = r.choice([0, 500_000, 1_000_000, 3_000_000])
+    proposal = {
+        'Postojeći limit': existing,
+        'Traženi limit': existing + r.choice([500_000, 1_000_000, 2_000_000]),
+        'Predlog limita': existing + 500_000,
+        'Sredstvo obezbeđenja': r.choice(COLLATERAL),
+        'Rok plaćanja': f"{r.choice([30, 45, 60, 90])} dana",
+    }
+    for i, label in enumerate(PROPOSAL):
+        _set(sheet, 51 + i, 5, label)
+        _set(sheet, 51 + i, 6, proposal.get(label))
+
+    # L9:O10 bonitetna ocena, L11:M12 ocena rizika i tolerancija
+    grade = r.choice(GRADES)
+    for j, value in enumerate(['Bonitet', 'DTS bonitetna ocena', 'Ocena', 'Opis']):
+        _set(sheet, 9, 12 + j, value)
+    for j, value in enumerate(['', round(r.uniform(1, 5), 2), grade, f"{grade} - opis bonitetne ocene"]):
+        _set(sheet, 10, 12 + j, value or None)
+    _set(sheet, 11, 12, 'Ocena rizika')
+    _set(sheet, 11, 13, r.randint(1, 10))
+    _set(sheet, 12, 12, 'Tolerancija kašnjenja (dana)')
+    _set(sheet, 12, 13, r.choice(['-', 15, 30]))
+
+    # I53:K kreditna istorija, do kraja lista
+    for j, value in enumerate(['Datum', 'Limit', 'Napomena']):
+        _set(sheet, 53, 9 + j, value)
+    for i in range(history):
+        _set(sheet, 54 + i, 9, datetime(2015, 1, 1) + timedelta(days=120 * i))
+        _set(sheet, 54 + i, 10, r.choice([0, 500_000, 1_000_000, 2_000_000]))
+        _set(sheet, 54 + i, 11, r.choice([None, 'odobreno', 'smanjeno', 'ukinuto']))
+
+
+def _disputes(sheet, r, count):
+    for j, value in enumerate(['Broj predmeta', 'Uloga', 'Datum pokretanja', 'Iznos spora', 'Status']):
+        _set(sheet, 1, 1 + j, value)
+    for i in range(count):
+        row = 2 + i
+        _set(sheet, row, 1, f"P-{r.randint(1, 9999)}/{r.randint(2015, 2024)}")
+        _set(sheet, row, 2, r.choice(['tuženi', 'tužilac']))
+        _set(sheet, row, 3, datetime(2015, 1, 1) + timedelta(days=r.randint(0, 3600)))
+        _set(sheet, row, 4, round(r.uniform(1_000, 500_000), 2))
+        _set(sheet, row, 5, r.choice(['aktivan', 'zatvoren', None]))
+
+
+def _summary(sheet, r):
+    # A4: zaglavlje, 30 redova; kolona bez zaglavlja to_JSON odbacuje ("Unnamed")
+    _set(sheet, 1, 1, 'Rezime finansijskih izveštaja (EUR)')
+    for j, value in enumerate(['Pozicija', *YEARS]):
+        _set(sheet, 4, 1 + j, value)
+    for i in range(30):
+        _set(sheet, 5 + i, 1, FINANCIALS[i % len(FINANCIALS)] + ('' if i < len(FINANCIALS) else ' (konsolidovano)'))
+        for j in range(len(YEARS)):
+            _set(sheet, 5 + i, 2 + j, None if r.random() < 0.1 else round(r.uniform(-1e5, 3e6), 2))
+        _set(sheet, 5 + i, 2 + len(YEARS) + 1, 'beleška' if r.random() < 0.2 else None)
+
+
+def _related(sheet, r, count):
+    # A:D se čita, kolona E je višak koji to_JSON ne uzima
+    for j, value in enumerate(['Naziv', 'Veza', 'APR status', 'NBS status', 'Beleška']):
+        _set(sheet, 1, 1 + j, value)
+    for i in range(count):
+        _set(sheet, 2 + i, 1, f"POVEZANO LICE {i + 1} DOO")
+        _set(sheet, 2 + i, 2, r.choice(['vlasnik', 'zastupnik', 'zajednički vlasnik']))
+        _set(sheet, 2 + i, 3, r.choice(['Aktivno', 'Aktivno', 'U stečaju', 'Brisano']))
+        _set(sheet, 2 + i, 4, r.choice(['Nema blokada', 'Nema blokada', 'U blokadi']))
+        _set(sheet, 2 + i, 5, 'x')
+
+
+def _blockades(sheet, r, count):
+    for j, value in enumerate(['Od', 'Do', 'Broj dana', 'Iznos']):
+        _set(sheet, 1, 1 + j, value)
+    for i in range(count):
+        start = datetime(2015, 1, 1) + timedelta(days=r.randint(0, 3600))
+        days = r.randint(1, 60)
+        _set(sheet, 2 + i, 1, start)
+        # poslednja blokada ponekad još traje (kolona "Do" prazna)
+        _set(sheet, 2 + i, 2, None if i == count - 1 and r.random() < 0.3 else start + timedelta(days=days))
+        _set(sheet, 2 + i, 3, days)
+        _set(sheet, 2 + i, 4, round(r.uniform(1_000, 2e6), 2))
+
+
+def make_workbook(path, disputes=10, blockades=10, related=5, history=5, seed=0):
+    """Upisuje sintetičku radnu svesku u path (.xlsx ili .xlsm) i vraća path.
+    Broj redova 0 daje list samo sa zaglavljem."""
+    r = random.Random(seed)
+    book = Workbook()
+    kupac = book.active
+    kupac.title = 'Kupac'
+    _kupac(kupac, r, history)
+    _disputes(book.create_sheet('Sudski sporovi'), r, disputes)
+    _summary(book.create_sheet('Rezime (EUR)'), r)
+    _related(book.create_sheet('Povezana lica'), r, related)
+    _blockades(book.create_sheet('Blokade'), r, blockades)
+    book.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sintetička radna sveska u formatu koji čita to_JSON.")
+    parser.add_argument('path', help="Izlazni fajl (.xlsx ili .xlsm)")
+    parser.add_argument('--disputes', type=int, default=10, help="Broj sudskih sporova")
+    parser.add_argument('--blockades', type=int, default=10, help="Broj blokada")
+    parser.add_argument('--related', type=int, default=5, help="Broj povezanih lica")
+    parser.add_argument('--history', type=int, default=5, help="Broj redova kreditne istorije")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    make_workbook(args.path, args.disputes, args.blockades, args.related, args.history, args.seed)
+    print(f"Upisano: {args.path}")
+
+
+if __name__ == '__main__':
+    main()
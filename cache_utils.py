@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def data_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class DiskCache:
+    """JSON keš na disku: jedan fajl po ključu, izbacivanje po starosti i ukupnoj veličini (LRU).
+    Starost je mtime fajla (vreme upisa), poslednji pristup je atime (postavlja ga get)."""
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, max_age_seconds=7 * 24 * 3600, evict_every=100):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        # direktorijum se pregleda na svakih evict_every upisa ili kad procenjena veličina pređe max_bytes
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._estimated_bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            written = os.stat(path).st_mtime
+            if time.time() - written > self.max_age_seconds:
+                self._remove(path)
+                self._count(False)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+
+        # atime = poslednji pristup (LRU), mtime ostaje vreme upisa (starost)
+        try:
+            os.utime(path, (time.time(), written))
+        except OSError:
+            pass
+        self._count(True)
+        return entry['value']
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'value': value}, f, ensure_ascii=False)
+            size = f.tell()
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            if self._estimated_bytes is not None:
+                self._estimated_bytes += size
+            due = (self._estimated_bytes is None or self._writes >= self.evict_every
+                   or self._estimated_bytes > self.max_bytes)
+            if due:
+                self._writes = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(entry.path)
+            else:
+                entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        with self._lock:
+            self._estimated_bytes = total
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+import portfolio_index
+from client_record import SECTIONS, SUMMARY_KEY
+from risk_metrics import compute_risk_metrics, normalize_label, to_number
+
+# Ponovna analiza istog klijenta: novi JSON se poredi sa poslednjim sačuvanim (output/json/)
+# i modelu idu samo promenjene sekcije i prethodni komentar; bez bitnih promena LLM se ne poziva.
+# promena broja manja od ovog udela (npr. 0.01 = 1%) nije bitna, osim za brojeve i dane (COUNT_LABELS)
+DELTA_MIN_CHANGE = float(os.getenv("DELTA_MIN_CHANGE", "0.01"))
+# vrednosti čiji naziv (red ili kolona) sadrži neku od ovih reči se porede tačno: broj sporova i
+# blokada, dani blokade, kreditni limit; iznosi i racija (i kad su celi brojevi) idu preko praga
+COUNT_LABELS = ('broj', 'sporova', 'blokada', 'dana', 'limit')
+# ako se promenilo više sekcija, delta prompt ne štedi mnogo: radi se puna analiza
+DELTA_MAX_SECTIONS = int(os.getenv("DELTA_MAX_SECTIONS", "4"))
+# najviše ovoliko pojedinačnih promena ide u prompt (sve promenjene sekcije idu cele)
+MAX_LISTED_CHANGES = 60
+# polja koja se menjaju sa svakim izveštajem, a ne govore ništa o klijentu
+IMMATERIAL_LABELS = ('datum izvestaja', 'datum obrade', 'prikazano_redova')
+
+
+def find_previous(store, client_json, client_name, db_path=None):
+    """Poslednja analiza klijenta iz indeksa portfolija (po PIB-u, bez njega po nazivu) čiji su JSON
+    i komentar još u store-u: red indeksa (rečnik) ili None."""
+    pib = portfolio_index.client_pib(client_json)
+    for row in portfolio_index.client_analyses(client_name, pib, db_path=db_path):
+        if row['json_name'] in store and row['comment_name'] in store:
+            return row
+    return None
+
+
+def _row_keys(rows):
+    # red se prepoznaje po vrednosti prve kolone (Atribut, Pozicija, Broj predmeta...), a ne po poziciji
+    seen = {}
+    for row in rows:
+        first = next(iter(row.values()), None) if row else None
+        label = str(first)
+        seen[label] = seen.get(label, 0) + 1
+        yield label if seen[label] == 1 else f"{label} #{seen[label]}"
+
+
+def _flatten(value, path, out):
+    """{putanja: vrednost}; red tabele je jedna vrednost pod putanjom (sekcija, ključ reda)."""
+    if isinstance(value, list) and all(isinstance(row, dict) for row in value):
+        for key, row in zip(_row_keys(value), value):
+            out[path + (key,)] = row
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, path + (str(key),), out)
+    else:
+        out[path] = value
+    return out
+
+
+def _counted(path):
+    # naziv reda i kolone; u zbirnom pregledu je drugi deo putanje sekcija ('istorija_blokada'), a ne naziv
+    labels = path[2:] if path[0] == SUMMARY_KEY else path[1:]
+    return any(word in normalize_label(part) for part in labels for word in COUNT_LABELS)
+
+
+def _material(path, before, after, min_change):
+    if any(normalize_label(part).strip() in IMMATERIAL_LABELS for part in path[1:]):
+        return False
+    old, new = to_number(before), to_number(after)
+    if old is not None and new is not None:
+        if old == new:
+            return False
+        # broj sporova i blokada, dani i limit: svaka promena je bitna
+        return _counted(path) or abs(new - old) / max(abs(old), abs(new)) >= min_change
+    # 'NaT' i prazna ćelija znače isto
+    if before in (None, '', 'NaT') and after in (None, '', 'NaT'):
+        return False
+    return before != after
+
+
+def _changes(path, before, after, min_change):
+    if isinstance(before, dict) and isinstance(after, dict):
+        # isti red u obe verzije: promene po kolonama
+        for field in list(before) + [f for f in after if f not in before]:
+            yield from _changes(path + (field,), before.get(field), after.get(field), min_change)
+    elif isinstance(before, dict) or isinstance(after, dict):
+        # novi ili uklonjen red ide ceo
+        yield path, before, after
+    elif _material(path, before, after, min_change):
+        yield path, before, after
+
+
+def diff(previous, current, min_change=None):
+    """Bitne promene između dva JSON-a klijenta (oblik kao iz to_JSON):
+    {'sekcije': [...], 'promene': [{'sekcija', 'stavka', 'polje', 'pre', 'posle'}], 'ukupno_promena': n}.
+    Za dodat ili uklonjen red polje je None, a pre/posle ceo red."""
+    min_change = DELTA_MIN_CHANGE if min_change is None else min_change
+    old = _flatten(previous, (), {})
+    new = _flatten(current, (), {})
+    changes = []
+    for path in list(old) + [p for p in new if p not in old]:
+        for change_path, before, after in _changes(path, old.get(path), new.get(path), min_change):
+            row_level = len(change_path) == len(path) and (isinstance(before, dict) or isinstance(after, dict))
+            changes.append({
+                'sekcija': change_path[0],
+                'stavka': ' / '.join(change_path[1:] if row_level else change_path[1:-1]) or None,
+                'polje': None if row_level else change_path[-1],
+                'pre': before,
+                'posle': after,
+            })
+    changed = {c['sekcija'] for c in changes}
+    order = list(SECTIONS) + [SUMMARY_KEY]
+    sections = sorted(changed, key=lambda s: order.index(s) if s in order else len(order))
+    return {'sekcije': sections, 'promene': changes[:MAX_LISTED_CHANGES], 'ukupno_promena': len(changes)}
+
+
+def _dts(client_json, analyzed_at):
+    dts = compute_risk_metrics(client_json, now=analyzed_at)['dts']
+    return dts['komponente'], dts['ocena'], dts['prolazi_prag']
+
+
+def stale(previous, previous_json, client_json, prompt_version, policy_version, now):
+    """Razlozi zbog kojih prethodni komentar ne važi ni kad se JSON nije bitno promenio (prazna lista
+    ako važi): drugi prompt, druga politika modela (model_routing) ili druga DTS ocena, koja zavisi i
+    od datuma analize (starost firme). previous je red indeksa portfolija prethodne analize."""
+    reasons = []
+    if previous.get('verzija_prompta') != prompt_version:
+        reasons.append('verzija prompta')
+    if previous.get('politika_modela') != policy_version:
+        reasons.append('politika modela')
+    analyzed_at = datetime.strptime(previous['analizirano'], '%Y-%m-%d %H:%M:%S')
+    if _dts(previous_json, analyzed_at) != _dts(client_json, now):
+        reasons.append('DTS ocena')
+    return reasons
+
+
+def mode(delta, stale_reasons=()):
+    """'unchanged' (bez bitnih promena i prethodni komentar i dalje važi), 'delta' ili 'full'
+    (promenjeno previše sekcija ili prethodni komentar ne važi, vidi stale)."""
+    if stale_reasons:
+        return 'full'
+    if not delta['sekcije']:
+        return 'unchanged'
+    return 'delta' if len(delta['sekcije']) <= DELTA_MAX_SECTIONS else 'full'
+
+
+def changed_sections(client_json, delta):
+    """Trenutne vrednosti samo promenjenih sekcija (za prompt)."""
+    return {section: client_json[section] for section in delta['sekcije'] if section in client_json}
+
+
+def fingerprint(previous_json, previous_comment):
+    # deo verzije prompta za keš AI komentara: isti novi JSON uz drugu prethodnu analizu daje drugi komentar
+    text = json.dumps(previous_json, sort_keys=True, ensure_ascii=False, default=str) + previous_comment
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,124 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Sekcije koje to_JSON čita iz radne sveske, redom kojim idu u JSON (i u prompt).
+SECTIONS = (
+    'osnovne_informacije', 'prometRSD', 'ocena_rizika', 'finansijska_analizaEUR', 'predlogRSD',
+    'bonitetna_ocena', 'istorijaKL', 'sudski sporovi', 'rezimeEUR', 'povezana_lica', 'istorija_blokada',
+)
+# "sudski sporovi" nije ispravno ime atributa
+_ATTRIBUTES = {section: section.replace(' ', '_') for section in SECTIONS}
+
+# zbirni pregled velikih listova (sheet_stream), po sekciji
+SUMMARY_KEY = "zbirni_pregled"
+
+COLUMNS_KEY = "kolone"
+ROWS_KEY = "redovi"
+
+
+def _key(column):
+    # nazivi kolona kakve bi dao json.dumps (npr. godina 2023 -> "2023")
+    if isinstance(column, str):
+        return column
+    if isinstance(column, np.generic):
+        column = column.item()
+    if column is None or isinstance(column, (bool, int, float)):
+        return json.dumps(column)
+    return str(column)
+
+
+def _value(value):
+    """Vrednost ćelije spremna za JSON: NaN -> None, numpy tipovi -> Python, ostalo (datumi) -> str."""
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return None if value != value else value
+    if isinstance(value, (str, bool, int)):
+        return value
+    if value is pd.NaT:
+        return None
+    return str(value)
+
+
+def _column_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # isto kao ranije: datum kao tekst, prazna ćelija kao 'NaT'
+        return series.astype(str).tolist()
+    values = series.tolist()
+    if series.dtype.kind in 'iub':
+        return values
+    return [_value(v) for v in values]
+
+
+class Table:
+    """Tabela jedne sekcije: nazivi kolona i redovi kao torke, vrednosti već normalizovane."""
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns=(), rows=()):
+        self.columns = list(columns)
+        self.rows = list(rows)
+
+    @classmethod
+    def from_frame(cls, df):
+        # jedan prolaz po koloni; zip pravi redove bez međukopije DataFrame-a
+        columns = [_key(c) for c in df.columns]
+        values = [_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+        rows = list(zip(*values)) if values else [()] * len(df)
+        return cls(columns, rows)
+
+    @classmethod
+    def from_records(cls, columns, records):
+        return cls(columns, [tuple(_value(r.get(c)) for c in columns) for r in records])
+
+    def to_records(self):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class ClientRecord:
+    """Sve sekcije jednog klijenta. to_dict() daje isti oblik kao ranije to_JSON,
+    to_json()/from_json() su kompaktan zapis po kolonama (keš, prenos između procesa)."""
+    __slots__ = tuple(_ATTRIBUTES.values()) + ('summary',)
+
+    def __init__(self, tables=None, summary=None):
+        tables = tables or {}
+        for section, attribute in _ATTRIBUTES.items():
+            table = tables.get(section)
+            setattr(self, attribute, Table() if table is None else table)
+        self.summary = summary or {}
+
+    def table(self, section):
+        return getattr(self, _ATTRIBUTES[section])
+
+    def to_dict(self):
+        data = {section: self.table(section).to_records() for section in SECTIONS}
+        if self.summary:
+            data[SUMMARY_KEY] = self.summary
+        return data
+
+    def to_columns(self):
+        data = {section: {COLUMNS_KEY: t.columns, ROWS_KEY: t.rows} for section, t in
+                ((s, self.table(s)) for s in SECTIONS)}
+        if self.summary:
+            data[SUMMARY_KEY] = self.summary
+        return data
+
+    @classmethod
+    def from_columns(cls, data):
+        return cls({section: Table(value[COLUMNS_KEY], map(tuple, value[ROWS_KEY]))
+                    for section, value in data.items() if section in _ATTRIBUTES},
+                   data.get(SUMMARY_KEY))
+
+    def to_json(self):
+        return json.dumps(self.to_columns(), ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_columns(json.loads(text))
@@ -1,9 +1,20 @@
 import os
 import json
+import time
+import argparse
+import threading
 
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 
-from excel_processor import to_JSON, generate_AIcomment
+import pandas as pd
+from openai import RateLimitError
+
+from excel_processor import to_JSON_cached, comment_cache, comment_cache_key, request_settings
+from model_routing import generate_routed, route, stats as routing_stats
+from rate_limiter import RateLimiter, estimate_tokens
+from prompts import build_prompt, PROMPT_VERSION, record_cache_usage, cache_stats
+import llm_client
 
 from dotenv import load_dotenv
 
@@ -13,9 +24,22 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 
 LOCAL_OUTPUT_BASE_DIR = "output"
 
+# podešavanja paralelne obrade (mogu se zadati i kroz .env)
+PARSE_WORKERS = int(os.getenv("BATCH_PARSE_WORKERS", os.cpu_count() or 2))
+LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", 50))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", 500000))
+MAX_RATE_LIMIT_RETRIES = 6
 
-def process_file(file_path):
-    result_json = to_JSON(file_path)
+# OpenAI Batch API (godišnje ponovno ocenjivanje) - jeftinije, rezultat u roku od 24h
+BATCH_DIR = os.path.join(LOCAL_OUTPUT_BASE_DIR, 'batches')
+BATCH_POLL_SECONDS = 60
+BATCH_FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def parse_file(file_path):
+    start = time.perf_counter()
+    result_json = to_JSON_cached(file_path)
     name = result_json['osnovne_informacije'][1]['Vrednost']
     print(f'Obrada komitenta: {name}')
 
@@ -27,94 +51,11 @@ def process_file(file_path):
     with open(output_json, 'w', encoding='utf-8') as f:
         json.dump(result_json, f, ensure_ascii=False, indent=4)
 
-    prompt_text = f"""
-                You are an expert Credit Risk Analyst AI. Your task is to analyze the provided JSON data for a client and generate a concise "AI Comment" **in Serbian** for a human credit risk analyst. This comment should highlight key insights, potential risks, positive indicators, and any anomalies relevant to a credit decision. Your language should be professional and direct, avoiding unnecessary jargon explanations or raw data markers in the final comment unless specifically instructed.
-
-                **Input Data:**
-                You will receive a JSON object containing various details about the client. Key sections include:
-                - `osnovne_informacije`: Basic company information (name, establishment date, ownership, representative).
-                - `prometRSD`: Turnover data in RSD (annual, quarterly), planned monthly turnover, current debt ("Dug na dan obrade zahteva" - note: a negative value here, like "29,990.04-", indicates a credit balance or overpayment by the client, which is positive), and average payment delay. At present, historical turnover data is missing, so the field does not include past performance figures.
-                - `predlogRSD`: Proposed credit limit, existing limit, and justification for changes.
-                - `ocena_rizika`: Risk assessment data (NBS blockage, risky persons, disputes, PPL (This stands for "Povezana pravna lica" (related legal entities). If the value is "Ima" (Has/Yes), it indicates the client is linked to such entities; "Nema" (None/No) indicates no such flagged connections. `Status PPL-ova` (e.g., "Aktivan", "u blokadi", "u stečaju") provides crucial context: if the status of PPLs indicates a direct risk (e.g., "u blokadi", "u stečaju", "neaktivan sa dugovanjima"), this should be treated as a key risk factor and listed within the "Ključni faktori rizika" section, prioritized accordingly; if PPLs exist and their status does not indicate a direct risk (e.g., "Aktivan"), their existence should be noted as the last bullet point in the "Ključni faktori rizika" section, ideally prefixed with "Napomena:" (e.g., "Napomena: Klijent ima povezana pravna lica (status: Aktivan).") to distinguish it from direct risk factors.)).
-                - `bonitetna_ocena`: Creditworthiness scores (e.g., "E1 - Preduzeće posluje loše i ima veliku verovatnoću neuspeha u budućnosti." indicates poor performance and high failure probability. "E2", "E3" are progressively worse than 'A' or 'B' ratings if those existed). **When referring to the creditworthiness score in the AI Comment, use only the rating code (e.g., 'E1'). However, you MUST use the full description provided with the rating for your internal analysis to understand its implications and severity. Provide the full credit score history.** The "Ocena rizika" here is a numerical score where higher might mean higher risk; interpret this based on context if available.
-                - `finansijska_analizaEUR`: Financial analysis data in EUR (Capital, Total Revenue, EBITDA, Net Working Capital, Cash, Receivables, Liabilities, Liquidity Ratios, etc.). Pay close attention to trends (22/21 %, 23/22 %), negative values (e.g., EBITDA, Net Working Capital), and key ratios. ** The year keys in finansijska_analizaEUR  are fixed and do not reflect the actual fiscal years of the financial data. The true (valid) years must be taken from rezimeEUR, where actual fiscal years are explicitly stated.**
-                - `rezimeEUR`: Summary of financial data in EUR over several years. **Unlike `finansijska_analizaEUR`, the year labels in `rezimeEUR` represent actual fiscal years. These years must be used to determine the correct temporal context for the data.**
-                - `sudski_sporovi`: History of legal disputes, containing information about past and ongoing court cases.
-                - `povezana_lica`: Section contains information about related entities, including company name, type of relationship, APR (Business Registry) status, and NBS (National Bank of Serbia) status.
-
-                **Analysis Guidelines:**
-                1.  **Overall Assessment:** Start with a brief overall sentiment (e.g., nizak rizik, srednji rizik, visok rizik, značajne zabrinutosti). This assessment should reflect the most critical findings.
-                2.  **Positive Indicators:** Identify strengths (e.g., consistent revenue growth, positive net working capital if present, no blockages, overpayment of dues, strong justification for credit if supported by data).
-                3.  **Key Risk Factors & Concerns:** Pinpoint weaknesses or areas of concern. Quantify where possible. **Prioritize the risks you list, starting with the most critical ones. Factors like NBS blockages, severe creditworthiness ratings (e.g., 'E' categories), significant negative financial trends (e.g., declining revenue, negative EBITDA, poor liquidity), and substantial legal disputes should generally be considered high priority.** Examples:
-                    *   Poor creditworthiness rating (e.g., "E1", "E2", "E3").
-                    *   Negative EBITDA or declining profitability.
-                    *   Negative or very low net working capital.
-                    *   High or increasing debt.
-                    *   Significant payment delays.
-                    *   Discrepancies between requested credit limit and financial capacity (e.g., large increase requested with poor financials).
-                    *   Presence of NBS blockages or legal disputes.
-                    *   Low liquidity ratios.
-                4.  **Red Flags/Anomalies:** Highlight any unusual data points, inconsistencies, or information that requires immediate attention (e.g., a very high credit limit request despite clear indicators of financial distress, recent establishment with high turnover/requests, missing critical data if observable).
-                5.  **Specific Data Points to Consider:**
-                    *   Evaluate the `Tražena korekcija kredit limita` (requested credit limit) against the `Postojeća visina kredit limta` (existing limit) and the company's financial health (EBITDA, `bonitetna_ocena` code, `Neto radni kapital`, `Ukupni prihodi`, `Dug na dan obrade zahteva`).
-                    *   Comment on the implications of the `bonitetna_ocena` code in your overall analysis, even if only the code is stated in the risk factors.
-                    *   Analyze trends in `prometRSD` (turnover) and `finansijska_analizaEUR` (financials like revenue, EBITDA).
-                    *   Note the `Dug na dan obrade zahteva` and `Prosečan broj dana kašnjenja`. Compare the latter with the allowed delay tolerance—if it exceeds the tolerance, state so explicitly; if no tolerance is provided ('-'), indicate that the comparison is not applicable.
-                    *   Check `ocena_rizika` for blockages (`NBS blokada`) or disputes (`Sporovi u poslednje 3 godine`).
-                6.  **Formulating the Recommendation:** The recommendation should be **actionable and provide clear guidance** to the human analyst. Based on the overall risk assessment, suggest concrete next steps, such as approval (with or without conditions like a reduced limit or additional collateral/guarantees), rejection, or the need for specific further investigation (e.g., requesting additional documents, clarifying specific financial items) before a decision can be made.
-
-                **Output Format ("AI Comment"):**
-                **IMPORTANT: The entire output comment MUST be in Serbian.**
-                Structure your comment clearly:
-
-                **AI komentar kreditnog rizika za [{name}]**
-
-                *   **Kratak pregled:**
-                    * Naša ocena – rezultat analize (važi i za nove i za postojeće klijente).
-                    * Da bi se proverilo da li je klijent postojeći, koristi se ['osnovne_informacije'][8]['Vrednost'] – ako vrednost pokazuje da poslujemo sa klijentom, uključuju se stavke
-                        * Valuta plaćanja u danima (samo za postojeće klijente, preuzima se iz ['osnovne_informacije'][12]['Vrednost'])
-                        * Ukupan dug i dospeli dug iz SAP-a, kao i prosečno kašnjenje dospelog duga u danima (samo za postojeće klijente, gde se ukupan dug preuzima iz ['prometRSD'][19]['Vrednost'], a dospeli dug iz ['prometRSD'][20]['Vrednost']).
-
-                *   **Ukupna procena:** (e.g., Visok rizik zbog loše bonitetne ocene i negativnog EBITDA...)
-                *   **Pozitivni indikatori:**
-                    *   (Tačka 1, sa kratkom referencom na podatke, npr., "Nema prijavljenih NBS blokada.")
-                    *   (Tačka 2, npr., "Klijent ima preplatu/kreditni saldo od [iznos].")
-                *   **Ključni faktori rizika:** (Navesti počevši od najkritičnijih. **Ako PPL postoji i ne predstavlja direktan rizik, navesti ga kao poslednju stavku sa napomenom.**)
-                    *   (Tačka 1, npr., "Registrovana NBS blokada u poslednjih godinu dana.")
-                    *   (Tačka 2, npr., "Bonitetna ocena: [oznaka_ocene].")
-                    *   (Tačka 3, npr., "Značajno negativan EBITDA od [iznos] EUR u 2023.")
-                    *   (Tačka 4, npr., "Zahtevano povećanje kreditnog limita sa [postojeći] na [zahtevani] RSD deluje veoma visoko s obzirom na finansijske pokazatelje.")
-                    *   (Tačka 5, npr., "Sudski spor [tuženi] [strana] [datum] [iznos]")
-                    ** *   (Primer ako je PPL rizik: "Povezano pravno lice [Naziv PPL-a ako je dostupan] je u blokadi/stečaju.")**
-                    ** *   ...**
-                    ** *   (Poslednja tačka, ako PPL postoji i nije sam po sebi rizik): "Napomena: Klijent ima povezana pravna lica (status: [status_PPL-a, npr. Aktivan])."**
-                *   **Crvene zastavice / anomalije:**
-                    *   (Tačka 1, ako postoji)
-                *   **Preporuka:** (Primeri akcionih preporuka, prilagoditi na osnovu analize)
-                    *   (Za visok rizik): "Preporučuje se odbijanje zahteva zbog [ključni razlog 1] i [ključni razlog 2]. Alternativno, ukoliko se izuzetno razmatra odobrenje, neophodno je obezbediti [vrsta dodatne garancije/kolaterala] i smanjiti traženi limit na maksimalno [iznos] RSD."
-                    *   (Za visok/srednji rizik sa potrebom za daljom analizom): "Visok/Srednji rizik. Preporučuje se detaljna provera [specifična oblast, npr. strukture potraživanja ili obaveza] i zahtevanje [dodatni dokument, npr. najnovijeg preseka stanja ili biznis plana za naredni period] pre konačne odluke. Razmotriti odobrenje samo uz limit ne veći od [iznos] RSD i pojačan monitoring."
-                    *   (Za srednji rizik): "Srednji rizik. Moguće je razmotriti odobrenje traženog limita, ali se savetuje oprez. Predlaže se odobrenje limita od [nešto niži iznos od traženog ili traženi iznos] RSD uz obavezan kvartalni monitoring [ključnog pokazatelja, npr. EBITDA ili likvidnosti]."
-                    *   (Za nizak rizik): "Nizak rizik. Finansijski pokazatelji i istorija poslovanja podržavaju zahtev. Preporučuje se odobrenje traženog kreditnog limita od [iznos] RSD uz standardne uslove praćenja."
-
-                    Uz opštu preporuku, navesti i dodatne procene:
-                    - **Na osnovu prometa:** da li je predlog kreditnog limita opravdan u odnosu na ostvareni godišnji promet (poslednja dostupna godina ili prosek).
-
-                Be factual, objective, and derive your insights directly from the provided JSON data.
-                The financial data in `finansijska_analizaEUR` and `rezimeEUR` is in EUR, while `prometRSD` and `predlogRSD` are in RSD. Be mindful of this but focus on the qualitative interpretation and trends unless direct comparison is essential and possible.
-
-                --- START OF CLIENT JSON DATA ---
-                {json.dumps(result_json, indent=2, ensure_ascii=False)}
-                --- END OF CLIENT JSON DATA ---
-                """
-    
-    print('Generisanje AI komentara')
-    ai_comment = generate_AIcomment(prompt_text, openai_api_key)
+    return name, result_json, time.perf_counter() - start
 
-    print('***********KOMENTAR***********')
-    print(ai_comment)
 
-    
-    comment_dir  = os.path.join(output_path, 'comments')
+def write_comment(name, ai_comment):
+    comment_dir  = os.path.join(LOCAL_OUTPUT_BASE_DIR, name, 'comments')
     os.makedirs(comment_dir, exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -122,26 +63,261 @@ def process_file(file_path):
 
     with open(comment_path, 'w', encoding='utf-8') as f:
         f.write(ai_comment)
+    return comment_path
+
+
+def process_file(file_path):
+    name, result_json, _ = parse_file(file_path)
+    prompt_text = build_prompt(name, result_json)
+    
+    print('Generisanje AI komentara')
+    ai_comment, _ = generate_routed(prompt_text, openai_api_key, result_json, PROMPT_VERSION)
+
+    print('***********KOMENTAR***********')
+    print(ai_comment)
+
+    write_comment(name, ai_comment)
+
+
+def generate_with_backoff(prompt_text, result_json, limiter):
+    tokens = estimate_tokens(prompt_text) + route(result_json)['max_output_tokens']
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(tokens)
+        try:
+            # 429 ne ponavlja llm_client: pauzu za sve niti određuje zajednički limiter
+            ai_comment, _ = generate_routed(prompt_text, openai_api_key, result_json, PROMPT_VERSION,
+                                            retry_rate_limits=False)
+            limiter.success()
+            return ai_comment
+        except RateLimitError as e:
+            if attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            delay = limiter.backoff(retry_after)
+            print(f'OpenAI limit dostignut (429), pauza {delay:.1f} s (pokušaj {attempt + 1}/{MAX_RATE_LIMIT_RETRIES})')
+
+
+def run_batch(file_paths, parse_workers=PARSE_WORKERS, llm_concurrency=LLM_CONCURRENCY,
+              rpm=OPENAI_RPM_LIMIT, tpm=OPENAI_TPM_LIMIT):
+    """Parsiranje u procesima, AI komentari u ograničenom broju niti uz RPM/TPM limite.
+    Vraća listu sa vremenima i greškama po fajlu."""
+    limiter = RateLimiter(rpm, tpm)
+    total = len(file_paths)
+    results = {fp: {'fajl': os.path.basename(fp), 'klijent': None, 'parsiranje_s': None, 'ai_s': None, 'greska': None}
+               for fp in file_paths}
+    progress_lock = threading.Lock()
+    finished = 0
+    started = time.perf_counter()
+
+    def report(file_path):
+        nonlocal finished
+        with progress_lock:
+            finished += 1
+            elapsed = time.perf_counter() - started
+            eta = elapsed / finished * (total - finished)
+            status = 'GREŠKA' if results[file_path]['greska'] else 'OK'
+            print(f'[{finished}/{total}] {results[file_path]["fajl"]}: {status} '
+                  f'(proteklo {elapsed:.0f} s, preostalo oko {eta:.0f} s)')
+
+    def comment_task(file_path, name, result_json):
+        start = time.perf_counter()
+        try:
+            ai_comment = generate_with_backoff(build_prompt(name, result_json), result_json, limiter)
+            write_comment(name, ai_comment)
+        except Exception as e:
+            results[file_path]['greska'] = f'AI komentar: {e}'
+        results[file_path]['ai_s'] = time.perf_counter() - start
+        report(file_path)
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool:
+        parse_futures = {parse_pool.submit(parse_file, fp): fp for fp in file_paths}
+        comment_futures = []
+        # AI komentar za fajl kreće čim je taj fajl isparsiran, ne čeka ostale
+        for future in as_completed(parse_futures):
+            file_path = parse_futures[future]
+            try:
+                name, result_json, parse_seconds = future.result()
+            except Exception as e:
+                results[file_path]['greska'] = f'Parsiranje: {e}'
+                report(file_path)
+                continue
+            results[file_path]['klijent'] = name
+            results[file_path]['parsiranje_s'] = parse_seconds
+            comment_futures.append(llm_pool.submit(comment_task, file_path, name, result_json))
+        wait(comment_futures)
+
+    summary = pd.DataFrame(list(results.values()))
+    failed = summary['greska'].notna().sum()
+    print('=========== REZIME ===========')
+    print(summary.to_string(index=False, float_format=lambda x: f'{x:.1f}'))
+    print(f'Ukupno: {total}, uspešno: {total - failed}, neuspešno: {failed}, '
+          f'429 odgovora: {limiter.throttled}, trajanje: {time.perf_counter() - started:.0f} s')
+    prompt_cache = cache_stats()
+    print(f"Keš prompta: {prompt_cache['kesirani_tokeni']}/{prompt_cache['ulazni_tokeni']} ulaznih tokena "
+          f"({prompt_cache['stopa_tokena']:.0%}), zahtevi sa pogotkom {prompt_cache['zahtevi_sa_pogotkom']}/{prompt_cache['zahtevi']}")
+    tier_stats = routing_stats()
+    if tier_stats:
+        print('Proseci po nivou rizika (za podešavanje AI_ROUTING_POLICY):')
+        print(pd.DataFrame(tier_stats).T.to_string(float_format=lambda x: f'{x:.1f}'))
+    return list(results.values())
+
+
+def response_output_text(body):
+    # isto što i response.output_text u SDK-u, ali nad JSON telom iz batch rezultata
+    return ''.join(
+        content.get('text', '')
+        for item in body.get('output', []) if item.get('type') == 'message'
+        for content in item.get('content', []) if content.get('type') == 'output_text'
+    )
+
+
+def submit_openai_batch(file_paths, parse_workers=PARSE_WORKERS):
+    """Parsira fajlove, pravi JSONL sa Responses zahtevima i šalje ga kao jedan OpenAI batch.
+    Manifest (custom_id -> klijent) se čuva u output/batches/<batch_id>.json da bi se rezultati
+    mogli preuzeti i posle restarta (--resume-batch)."""
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    requests_path = os.path.join(BATCH_DIR, f'{timestamp}_requests.jsonl')
+
+    manifest = {'requests_path': requests_path, 'items': {}, 'parse_errors': {}}
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            open(requests_path, 'w', encoding='utf-8') as f:
+        parse_futures = {parse_pool.submit(parse_file, fp): fp for fp in file_paths}
+        for i, future in enumerate(as_completed(parse_futures)):
+            file_path = parse_futures[future]
+            try:
+                name, result_json, _ = future.result()
+            except Exception as e:
+                print(f'Parsiranje nije uspelo za {file_path}: {e}')
+                manifest['parse_errors'][file_path] = str(e)
+                continue
+            custom_id = f'req-{i}'
+            settings = route(result_json)
+            manifest['items'][custom_id] = {'file_path': file_path, 'name': name, 'tier': settings['tier'],
+                                            'cache_key': comment_cache_key(result_json, PROMPT_VERSION, settings)}
+            request = {
+                'custom_id': custom_id,
+                'method': 'POST',
+                'url': '/v1/responses',
+                'body': {
+                    'input': build_prompt(name, result_json),
+                    **request_settings(settings),
+                },
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + '\n')
+
+    if not manifest['items']:
+        print('Nema zahteva za slanje.')
+        return None
+
+    client = llm_client.get_client(openai_api_key)
+    with open(requests_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose='batch')
+    batch = client.batches.create(input_file_id=input_file.id, endpoint='/v1/responses', completion_window='24h')
+
+    manifest['batch_id'] = batch.id
+    with open(os.path.join(BATCH_DIR, f'{batch.id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    print(f'Batch poslat: {batch.id} ({len(manifest["items"])} zahteva)')
+    return batch.id
+
+
+def collect_openai_batch(batch_id, poll_seconds=BATCH_POLL_SECONDS):
+    """Čeka da se batch završi i upisuje komentare u output/<klijent>/comments/."""
+    with open(os.path.join(BATCH_DIR, f'{batch_id}.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    client = llm_client.get_client(openai_api_key)
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts:
+            print(f'Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} završeno, {counts.failed} neuspešno)')
+        else:
+            print(f'Batch {batch_id}: {batch.status}')
+        if batch.status in BATCH_FINAL_STATUSES:
+            break
+        time.sleep(poll_seconds)
+
+    failures = dict(manifest.get('parse_errors', {}))
+    written = 0
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item = manifest['items'].get(record.get('custom_id'))
+            if item is None:
+                continue
+            response = record.get('response') or {}
+            if record.get('error') or response.get('status_code') != 200:
+                failures[item['file_path']] = str(record.get('error') or response.get('body'))
+                continue
+            ai_comment = response_output_text(response['body'])
+            usage = response['body'].get('usage') or {}
+            record_cache_usage({'input_tokens': usage.get('input_tokens'),
+                                'cached_tokens': (usage.get('input_tokens_details') or {}).get('cached_tokens')})
+            write_comment(item['name'], ai_comment)
+            comment_cache.set(item['cache_key'], ai_comment)
+            written += 1
+
+    if batch.error_file_id:
+        for line in client.files.content(batch.error_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item = manifest['items'].get(record.get('custom_id'))
+            if item is not None:
+                failures[item['file_path']] = str(record.get('error') or record.get('response'))
+
+    print('=========== REZIME ===========')
+    print(f'Batch {batch_id}: {batch.status}, upisano komentara: {written}, neuspešno: {len(failures)}')
+    prompt_cache = cache_stats()
+    print(f"Keš prompta: {prompt_cache['kesirani_tokeni']}/{prompt_cache['ulazni_tokeni']} ulaznih tokena "
+          f"({prompt_cache['stopa_tokena']:.0%}), zahtevi sa pogotkom {prompt_cache['zahtevi_sa_pogotkom']}/{prompt_cache['zahtevi']}")
+    for file_path, error in failures.items():
+        print(f'  {file_path}: {error}')
+    return written, failures
 
 
 if __name__ == "__main__":
 
-    file_paths = ['inputs\KOMPANIJA TAKOVO DOO_06_08_2025_14_33.xlsm']
+    parser = argparse.ArgumentParser(description='Generisanje AI komentara za sve .xlsm fajlove iz inputs/')
+    parser.add_argument('--input', default='inputs')
+    parser.add_argument('--serial', action='store_true', help='obrada fajl po fajl, bez paralelizma')
+    parser.add_argument('--parse-workers', type=int, default=PARSE_WORKERS)
+    parser.add_argument('--llm-concurrency', type=int, default=LLM_CONCURRENCY)
+    parser.add_argument('--rpm', type=int, default=OPENAI_RPM_LIMIT)
+    parser.add_argument('--tpm', type=int, default=OPENAI_TPM_LIMIT)
+    parser.add_argument('--openai-batch', action='store_true', help='slanje kroz OpenAI Batch API (rezultat u roku od 24h)')
+    parser.add_argument('--resume-batch', metavar='BATCH_ID', help='nastavak praćenja ranije poslatog batch-a')
+    parser.add_argument('--poll-seconds', type=int, default=BATCH_POLL_SECONDS)
+    args = parser.parse_args()
+
+    if args.resume_batch:
+        collect_openai_batch(args.resume_batch, args.poll_seconds)
+        raise SystemExit
 
-    input_path = 'inputs'
     file_paths = []
 
-    for root, dirs, files in os.walk(input_path):
+    for root, dirs, files in os.walk(args.input):
         for file in files:
             if file.lower().endswith('xlsm'):
                  file_paths.append(os.path.join(root, file))
 
-
-    for file_path in file_paths:
-        print(f'Obrada fajla {file_path}...')
-        process_file(file_path)
-        print('---------------------------------')
-
-        
-
-        
\ No newline at end of file
+    if args.openai_batch:
+        batch_id = submit_openai_batch(file_paths, args.parse_workers)
+        if batch_id:
+            collect_openai_batch(batch_id, args.poll_seconds)
+    elif args.serial:
+        for file_path in file_paths:
+            print(f'Obrada fajla {file_path}...')
+            process_file(file_path)
+            print('---------------------------------')
+    else:
+        run_batch(file_paths, args.parse_workers, args.llm_concurrency, args.rpm, args.tpm)
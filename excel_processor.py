@@ -1,198 +1,452 @@
+import io
+import numpy as np
 import pandas as pd
 import json
 import os
-import math
-import numpy as np
+import hashlib
 
 from openpyxl.utils import column_index_from_string
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+from openai import OpenAIError
 
-from openai import OpenAI
+import llm_client
+from cache_utils import DiskCache, file_sha256, data_sha256
+from client_record import ClientRecord, Table
+from sheet_stream import iter_sheet_rows, summarize_disputes, summarize_blockades, summarize_related
 
 LOCAL_OUTPUT_BASE_DIR = "output"
 os.makedirs(LOCAL_OUTPUT_BASE_DIR, exist_ok=True)
 
+# povećati kad god se promeni izlaz to_JSON, da stari keš ne bi bio korišćen
+EXTRACTOR_VERSION = 6
+JSON_CACHE_DIR = os.path.join(LOCAL_OUTPUT_BASE_DIR, 'cache', 'json')
+json_cache = DiskCache(JSON_CACHE_DIR, max_bytes=200 * 1024 * 1024, max_age_seconds=7 * 24 * 3600)
+
+AI_MODEL = "gpt-5-2025-08-07"
+# aritmetiku (DTS ocena, trendovi, tolerancija) unapred računa risk_metrics, pa je dovoljan srednji napor
+AI_REASONING = {"effort": "medium"}
+AI_TEXT = {"verbosity": "high"}
+AI_MAX_OUTPUT_TOKENS = 15000
+
+COMMENT_CACHE_DIR = os.path.join(LOCAL_OUTPUT_BASE_DIR, 'cache', 'komentari')
+comment_cache = DiskCache(COMMENT_CACHE_DIR, max_bytes=50 * 1024 * 1024, max_age_seconds=7 * 24 * 3600)
+
 def get_cell_value(df, cell_address):
     col_letter = ''.join(filter(str.isalpha, cell_address))
     row_number = int(''.join(filter(str.isdigit, cell_address))) - 1 # excel krece numeraciju od 1
     col_index = column_index_from_string(col_letter) - 1 # excel krece numeraciju od 1
     return df.iloc[row_number, col_index]
 
-def remove_nan(obj):
-    if isinstance(obj, float) and math.isnan(obj):
-        return None
-    elif isinstance(obj, dict):
-        return {k: remove_nan(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [remove_nan(i) for i in obj]
-    return obj
+# pandas read_excel podrazumevano čita ove tekstove kao NaN
+NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+
+def _convert_cell(cell):
+    # isto kao pandas (openpyxl čitač): prazno -> "", greška (#DIV/0!) -> NaN, celi brojevi -> int
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def _column_indexes(usecols):
+    # 'E:F' ili 'A,C:D' -> indeksi kolona od 0
+    indexes = []
+    for part in usecols.replace(' ', '').split(','):
+        first, _, last = part.partition(':')
+        start = column_index_from_string(first) - 1
+        indexes.extend(range(start, column_index_from_string(last or first)))
+    return indexes
+
+
+# tekst koji pandas čita kao logičku vrednost kad je cela kolona takva
+BOOL_STRINGS = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
+
+def _infer_column(values):
+    # kao pd.read_excel: NA tekstovi -> NaN, kolona samo od brojeva (i brojeva kao teksta) -> broj,
+    # True/False kao tekst -> bool, inače ostaju izvorne vrednosti (datumi sa NaN -> datetime64)
+    series = pd.Series([np.nan if isinstance(v, str) and v in NA_STRINGS else v for v in values], dtype=object)
+    present = series.dropna()
+    if series.empty:
+        return series
+    if all(isinstance(v, (str, int, float)) for v in present):
+        try:
+            return pd.to_numeric(series)
+        except (ValueError, TypeError):
+            pass
+    # pandas pamti prvu od jednakih vrednosti (1 posle True ostaje True, 1.0 posle 1 ostaje 1)
+    seen = {}
+    series = pd.Series([seen.setdefault(v, v) for v in series], dtype=object)
+    present = series.dropna()
+    if all(isinstance(v, bool) or (isinstance(v, str) and v in BOOL_STRINGS) for v in present):
+        flags = series.map(lambda v: BOOL_STRINGS.get(v, v) if isinstance(v, str) else v)
+        return flags.astype(bool) if len(present) == len(series) else flags
+    return series.infer_objects()
+
+
+def _unique_names(names):
+    # duplirani nazivi kolona dobijaju .1, .2 ... (kao pandas)
+    seen = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        while count and f"{name}.{count}" in seen:
+            count += 1
+        seen[name] = count + 1
+        unique.append(f"{name}.{count}" if count else name)
+    return unique
+
+
+class WorkbookSnapshot:
+    """Excel fajl otvoren jednom (openpyxl, read-only). Svaki list se pretvori u redove samo jednom,
+    a read() pravi DataFrame za region iz tih redova, sa istim pravilima kao pd.read_excel."""
+
+    def __init__(self, file_path):
+        self.book = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+        self._sheet_rows = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.book.close()
+        self._sheet_rows.clear()
+
+    def sheet_rows(self, sheet):
+        """Redovi lista (po imenu ili rednom broju), bez praznih ćelija na kraju reda."""
+        worksheet = self.book.worksheets[sheet] if isinstance(sheet, int) else self.book[sheet]
+        if worksheet.title not in self._sheet_rows:
+            worksheet.reset_dimensions()
+            rows = []
+            for row in worksheet.rows:
+                converted_row = [_convert_cell(cell) for cell in row]
+                while converted_row and converted_row[-1] == "":
+                    converted_row.pop()
+                rows.append(converted_row)
+            self._sheet_rows[worksheet.title] = rows
+        return self._sheet_rows[worksheet.title]
+
+    def read(self, sheet=0, usecols=None, skiprows=0, nrows=None, header=0):
+        """Region lista kao DataFrame; usecols/skiprows/nrows/header kao u pd.read_excel.
+        Prazni redovi unutar regiona ostaju (NaN), prazni redovi na kraju se odbacuju."""
+        data = self.sheet_rows(sheet)
+        if nrows is not None:
+            data = data[:skiprows + (1 if header is None else header + 1) + nrows]
+        while data and not data[-1]:
+            data = data[:-1]
+        width = max((len(row) for row in data), default=0)
+        data = [row + [""] * (width - len(row)) for row in data[skiprows:]]
+        if not data:
+            return pd.DataFrame()
+
+        if header is None:
+            names = list(range(width))
+        else:
+            if header >= len(data):
+                raise ValueError(f"Red zaglavlja {header} je van opsega")
+            names = _unique_names([f"Unnamed: {i}" if value == "" else value for i, value in enumerate(data[header])])
+            data = data[header + 1:]
+        if nrows is not None:
+            data = data[:nrows]
+
+        indexes = list(range(width)) if usecols is None else _column_indexes(usecols)
+        missing = [i for i in indexes if i >= width]
+        if missing:
+            raise ValueError(f"Kolone {missing} su van opsega lista")
+        return pd.DataFrame({names[i]: _infer_column([row[i] for row in data]) for i in indexes})
+
+def clean_df(df):
+    # NaN -> None, datumi -> tekst, u jednom prolazu (client_record)
+    return Table.from_frame(df).to_records()
 
 def to_JSON(file_path):
+    return parse_record(file_path).to_dict()
 
-    def clean_df(df):
-        df = df.copy()
-        for col in df.columns:
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[col] = df[col].astype(str)
-            else:
-                df[col] = df[col].replace({np.nan: None})
-        return df.to_dict(orient='records')
+def parse_record(file_path):
+    """Sve sekcije radne sveske kao ClientRecord; vrednosti su već spremne za JSON.
+    file_path može biti i sadržaj fajla (bytes) - čita se iz memorije, bez diska."""
+    if isinstance(file_path, (bytes, bytearray)):
+        # BytesIO nad bytes ne kopira sadržaj dok se ne menja
+        file_path = io.BytesIO(file_path)
 
+    # radna sveska se otvara i parsira jednom, svi regioni se čitaju iz iste kopije;
+    # zatvara se i kad čitanje pukne
+    with WorkbookSnapshot(file_path) as book:
+        return _parse_book(book)
+
+def _parse_book(book):
     all_data = {}
+    # veliki listovi se čitaju red po red; u JSON idu zbirovi i najznačajniji redovi (sheet_stream)
+    summary = {}
 
     #LIST KUPAC
     sheet_name_kupac = 'Kupac'
     print(f"Obrada lista {sheet_name_kupac}")
     try:
-        df1= pd.read_excel(file_path, engine='openpyxl', usecols='E:F', skiprows=4, header=None, nrows=12, sheet_name=0)
+        df1= book.read(0, usecols='E:F', skiprows=4, header=None, nrows=12)
         df1.columns= ['Atribut', 'Vrednost']
-        all_data["osnovne_informacije"] = clean_df(df1)
+        all_data["osnovne_informacije"] = Table.from_frame(df1)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela osnovne informacije: {e}. Preskačem.")
-        all_data["osnovne_informacije"] = []
+        all_data["osnovne_informacije"] = Table()
 
     try:
-        df2= pd.read_excel(file_path, engine='openpyxl', usecols='E:F', skiprows=18, header=None, nrows=29, sheet_name=0)
+        df2= book.read(0, usecols='E:F', skiprows=18, header=None, nrows=29)
         df2.columns= ['Atribut', 'Vrednost RSD bez PDV']
         df2 = df2.dropna()
-        all_data["prometRSD"] = clean_df(df2)
+        all_data["prometRSD"] = Table.from_frame(df2)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela promet: {e}. Preskačem.")
-        all_data["prometRSD"] = []
+        all_data["prometRSD"] = Table()
 
 
     try:
-        df3= pd.read_excel(file_path, engine='openpyxl', usecols='I:J', skiprows=9, header=None, nrows=11, sheet_name=0)
+        df3= book.read(0, usecols='I:J', skiprows=9, header=None, nrows=11)
         df3.columns= ['Atribut', 'Vrednost']
-        all_data["ocena_rizika"] = clean_df(df3)
+        all_data["ocena_rizika"] = Table.from_frame(df3)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela ocena rizika: {e}. Preskačem.")
-        all_data["ocena_rizika"] = []
+        all_data["ocena_rizika"] = Table()
 
 
     #EUR
     try:
-        df4= pd.read_excel(file_path, engine='openpyxl', usecols='I:N', skiprows=26, header=0, nrows=21, sheet_name=0)
+        df4= book.read(0, usecols='I:N', skiprows=26, header=0, nrows=21)
         df4.columns = df4.columns.astype(str)
         df4 = df4.rename(columns={df4.columns[0]: "Atribut"})
-        all_data["finansijska_analizaEUR"] = clean_df(df4)
+        all_data["finansijska_analizaEUR"] = Table.from_frame(df4)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela finansijska analiza: {e}. Preskačem.")
-        all_data["finansijska_analizaEUR"] = []
+        all_data["finansijska_analizaEUR"] = Table()
 
 
     try:
-        df5= pd.read_excel(file_path, engine='openpyxl', usecols='E:F', skiprows=50, header=None, nrows=6, sheet_name=0)
+        df5= book.read(0, usecols='E:F', skiprows=50, header=None, nrows=6)
         df5.columns = ['Atribut', 'Vrednost RSD']
-        all_data["predlogRSD"] = clean_df(df5)
+        all_data["predlogRSD"] = Table.from_frame(df5)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela predlog kreditnog limita: {e}. Preskačem.")
-        all_data["predlogRSD"] = []
+        all_data["predlogRSD"] = Table()
 
     
     try:
-        df6_1 = pd.read_excel(file_path, sheet_name=0, usecols="L:O", skiprows=7, nrows=1, header=1, engine='openpyxl')
+        df6_1 = book.read(0, usecols="L:O", skiprows=7, nrows=1, header=1)
         prefix = df6_1.columns[0]
         df6_1 = df6_1.drop(columns=[prefix])
         df6_1.columns = [f"{prefix} {col}" for col in df6_1.columns]
 
-        df6_2 = pd.read_excel(file_path, sheet_name=0, usecols="L:M", skiprows=10, nrows=1, header=None, engine='openpyxl')
+        df6_2 = book.read(0, usecols="L:M", skiprows=10, nrows=1, header=None)
         col_name = df6_2.iloc[0,0]
         value = df6_2.iloc[0,1]
         df6_2= pd.DataFrame({col_name: [value]})
 
-        df6_3 = pd.read_excel(file_path, sheet_name=0, usecols="L:M", skiprows=11, nrows=1, header=None, engine='openpyxl')
+        df6_3 = book.read(0, usecols="L:M", skiprows=11, nrows=1, header=None)
         col_name = df6_3.iloc[0,0]
         value = df6_3.iloc[0,1]
         df6_3= pd.DataFrame({col_name: [value]})
 
         df6 = pd.concat([df6_1, df6_2, df6_3], axis=1)
-        all_data["bonitetna_ocena"] = clean_df(df6)
+        all_data["bonitetna_ocena"] = Table.from_frame(df6)
     except Exception as e:
             print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela bonitetna ocena: {e}. Preskačem.")
-            all_data["bonitetna_ocena"] = []
+            all_data["bonitetna_ocena"] = Table()
 
 
     try:
-        df7 = pd.read_excel(
-            file_path,
-            sheet_name=0,
-            usecols="I:K",
-            skiprows=52,
-            header=0,
-            engine='openpyxl'
-        )
+        df7 = book.read(0, usecols="I:K", skiprows=52, header=0)
         if df7.dropna(how='all').empty:
             print("Tabela kreditne istorije je prazna.")
             df7 = df7.dropna(how='all')
-        all_data["istorijaKL"] = clean_df(df7)
+        all_data["istorijaKL"] = Table.from_frame(df7)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_kupac}', tabela kreditne istorije: {e}. Preskačem.")
-        all_data["istorijaKL"] = []
+        all_data["istorijaKL"] = Table()
 
     # LIST SUDSKI SPOROVI
     sheet_name_sporovi = 'Sudski sporovi'
     print(f"Obrada lista {sheet_name_sporovi}")
     try:
-        df9 = pd.read_excel(file_path, sheet_name=sheet_name_sporovi, engine='openpyxl')
-        all_data["sudski sporovi"] = clean_df(df9)
-        if df9.empty:
+        columns, rows, summary["sudski sporovi"] = summarize_disputes(iter_sheet_rows(book.book[sheet_name_sporovi]))
+        all_data["sudski sporovi"] = Table.from_records(columns, rows)
+        if not rows:
             print("Tabela sudskih sporova je prazna.")
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_sporovi}': {e}. Preskačem.")
-        all_data["sudski sporovi"] = []
+        all_data["sudski sporovi"] = Table()
 
     #LIST REZIME
     sheet_name_rezime = 'Rezime (EUR)'
     print(f"Obrada lista {sheet_name_rezime}")
     try:
-        df8 = pd.read_excel(file_path, sheet_name=sheet_name_rezime, skiprows=3, nrows=30, header=0, engine='openpyxl')
+        df8 = book.read(sheet_name_rezime, skiprows=3, nrows=30, header=0)
         df8 = df8.loc[:, ~df8.columns.astype(str).str.startswith("Unnamed")]
-        all_data["rezimeEUR"] = clean_df(df8)
+        all_data["rezimeEUR"] = Table.from_frame(df8)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_rezime}': {e}. Preskačem.")
-        all_data["rezimeEUR"] = []
+        all_data["rezimeEUR"] = Table()
 
 
      # LIST POVEZANA LICA
     sheet_name_povezana = 'Povezana lica'
     print(f"Obrada lista {sheet_name_povezana}")
     try:
-        df10 = pd.read_excel(file_path, sheet_name=sheet_name_povezana, usecols="A:D",  header=0, engine='openpyxl')
-        all_data["povezana_lica"] = clean_df(df10)
+        # kolone A:D
+        columns, rows, summary["povezana_lica"] = summarize_related(iter_sheet_rows(book.book[sheet_name_povezana], max_columns=4))
+        all_data["povezana_lica"] = Table.from_records(columns, rows)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_povezana}': {e}. Preskačem.")
-        all_data["povezana_lica"] = []
+        all_data["povezana_lica"] = Table()
 
     # LIST BLOKADE
     sheet_name_blokade = 'Blokade'
     print(f"Obrada lista {sheet_name_blokade}")
     try:
-        df11 = pd.read_excel(file_path, sheet_name=sheet_name_blokade,  header=0, engine='openpyxl')
-        all_data['istorija_blokada'] = clean_df(df11)
+        columns, rows, summary["istorija_blokada"] = summarize_blockades(iter_sheet_rows(book.book[sheet_name_blokade]))
+        all_data['istorija_blokada'] = Table.from_records(columns, rows)
     except Exception as e:
         print(f"Nije moguće pročitati list '{sheet_name_blokade}': {e}. Preskačem.")
-        all_data["istorija_blokada"] = []
+        all_data["istorija_blokada"] = Table()
+
 
+    return ClientRecord(all_data, summary)
 
-    result = json.loads(json.dumps(all_data, default=str))
-    clean_result = json.loads(json.dumps(result, default=str))
-    clean_result = remove_nan(all_data)
-    return clean_result   
+def to_JSON_cached(file_path, logger=None, executor=None, data=None):
+    # ključ je sadržaj fajla, ne ime - isti fajl uploadovan ponovo daje pogodak;
+    # data (bytes) = fajl je već u memoriji i disk se ne čita
+    source = file_path if data is None else data
+    key = f"{file_sha256(file_path) if data is None else data_sha256(data)}_v{EXTRACTOR_VERSION}"
+    cached = json_cache.get(key)
+    if cached is None:
+        status = 'promašaj'
+        # executor (npr. ProcessPoolExecutor) - parsiranje van niti koja poziva; ClientRecord
+        # (torke umesto rečnika po redu) se jeftinije prenosi između procesa
+        record = executor.submit(parse_record, source).result() if executor else parse_record(source)
+        # keš čuva kompaktan zapis po kolonama, ne rečnike
+        json_cache.set(key, record.to_columns())
+    else:
+        status = 'pogodak'
+        record = ClientRecord.from_columns(cached)
+    result = record.to_dict()
 
-def generate_AIcomment(prompt, key):
-  # Inicijalizuj klijenta
-  client = OpenAI(api_key=key)
+    stats = json_cache.stats()
+    message = f"Keš JSON-a: {status} (pogoci: {stats['hits']}, promašaji: {stats['misses']})"
+    if logger:
+        logger.info(message)
+    else:
+        print(message)
+    return result
 
-  response = client.responses.create(
-      model = "gpt-5-2025-08-07",
+def request_settings(settings=None):
+  """Model i podešavanja zahteva; bez settings (npr. iz model_routing.route) važe podrazumevana."""
+  settings = settings or {}
+  return {
+      'model': settings.get('model', AI_MODEL),
+      'reasoning': settings.get('reasoning', AI_REASONING),
+      'text': settings.get('text', AI_TEXT),
+      'max_output_tokens': settings.get('max_output_tokens', AI_MAX_OUTPUT_TOKENS),
+  }
+
+def _record_usage(usage, response_usage):
+  # usage je rečnik pozivaoca koji se popunjava potrošnjom tokena (za logovanje po nivou rizika)
+  if usage is None or response_usage is None:
+      return
+  details = getattr(response_usage, 'output_tokens_details', None)
+  input_details = getattr(response_usage, 'input_tokens_details', None)
+  usage['input_tokens'] = response_usage.input_tokens
+  usage['output_tokens'] = response_usage.output_tokens
+  usage['reasoning_tokens'] = getattr(details, 'reasoning_tokens', None)
+  # deo ulaza koji je OpenAI preuzeo iz keša prefiksa prompta
+  usage['cached_tokens'] = getattr(input_details, 'cached_tokens', None)
+
+def generate_AIcomment(prompt, key, settings=None, usage=None, retry_rate_limits=True):
+  # deljeni klijent (keep-alive konekcije, timeout budžet, retry, circuit breaker)
+  response = llm_client.create_response(
+      key,
+      retry_rate_limits=retry_rate_limits,
       input=prompt,
-      reasoning={
-          "effort": "high"
-      },
-      text={
-          "verbosity": "high"
-      },
-      max_output_tokens= 15000
+      **request_settings(settings)
   )
+  _record_usage(usage, response.usage)
   
-  return response.output_text
\ No newline at end of file
+  return response.output_text
+
+def generate_AIcomment_stream(prompt, key, settings=None, usage=None, retry_rate_limits=True):
+  """Isto kao generate_AIcomment, ali vraća delove teksta (delta) čim stignu."""
+  stream = llm_client.stream_response(
+      key,
+      retry_rate_limits=retry_rate_limits,
+      input=prompt,
+      **request_settings(settings)
+  )
+
+  for event in stream:
+      if event.type == "response.output_text.delta":
+          yield event.delta
+      elif event.type == "response.completed":
+          _record_usage(usage, event.response.usage)
+      elif event.type == "response.failed":
+          error = event.response.error
+          raise OpenAIError(f"Generisanje AI komentara nije uspelo: {error.message if error else 'nepoznata greška'}")
+      elif event.type == "error":
+          raise OpenAIError(f"Greška u toku strima: {event.message}")
+
+def comment_cache_key(client_json, prompt_version, settings=None):
+    # u ključ ulazi samo ono što menja komentar: podaci klijenta (kanonski JSON),
+    # verzija prompta, model i podešavanja; datum iz prompta se namerno ne koristi
+    canonical = json.dumps({
+        'client': client_json,
+        'prompt_version': prompt_version,
+        **request_settings(settings),
+    }, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def generate_AIcomment_cached(prompt, key, client_json, prompt_version, regenerate=False, logger=None, on_delta=None,
+                              settings=None, usage=None, retry_rate_limits=True):
+    """Vraća (komentar, iz_keša). Sa regenerate=True keš se preskače, a novi komentar ga prepisuje.
+    Ako je zadat on_delta, komentar se strimuje i on_delta se poziva za svaki deo teksta
+    (kod pogotka u kešu jednom, sa celim komentarom). retry_rate_limits=False prosleđuje 429
+    pozivaocu bez ponovnog pokušaja (llm_client)."""
+    cache_key = comment_cache_key(client_json, prompt_version, settings)
+    ai_comment = None if regenerate else comment_cache.get(cache_key)
+    from_cache = ai_comment is not None
+    if from_cache:
+        if on_delta:
+            on_delta(ai_comment)
+    elif on_delta:
+        parts = []
+        for delta in generate_AIcomment_stream(prompt, key, settings, usage, retry_rate_limits):
+            parts.append(delta)
+            on_delta(delta)
+        ai_comment = ''.join(parts)
+        comment_cache.set(cache_key, ai_comment)
+    else:
+        ai_comment = generate_AIcomment(prompt, key, settings, usage, retry_rate_limits)
+        comment_cache.set(cache_key, ai_comment)
+
+    stats = comment_cache.stats()
+    status = 'regenerisan' if regenerate else ('pogodak' if from_cache else 'promašaj')
+    message = (f"Keš AI komentara: {status} (pogoci: {stats['hits']}, promašaji: {stats['misses']}, "
+               f"stopa pogodaka: {stats['hit_rate']:.0%})")
+    if not from_cache:
+        llm_stats = llm_client.stats()
+        message += (f"; OpenAI klijent: zahtevi {llm_stats['requests']}, nove konekcije {llm_stats['new_connections']}, "
+                    f"ponovo korišćene {llm_stats['reused_connections']}, ponovljeni pokušaji {llm_stats['retries']}, "
+                    f"circuit {llm_stats['circuit']}")
+    if logger:
+        logger.info(message)
+    else:
+        print(message)
+    return ai_comment, from_cache
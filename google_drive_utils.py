@@ -1,8 +1,17 @@
+import io
 import os
+import time
+import hashlib
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 from google.auth.transport.requests import Request
 
 import streamlit as st
@@ -10,9 +19,47 @@ import streamlit as st
 # dozvola za upload fajlova
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# fajlovi manji od ovoga idu jednim (simple) zahtevom umesto resumable sesije
+SIMPLE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+UPLOAD_WORKERS = 3
+HTTP_TIMEOUT_SECONDS = 60
+# za testiranje protiv lažnog Drive servera
+DRIVE_API_ENDPOINT = os.getenv("GOOGLE_DRIVE_API_ENDPOINT")
+# sadržaj foldera (MD5 -> ID) se čita sa Drive-a najviše jednom u ovom periodu; uploadi iz ovog
+# procesa se dodaju u keš, pa outbox ne lista ceo folder pri svakom slanju
+FOLDER_CACHE_SECONDS = int(os.getenv("DRIVE_FOLDER_CACHE_SECONDS", "600"))
+
+_creds_lock = threading.Lock()
+_cached_creds = None
+_service_lock = threading.Lock()
+_service = None
+_thread_local = threading.local()
+_folder_lock = threading.Lock()
+# folder_id -> (vreme čitanja, {md5Checksum: ID})
+_folder_cache = {}
+
 
 def google_drive_auth(logger):
+    """Kredencijali se čuvaju u procesu i osvežavaju tek kad isteknu."""
+    global _cached_creds
+    with _creds_lock:
+        if _cached_creds is not None and _cached_creds.valid:
+            return _cached_creds
+        if _cached_creds is not None and _cached_creds.refresh_token:
+            try:
+                _cached_creds.refresh(Request())
+                logger.info("Token osvežen.")
+                return _cached_creds
+            except Exception as e:
+                logger.error(f"Greška pri osvežavanju tokena: {e}")
+
+        _cached_creds = _load_drive_credentials(logger)
+        return _cached_creds
+
+
+def _load_drive_credentials(logger):
     creds = None
+    credentials_info = None
     try:
         token_info = st.secrets.get("google_drive", {}).get("token", None)
         credentials_info = st.secrets.get("google_drive", {}).get("credentials", None)
@@ -96,18 +143,118 @@ def google_drive_auth2(logger):
     return creds
 
 
-def upload_drive(file_path, creds, folder_id, logger):
+def get_drive_service(creds):
+    # discovery dokument se učitava samo jednom po procesu
+    global _service
+    with _service_lock:
+        if _service is None:
+            client_options = {'api_endpoint': DRIVE_API_ENDPOINT} if DRIVE_API_ENDPOINT else None
+            _service = build('drive', 'v3', credentials=creds, cache_discovery=False, client_options=client_options)
+        return _service
+
+
+def _authorized_http(creds):
+    # httplib2 nije bezbedan za više niti, zato svaka nit ima svoju konekciju
+    http = getattr(_thread_local, 'http', None)
+    if http is None or http.credentials is not creds:
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+        _thread_local.http = http
+    return http
+
+
+def file_md5(file_path, chunk_size=1024 * 1024):
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def list_folder_md5(creds, folder_id):
+    """md5Checksum -> ID za fajlove u folderu (vidljivi su samo fajlovi koje je aplikacija napravila)."""
+    service = get_drive_service(creds)
+    existing = {}
+    page_token = None
+    while True:
+        response = service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields='nextPageToken, files(id, md5Checksum)',
+            pageSize=1000,
+            pageToken=page_token,
+        ).execute(http=_authorized_http(creds))
+        for f in response.get('files', []):
+            if f.get('md5Checksum'):
+                existing[f['md5Checksum']] = f['id']
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return existing
+
+
+def _cached_folder_md5(creds, folder_id, now=None):
+    now = time.monotonic() if now is None else now
+    with _folder_lock:
+        cached = _folder_cache.get(folder_id)
+        if cached and now - cached[0] < FOLDER_CACHE_SECONDS:
+            return cached[1]
+    existing = list_folder_md5(creds, folder_id)
+    with _folder_lock:
+        _folder_cache[folder_id] = (now, existing)
+    return existing
+
+
+def _remember_upload(folder_id, md5, file_id):
+    with _folder_lock:
+        cached = _folder_cache.get(folder_id)
+        if cached:
+            cached[1][md5] = file_id
+
+
+def upload_drive(file_path, creds, folder_id, logger, data=None):
+    """Upload fajla; ako je zadat data (bytes), sadržaj se šalje iz memorije, a file_path daje samo ime."""
 
     try:
-        service = build('drive', 'v3', credentials=creds)
+        service = get_drive_service(creds)
         file_metadata = {
             'name': os.path.basename(file_path),
             'parents': [folder_id]
         }
-        media = MediaFileUpload(file_path, resumable=True)
-        file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+        if data is not None:
+            mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mimetype, resumable=len(data) > SIMPLE_UPLOAD_MAX_BYTES)
+        else:
+            resumable = os.path.getsize(file_path) > SIMPLE_UPLOAD_MAX_BYTES
+            media = MediaFileUpload(file_path, resumable=resumable)
+        file = service.files().create(body=file_metadata, media_body=media, fields='id').execute(http=_authorized_http(creds))
         logger.info(f"Fajl '{file_path}' uspešno uploadovan sa ID: {file.get('id')}")
         return file.get('id')
     except Exception as e:
         logger.error(f"Greška pri uploadu fajla '{file_path}': {e}")
         return None
+
+
+def upload_drive_many(file_paths, creds, folder_id, logger, data=None):
+    """Paralelni upload više fajlova; fajl čiji MD5 već postoji u folderu (keš sadržaja foldera,
+    FOLDER_CACHE_SECONDS) se preskače.
+    data: {putanja: bytes} za fajlove čiji je sadržaj već u memoriji (ne čitaju se sa diska).
+    Vraća {putanja: ID na Drive-u ili None ako upload nije uspeo}."""
+    data = data or {}
+    try:
+        existing = _cached_folder_md5(creds, folder_id)
+    except Exception as e:
+        logger.error(f"Greška pri čitanju sadržaja Drive foldera: {e}")
+        existing = {}
+
+    def upload_one(file_path):
+        content = data.get(file_path)
+        md5 = hashlib.md5(content).hexdigest() if content is not None else file_md5(file_path)
+        file_id = existing.get(md5)
+        if file_id:
+            logger.info(f"Fajl '{file_path}' već postoji na Drive-u (ID: {file_id}), upload preskočen.")
+            return file_id
+        file_id = upload_drive(file_path, creds, folder_id, logger, data=content)
+        if file_id:
+            _remember_upload(folder_id, md5, file_id)
+        return file_id
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        return dict(zip(file_paths, pool.map(upload_one, file_paths)))
@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import uuid
+import types
+import contextlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Zajednički bazeni za ceo proces (sve sesije): niti za I/O (Drive, OpenAI),
+# procesi za parsiranje Excel fajlova
+IO_WORKERS = 8
+PARSE_WORKERS = 2
+# koliko analiza jedne grupe fajlova (upload više fajlova odjednom) radi istovremeno
+BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "4"))
+# završeni poslovi se čuvaju ovoliko dugo da bi korisnik mogao da ih preuzme i posle osvežavanja
+JOB_RETENTION_SECONDS = 3600
+
+_lock = threading.Lock()
+_main_lock = threading.RLock()
+_jobs = {}
+_io_pool = None
+_parse_pool = None
+_broken_parse_pools = []
+
+
+def io_pool():
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="fin-app-io")
+        return _io_pool
+
+
+@contextlib.contextmanager
+def _neutral_main():
+    # Streamlit izvršava app.py kao lažni modul __main__ (sa __file__), pa bi ga forkserver/spawn
+    # ponovo izvršio u svakom radnom procesu; dok se procesi pokreću, __main__ je prazan modul
+    # (jedna nit u isto vreme, inače bi druga nit "vratila" prazan modul)
+    with _main_lock:
+        script_main = sys.modules['__main__']
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = script_main
+
+
+def _current_parse_pool():
+    global _parse_pool
+    with _lock:
+        _broken_parse_pools[:] = [p for p in _broken_parse_pools
+                                  if getattr(p, '_executor_manager_thread', None) and p._executor_manager_thread.is_alive()]
+        if _parse_pool is None:
+            # forkserver, a ne fork: proces aplikacije ima niti (Streamlit, I/O bazen, outbox), a fork
+            # kopira i zaključane lock-ove; radni procesi nastaju iz jednonitnog servera koji je
+            # unapred uvezao parser
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["excel_processor"])
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+        return _parse_pool
+
+
+def _discard_parse_pool(pool):
+    # pokvaren bazen (radni proces je pao: OOM, segfault u openpyxl/lxml) se ne koristi ponovo;
+    # sledeći submit pravi novi. Pokvaren ProcessPoolExecutor sam gasi svoje procese (shutdown
+    # ovde nije bezbedan: poziva se i iz njegove niti, dok drži njegov lock)
+    global _parse_pool
+    with _lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+            # referenca se čuva dok se nit bazena ne završi: kad bi bazen bio oslobođen u toj niti,
+            # njegov weakref callback bi čekao lock koji ta nit već drži
+            _broken_parse_pools.append(pool)
+
+
+class ParsePool:
+    """Bazen procesa za parsiranje. Procesi nastaju u submit-u (ProcessPoolExecutor ih pravi i
+    zamenjuje po potrebi), pa je svaki submit u _neutral_main(). Kad radni proces padne, bazen se
+    zamenjuje novim i zadatak se pokušava još jednom."""
+
+    RETRIES = 1
+
+    def submit(self, fn, *args, **kwargs):
+        result = Future()
+        self._submit(result, fn, args, kwargs, self.RETRIES)
+        return result
+
+    def _submit(self, result, fn, args, kwargs, retries):
+        pool = _current_parse_pool()
+        try:
+            with _neutral_main():
+                future = pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool as e:
+            _discard_parse_pool(pool)
+            if retries:
+                return self._submit(result, fn, args, kwargs, retries - 1)
+            result.set_exception(e)
+            return
+
+        def done(future):
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                _discard_parse_pool(pool)
+                if retries:
+                    return self._submit(result, fn, args, kwargs, retries - 1)
+            if error is not None:
+                result.set_exception(error)
+            else:
+                result.set_result(future.result())
+        future.add_done_callback(done)
+
+    def shutdown(self, wait=True):
+        global _parse_pool
+        with _lock:
+            pool, _parse_pool = _parse_pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+_parse_executor = ParsePool()
+
+
+def parse_pool():
+    """Zajednički bazen za parsiranje (ParsePool); ima submit kao ProcessPoolExecutor."""
+    return _parse_executor
+
+
+class Job:
+    """Stanje jednog posla u pozadini; menja ga samo nit koja ga izvršava, UI ga samo čita."""
+
+    def __init__(self, user, stages, params, batch=None, transient_params=()):
+        self.id = uuid.uuid4().hex[:12]
+        self.user = user
+        self.batch = batch
+        self.stages = list(stages)
+        self.params = params
+        # ovi parametri (npr. sadržaj fajla) trebaju samo dok posao radi; brišu se kad se završi
+        self.transient_params = tuple(transient_params)
+        self.stage = None
+        self.completed_stages = []
+        self.status = 'queued'
+        self.partial_text = ''
+        self.result = {}
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.collected = False
+
+    def start_stage(self, stage):
+        if self.stage is not None:
+            self.completed_stages.append(self.stage)
+        self.stage = stage
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 1.0
+        return len(self.completed_stages) / len(self.stages) if self.stages else 0.0
+
+
+def _run(job, fn, kwargs):
+    job.status = 'running'
+    try:
+        job.result = fn(job, **kwargs)
+        job.status = 'done'
+    except Exception as e:
+        job.error = e
+        job.status = 'error'
+    finally:
+        if job.stage is not None:
+            job.completed_stages.append(job.stage)
+        job.stage = None
+        for key in job.transient_params:
+            job.params.pop(key, None)
+        job.finished = time.time()
+
+
+def _prune():
+    now = time.time()
+    with _lock:
+        for job_id in [j.id for j in _jobs.values() if j.finished and now - j.finished > JOB_RETENTION_SECONDS]:
+            del _jobs[job_id]
+
+
+def submit(user, stages, fn, fn_kwargs, params=None, transient_params=()):
+    """Pokreće fn(job, **fn_kwargs) u pozadini i vraća ID posla. transient_params su ključevi
+    iz params koji se brišu kad se posao završi."""
+    _prune()
+    job = Job(user, stages, params or {}, transient_params=transient_params)
+    with _lock:
+        _jobs[job.id] = job
+    io_pool().submit(_run, job, fn, fn_kwargs)
+    return job.id
+
+
+def submit_batch(user, stages, fn, fn_kwargs_list, params_list=None, max_parallel=None):
+    """Pokreće fn za svaki element fn_kwargs_list, najviše max_parallel istovremeno (sopstveni
+    bazen niti grupe, da grupa ne zauzme zajednički I/O bazen). Vraća (ID grupe, ID-jevi poslova)."""
+    _prune()
+    batch_id = uuid.uuid4().hex[:12]
+    params_list = params_list or [{} for _ in fn_kwargs_list]
+    jobs = [Job(user, stages, params, batch=batch_id) for params in params_list]
+    with _lock:
+        for job in jobs:
+            _jobs[job.id] = job
+    pool = ThreadPoolExecutor(max_workers=max_parallel or BATCH_PARALLELISM, thread_name_prefix="fin-app-batch")
+    for job, kwargs in zip(jobs, fn_kwargs_list):
+        pool.submit(_run, job, fn, kwargs)
+    # niti se gase same kad obrade sve poslove grupe
+    pool.shutdown(wait=False)
+    return batch_id, [job.id for job in jobs]
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def active_job_for_user(user):
+    """Poslednji posao korisnika čiji rezultat još nije preuzet (npr. posle osvežavanja stranice)."""
+    with _lock:
+        jobs = [j for j in _jobs.values() if j.user == user and not j.collected and j.batch is None]
+    return max(jobs, key=lambda j: j.created) if jobs else None
+
+
+def batch_jobs_for_user(user):
+    """Poslovi poslednje grupe korisnika koja još nije preuzeta, redom kojim su poslati."""
+    with _lock:
+        jobs = [j for j in _jobs.values() if j.user == user and j.batch is not None]
+    pending = [j for j in jobs if not j.collected]
+    if not pending:
+        return []
+    batch = max(pending, key=lambda j: j.created).batch
+    return [j for j in jobs if j.batch == batch]
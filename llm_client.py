@@ -0,0 +1,224 @@
+import time
+import random
+import weakref
+import threading
+
+import httpx
+from openai import OpenAI
+from openai import OpenAIError, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+
+# Jedan OpenAI klijent po API ključu za ceo proces: keep-alive konekcije se ponovo koriste
+# između analiza umesto novog TLS handshake-a za svaki komentar
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY_SECONDS = 120
+
+CONNECT_TIMEOUT_SECONDS = 10
+# pojedinačni pokušaj i ukupni budžet za sve pokušaje jednog zahteva (gpt-5 high effort traje dugo)
+ATTEMPT_TIMEOUT_SECONDS = 300
+REQUEST_BUDGET_SECONDS = 600
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+# posle ovoliko uzastopnih grešaka servisa zahtevi se odmah odbijaju dok ne istekne pauza
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN_SECONDS = 60
+
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+
+class CircuitOpenError(OpenAIError):
+    """AI servis je označen kao nedostupan; zahtev nije ni poslat."""
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown_seconds=CIRCUIT_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return 'half-open'
+        return 'open'
+
+    def before_request(self):
+        with self._lock:
+            state = self._state()
+            if state == 'open':
+                remaining = self.cooldown_seconds - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(f"AI servis je privremeno nedostupan, novi pokušaj za {remaining:.0f} s.")
+            if state == 'half-open':
+                # samo jedan probni zahtev dok je servis pod sumnjom
+                if self._trial_in_flight:
+                    raise CircuitOpenError("AI servis je privremeno nedostupan, probni zahtev je u toku.")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class _Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen_streams = weakref.WeakSet()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def on_response(self, response):
+        stream = response.extensions.get('network_stream')
+        with self._lock:
+            self.requests += 1
+            if stream is None:
+                return
+            if stream in self._seen_streams:
+                self.reused_connections += 1
+            else:
+                self._seen_streams.add(stream)
+                self.new_connections += 1
+
+    def add(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+_lock = threading.Lock()
+_clients = {}
+metrics = _Metrics()
+breaker = CircuitBreaker()
+
+
+def get_client(api_key):
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(ATTEMPT_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                event_hooks={'response': [metrics.on_response]},
+            )
+            # ponovne pokušaje radi ovaj modul (sa budžetom i circuit breaker-om), ne SDK
+            client = OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            _clients[api_key] = client
+        return client
+
+
+def _retry_delay(error, attempt):
+    retry_after = None
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            retry_after = None
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX_SECONDS)
+    # eksponencijalno čekanje sa "full jitter"
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _call_with_retries(call, retry_rate_limits=True):
+    # retry_rate_limits=False: 429 ide odmah pozivaocu koji ima sopstveni limiter i zajedničku pauzu
+    # (comment_generator.generate_with_backoff, RateLimiter.backoff)
+    deadline = time.monotonic() + REQUEST_BUDGET_SECONDS
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            breaker.before_request()
+        except CircuitOpenError:
+            metrics.add('rejected')
+            raise
+        remaining = deadline - time.monotonic()
+        try:
+            result = call(min(ATTEMPT_TIMEOUT_SECONDS, max(remaining, 1)))
+        except RETRYABLE_ERRORS as e:
+            if not isinstance(e, RateLimitError):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+                if not retry_rate_limits:
+                    metrics.add('failures')
+                    raise
+            delay = _retry_delay(e, attempt)
+            if attempt == MAX_ATTEMPTS - 1 or time.monotonic() + delay >= deadline:
+                metrics.add('failures')
+                raise
+            metrics.add('retries')
+            time.sleep(delay)
+            continue
+        except Exception:
+            # greška u zahtevu (npr. 400) ne znači da je servis nedostupan
+            breaker.record_success()
+            metrics.add('failures')
+            raise
+        breaker.record_success()
+        return result
+
+
+def create_response(api_key, retry_rate_limits=True, **kwargs):
+    client = get_client(api_key)
+    return _call_with_retries(lambda timeout: client.responses.create(timeout=timeout, **kwargs), retry_rate_limits)
+
+
+def stream_response(api_key, retry_rate_limits=True, **kwargs):
+    """Generator događaja iz Responses strima. Ponovni pokušaj je moguć samo dok nijedan
+    događaj nije prosleđen pozivaocu; kasnije greške se prosleđuju."""
+    client = get_client(api_key)
+    stream = _call_with_retries(lambda timeout: client.responses.create(timeout=timeout, stream=True, **kwargs),
+                                retry_rate_limits)
+    try:
+        for event in stream:
+            yield event
+    except RETRYABLE_ERRORS:
+        breaker.record_failure()
+        metrics.add('failures')
+        raise
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        metrics.add('failures')
+        raise APIConnectionError(message=f"Strim je prekinut: {e}", request=e.request) from e
+    finally:
+        stream.close()
+
+
+def stats():
+    return {
+        'requests': metrics.requests,
+        'new_connections': metrics.new_connections,
+        'reused_connections': metrics.reused_connections,
+        'retries': metrics.retries,
+        'failures': metrics.failures,
+        'rejected': metrics.rejected,
+        'circuit': breaker.state,
+    }
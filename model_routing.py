@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from excel_processor import generate_AIcomment_cached, AI_MODEL
+from risk_metrics import find_value, normalize_label, to_number
+from prompts import record_cache_usage, cache_stats
+
+# Model, reasoning effort i budžet izlaza se biraju po nivou rizika klijenta: čist klijent
+# (bez blokada i sporova, dobra bonitetna ocena) ne mora da košta kao klijent u problemima.
+# Politika se može promeniti JSON fajlom (AI_ROUTING_POLICY=putanja) bez izmene koda;
+# zadati ključevi se spajaju sa podrazumevanim.
+DEFAULT_POLICY = {
+    'tiers': {
+        'nizak': {
+            'model': "gpt-5-mini-2025-08-07",
+            'reasoning': {"effort": "low"},
+            'text': {"verbosity": "medium"},
+            'max_output_tokens': 8000,
+        },
+        'srednji': {
+            'model': AI_MODEL,
+            'reasoning': {"effort": "medium"},
+            'text': {"verbosity": "high"},
+            'max_output_tokens': 12000,
+        },
+        'visok': {
+            'model': AI_MODEL,
+            'reasoning': {"effort": "high"},
+            'text': {"verbosity": "high"},
+            'max_output_tokens': 15000,
+        },
+    },
+    'rules': {
+        # prvo slovo bonitetne ocene (npr. "E1" -> "E")
+        'low_risk_grades': ["A", "B"],
+        'high_risk_grades': ["D", "E"],
+        # ukupno dana blokade iznad kog je klijent visokog rizika
+        'high_risk_blockage_days': 30,
+    },
+}
+DEFAULT_TIER = 'srednji'
+
+_lock = threading.Lock()
+_tier_stats = {}
+
+
+def _default_policy():
+    return {'tiers': {k: dict(v) for k, v in DEFAULT_POLICY['tiers'].items()},
+            'rules': dict(DEFAULT_POLICY['rules'])}
+
+
+def _merge(policy, custom):
+    if not isinstance(custom, dict):
+        raise ValueError("politika mora biti JSON objekat")
+    tiers, rules = custom.get('tiers', {}), custom.get('rules', {})
+    if not isinstance(tiers, dict) or not all(isinstance(v, dict) for v in tiers.values()) \
+            or not isinstance(rules, dict):
+        raise ValueError("'tiers' mora biti objekat objekata, 'rules' objekat")
+    for tier, settings in tiers.items():
+        policy['tiers'].setdefault(tier, {}).update(settings)
+    policy['rules'].update(rules)
+    for tier, settings in policy['tiers'].items():
+        missing = [k for k in DEFAULT_POLICY['tiers'][DEFAULT_TIER] if k not in settings]
+        if missing:
+            raise ValueError(f"nivo '{tier}' nema {', '.join(missing)}")
+    return policy
+
+
+def load_policy(path=None):
+    """Podrazumevana politika spojena sa JSON fajlom (path ili AI_ROUTING_POLICY). Fajl koji ne
+    može da se pročita ili nije ispravan se ignoriše (uz poruku), da aplikacija ipak radi."""
+    path = path or os.getenv("AI_ROUTING_POLICY")
+    if not path:
+        return _default_policy()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return _merge(_default_policy(), json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"AI_ROUTING_POLICY '{path}' nije upotrebljiv ({e}); koristi se podrazumevana politika.")
+        return _default_policy()
+
+
+POLICY = load_policy()
+
+
+def policy_version(policy=None):
+    """Kratak otisak politike; komentar nastao sa drugom politikom (model, effort) se ne koristi ponovo."""
+    text = json.dumps(policy or POLICY, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+
+
+def _flagged(value):
+    # "Ima"/"Da" ili broj veći od nule
+    number = to_number(value)
+    if number is not None:
+        return number > 0
+    return normalize_label(value or '').strip() in ('ima', 'da')
+
+
+def classify(client_json, policy=None):
+    """Brza procena nivoa rizika iz ocena_rizika, bonitetna_ocena i istorija_blokada.
+    Vraća (nivo, razlozi)."""
+    rules = (policy or POLICY)['rules']
+
+    grade = ''
+    bonitet = (client_json.get('bonitetna_ocena') or [{}])[0]
+    for key, value in bonitet.items():
+        label = normalize_label(key)
+        if 'ocena' in label and 'dts' not in label and 'rizik' not in label and value:
+            grade = str(value).strip()[:1].upper()
+            break
+
+    risk = client_json.get('ocena_rizika')
+    nbs_blockage = _flagged(find_value(risk, 'blokad'))
+    disputes = _flagged(find_value(risk, 'spor'))
+
+    blockages = client_json.get('istorija_blokada') or []
+    blockage_days = 0.0
+    active_blockage = False
+    summary = (client_json.get('zbirni_pregled') or {}).get('istorija_blokada')
+    if summary:
+        # zbirovi preko svih redova lista, ne samo prikazanih
+        blockage_days = summary.get('ukupno_dana') or 0.0
+        active_blockage = summary.get('u_toku', 0) > 0
+        blockages = blockages or summary.get('broj', 0) > 0
+    for row in [] if summary else blockages:
+        for key, value in row.items():
+            label = normalize_label(key).strip()
+            if 'dana' in label:
+                blockage_days += to_number(value) or 0
+            # blokada bez datuma završetka (kolona "Do" prazna ili NaT) još traje
+            elif label == 'do' and value in (None, '', 'NaT'):
+                active_blockage = True
+
+    reasons = []
+    if grade in rules['high_risk_grades']:
+        reasons.append(f"bonitetna ocena {grade}")
+    if nbs_blockage:
+        reasons.append("NBS blokada")
+    if active_blockage:
+        reasons.append("blokada u toku")
+    if blockage_days > rules['high_risk_blockage_days']:
+        reasons.append(f"{blockage_days:.0f} dana blokade")
+    if reasons:
+        return 'visok', reasons
+
+    if grade in rules['low_risk_grades'] and not disputes and not blockages:
+        return 'nizak', [f"bonitetna ocena {grade}", "bez blokada i sporova"]
+
+    if not grade:
+        reasons.append("bonitetna ocena nije poznata")
+    if disputes:
+        reasons.append("sporovi")
+    if blockages:
+        reasons.append("ranije blokade")
+    if grade and grade not in rules['low_risk_grades']:
+        reasons.append(f"bonitetna ocena {grade}")
+    return DEFAULT_TIER, reasons
+
+
+def route(client_json, policy=None):
+    """Podešavanja zahteva za klijenta: nivo, razlozi i parametri za generate_AIcomment."""
+    policy = policy or POLICY
+    tier, reasons = classify(client_json, policy)
+    settings = policy['tiers'].get(tier) or policy['tiers'][DEFAULT_TIER]
+    return {'tier': tier, 'reasons': reasons, **settings}
+
+
+def record(tier, latency, usage):
+    with _lock:
+        stats = _tier_stats.setdefault(tier, {'komentara': 0, 'latencija_s': 0.0, 'ulazni_tokeni': 0,
+                                              'kesirani_tokeni': 0, 'izlazni_tokeni': 0, 'reasoning_tokeni': 0})
+        stats['komentara'] += 1
+        stats['latencija_s'] += latency
+        stats['ulazni_tokeni'] += usage.get('input_tokens') or 0
+        stats['kesirani_tokeni'] += usage.get('cached_tokens') or 0
+        stats['izlazni_tokeni'] += usage.get('output_tokens') or 0
+        stats['reasoning_tokeni'] += usage.get('reasoning_tokens') or 0
+
+
+def stats():
+    """Proseci po nivou rizika za komentare generisane u ovom procesu (bez pogodaka iz keša)."""
+    with _lock:
+        return {tier: {'komentara': s['komentara'],
+                       **{k: s[k] / s['komentara'] for k in s if k != 'komentara'}}
+                for tier, s in _tier_stats.items()}
+
+
+def _log(logger, message):
+    if logger:
+        logger.info(message)
+    else:
+        print(message)
+
+
+def generate_routed(prompt, key, client_json, prompt_version, regenerate=False, logger=None, on_delta=None, usage=None,
+                    retry_rate_limits=True):
+    """generate_AIcomment_cached sa modelom i podešavanjima po nivou rizika; loguje latenciju i tokene.
+    Ako je zadat, usage se popunjava nivoom, modelom i tokenima iz odgovora (prazno za pogodak keša)."""
+    settings = route(client_json)
+    message = (f"Nivo rizika: {settings['tier']} ({', '.join(settings['reasons']) or '-'}); model {settings['model']}, "
+               f"effort {settings['reasoning'].get('effort')}, max izlaz {settings['max_output_tokens']}")
+    _log(logger, message)
+
+    usage = {} if usage is None else usage
+    usage.update(tier=settings['tier'], model=settings['model'])
+    started = time.perf_counter()
+    ai_comment, from_cache = generate_AIcomment_cached(
+        prompt, key, client_json, prompt_version, regenerate=regenerate, logger=logger, on_delta=on_delta,
+        settings=settings, usage=usage, retry_rate_limits=retry_rate_limits
+    )
+    if not from_cache:
+        latency = time.perf_counter() - started
+        record(settings['tier'], latency, usage)
+        record_cache_usage(usage)
+        prompt_cache = cache_stats()
+        message = (f"Nivo {settings['tier']}: latencija {latency:.1f} s, tokeni ulaz {usage.get('input_tokens')} "
+                   f"(iz keša prompta {usage.get('cached_tokens')}), izlaz {usage.get('output_tokens')}, "
+                   f"reasoning {usage.get('reasoning_tokens')}; keš prompta ukupno {prompt_cache['stopa_tokena']:.0%} ulaznih tokena")
+        _log(logger, message)
+    return ai_comment, from_cache
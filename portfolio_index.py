@@ -0,0 +1,364 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from risk_metrics import compute_risk_metrics, find_value, find_key, normalize_label, to_number
+
+# Indeks svih analiza (SQLite, jedan fajl pored output/json i output/komentari): klijent, datum,
+# korisnik, DTS ocena, bonitetna ocena, limiti i zastavice rizika. Red se upisuje posle svake
+# analize, a postojeći fajlovi se dodaju backfill-om, pa upiti nad portfoliom ne čitaju JSON-e.
+DB_PATH = os.getenv("PORTFOLIO_DB", os.path.join("output", "portfolio.sqlite"))
+BACKFILL_BATCH = 500
+QUERY_LIMIT = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analize (
+    json_name TEXT PRIMARY KEY,
+    comment_name TEXT,
+    analizirano TEXT NOT NULL,
+    korisnik TEXT,
+    klijent TEXT,
+    klijent_kljuc TEXT,
+    pib TEXT,
+    dts_ocena REAL,
+    dts_izracunata REAL,
+    prolazi_prag INTEGER,
+    bonitetna_ocena TEXT,
+    bonitetna_klasa TEXT,
+    ocena_rizika REAL,
+    trazeni_limit REAL,
+    postojeci_limit REAL,
+    nbs_blokada INTEGER,
+    blokada_u_toku INTEGER,
+    poslednja_blokada TEXT,
+    dana_blokade REAL,
+    aktivnih_sporova INTEGER,
+    iznos_sporova REAL,
+    rizicna_povezana_lica INTEGER,
+    nivo_rizika TEXT,
+    rezim TEXT,
+    verzija_prompta TEXT,
+    politika_modela TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analize_klijent ON analize (klijent_kljuc, analizirano);
+CREATE INDEX IF NOT EXISTS idx_analize_analizirano ON analize (analizirano);
+CREATE INDEX IF NOT EXISTS idx_analize_korisnik ON analize (korisnik, analizirano);
+CREATE INDEX IF NOT EXISTS idx_analize_pib ON analize (pib);
+CREATE INDEX IF NOT EXISTS idx_analize_dts ON analize (dts_ocena);
+CREATE INDEX IF NOT EXISTS idx_analize_bonitet ON analize (bonitetna_klasa, poslednja_blokada);
+CREATE INDEX IF NOT EXISTS idx_analize_limit ON analize (trazeni_limit);
+CREATE INDEX IF NOT EXISTS idx_analize_zastavice ON analize (nbs_blokada, blokada_u_toku);
+"""
+COLUMNS = ('json_name', 'comment_name', 'analizirano', 'korisnik', 'klijent', 'klijent_kljuc', 'pib',
+           'dts_ocena', 'dts_izracunata', 'prolazi_prag', 'bonitetna_ocena', 'bonitetna_klasa', 'ocena_rizika',
+           'trazeni_limit', 'postojeci_limit', 'nbs_blokada', 'blokada_u_toku', 'poslednja_blokada', 'dana_blokade',
+           'aktivnih_sporova', 'iznos_sporova', 'rizicna_povezana_lica', 'nivo_rizika', 'rezim', 'verzija_prompta',
+           'politika_modela')
+# kolone dodate posle prve verzije šeme; postojeća baza ih dobija pri prvom otvaranju
+ADDED_COLUMNS = {'verzija_prompta': 'TEXT', 'politika_modela': 'TEXT'}
+
+# {timestamp}_{korisnik}_{klijent}_data_for_ai.json (timestamp grupne analize ima i redni broj)
+_JSON_NAME = re.compile(r'^(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})(?:-\d+)?_([^_]+)_(.+)_data_for_ai\.json$')
+_COMMENT_SUFFIX = "_ai_comment.txt"
+_JSON_SUFFIX = "_data_for_ai.json"
+
+_lock = threading.Lock()
+_ready = set()
+_backfill = None
+
+
+def _connect(db_path=None):
+    db_path = db_path or DB_PATH
+    connection = sqlite3.connect(db_path, timeout=30)
+    if db_path not in _ready:
+        with _lock:
+            if db_path not in _ready:
+                # WAL: upis iz niti analize ne blokira upite stranice portfolija
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                existing = {row[1] for row in connection.execute("PRAGMA table_info(analize)")}
+                for column, kind in ADDED_COLUMNS.items():
+                    if column not in existing:
+                        connection.execute(f"ALTER TABLE analize ADD COLUMN {column} {kind}")
+                _ready.add(db_path)
+    return connection
+
+
+def _flag(value):
+    # "Ima"/"Da" ili broj veći od nule
+    number = to_number(value)
+    if number is not None:
+        return number > 0
+    return normalize_label(value or '').strip() in ('ima', 'da')
+
+
+def client_key(name):
+    return normalize_label(name or '').strip()
+
+
+def client_pib(client_json):
+    return str(find_value(client_json.get('osnovne_informacije'), 'pib') or '').strip() or None
+
+
+def _last_blockage(client_json):
+    summary = (client_json.get('zbirni_pregled') or {}).get('istorija_blokada')
+    if summary:
+        return summary.get('poslednja_od'), summary.get('u_toku', 0) > 0, summary.get('ukupno_dana')
+    last, active, days = None, False, 0.0
+    for row in client_json.get('istorija_blokada') or []:
+        for key, value in row.items():
+            label = normalize_label(key).strip()
+            if label == 'od' and isinstance(value, str) and value[:4].isdigit() and (last is None or value > last):
+                last = value
+            elif label == 'do' and value in (None, '', 'NaT'):
+                active = True
+            elif 'dana' in label:
+                days += to_number(value) or 0
+    return last, active, days
+
+
+def extract_row(client_json, json_name, analyzed_at, user, client_name, comment_name=None, tier=None, mode=None,
+                prompt_version=None, policy_version=None):
+    """Red indeksa iz JSON-a klijenta (oblik kao iz to_JSON); analyzed_at je datetime analize.
+    prompt_version i policy_version su verzija prompta i politike modela sa kojima je nastao komentar."""
+    metrics = compute_risk_metrics(client_json, now=analyzed_at)
+    bonitet = (client_json.get('bonitetna_ocena') or [{}])[0]
+    grade = None
+    for key, value in bonitet.items():
+        label = normalize_label(key)
+        if 'ocena' in label and 'dts' not in label and 'rizik' not in label and value:
+            grade = str(value).strip()
+            break
+    last_blockage, active_blockage, blockage_days = _last_blockage(client_json)
+    summary = client_json.get('zbirni_pregled') or {}
+    disputes = summary.get('sudski sporovi') or {}
+    related = summary.get('povezana_lica') or {}
+    passes = metrics['dts']['prolazi_prag']
+    return {
+        'json_name': json_name,
+        'comment_name': comment_name,
+        'analizirano': analyzed_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'korisnik': user,
+        'klijent': client_name,
+        'klijent_kljuc': client_key(client_name),
+        'pib': client_pib(client_json),
+        'dts_ocena': metrics['dts']['ocena_iz_fajla'],
+        'dts_izracunata': metrics['dts']['ocena'],
+        'prolazi_prag': None if passes is None else int(passes),
+        'bonitetna_ocena': grade,
+        'bonitetna_klasa': grade[:1].upper() if grade else None,
+        'ocena_rizika': to_number(find_key(bonitet, 'ocena', 'rizik')),
+        'trazeni_limit': metrics['limit']['trazeni_limit'],
+        'postojeci_limit': metrics['limit']['postojeci_limit'],
+        'nbs_blokada': int(_flag(find_value(client_json.get('ocena_rizika'), 'blokad'))),
+        'blokada_u_toku': int(active_blockage),
+        'poslednja_blokada': last_blockage[:10] if last_blockage else None,
+        'dana_blokade': blockage_days,
+        'aktivnih_sporova': disputes.get('aktivnih'),
+        'iznos_sporova': disputes.get('ukupan_iznos', metrics['dts']['ulazi']['litigation_amount']),
+        'rizicna_povezana_lica': (related.get('u_blokadi', 0) + related.get('u_stecaju_ili_likvidaciji', 0)) if related else None,
+        'nivo_rizika': tier,
+        'rezim': mode,
+        'verzija_prompta': prompt_version,
+        'politika_modela': policy_version,
+    }
+
+
+def _upsert(connection, rows, conflict="REPLACE"):
+    placeholders = ', '.join('?' for _ in COLUMNS)
+    connection.executemany(
+        f"INSERT OR {conflict} INTO analize ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+        [tuple(row[c] for c in COLUMNS) for row in rows],
+    )
+
+
+def record_analysis(client_json, json_name, comment_name, user, client_name, analyzed_at=None, tier=None, mode=None,
+                    prompt_version=None, policy_version=None, db_path=None):
+    """Upisuje (ili zamenjuje) red za sačuvanu analizu; poziva se posle čuvanja JSON-a i komentara."""
+    row = extract_row(client_json, json_name, analyzed_at or datetime.now(), user, client_name, comment_name, tier, mode,
+                      prompt_version, policy_version)
+    connection = _connect(db_path)
+    try:
+        with connection:
+            _upsert(connection, [row])
+    finally:
+        connection.close()
+    return row
+
+
+def parse_json_name(json_name):
+    """(datetime analize, korisnik, klijent) iz imena 'json/{timestamp}_{korisnik}_{klijent}_data_for_ai.json' ili None."""
+    match = _JSON_NAME.match(json_name.rsplit('/', 1)[-1])
+    if not match:
+        return None
+    day, hour, minute, second, user, client = match.groups()
+    return datetime.strptime(f"{day} {hour}:{minute}:{second}", '%Y-%m-%d %H:%M:%S'), user, client
+
+
+def _stored_names(store, directory):
+    # obilazak diska, a ne indeksa store-a: backfill radi i nad starim output/ bez index.json
+    names = set()
+    for dirpath, _, filenames in os.walk(store.path(directory)):
+        for filename in filenames:
+            if filename.endswith('.tmp'):
+                continue
+            name = store.name_for(os.path.join(dirpath, filename))
+            names.add(name[:-len('.gz')] if name.endswith('.gz') else name)
+    return names
+
+
+def backfill(store, db_path=None, logger=None):
+    """Dodaje u indeks sve sačuvane analize iz store-a (output/json, output/komentari) koje u
+    njemu još nisu; vraća broj dodatih."""
+    started = time.perf_counter()
+    connection = _connect(db_path)
+    try:
+        known = {name for (name,) in connection.execute("SELECT json_name FROM analize")}
+        comments = {name.rsplit('/', 1)[-1][:-len(_COMMENT_SUFFIX)]: name
+                    for name in _stored_names(store, 'komentari') if name.endswith(_COMMENT_SUFFIX)}
+        # IGNORE: red koji je analiza upisala u međuvremenu (sa nivoom rizika i režimom) ostaje
+        rows, added, skipped = [], 0, 0
+        for json_name in sorted(_stored_names(store, 'json') - known):
+            parsed = parse_json_name(json_name)
+            if not parsed:
+                continue
+            analyzed_at, user, client = parsed
+            try:
+                client_json = store.read_json(json_name)
+            except (OSError, ValueError) as e:
+                skipped += 1
+                message = f"Analiza {json_name} nije dodata u indeks portfolija: {e}"
+                if logger:
+                    logger.warning(message)
+                else:
+                    print(message)
+                continue
+            base = json_name.rsplit('/', 1)[-1][:-len(_JSON_SUFFIX)]
+            rows.append(extract_row(client_json, json_name, analyzed_at, user, client, comments.get(base)))
+            if len(rows) >= BACKFILL_BATCH:
+                with connection:
+                    _upsert(connection, rows, "IGNORE")
+                added += len(rows)
+                rows = []
+        if rows:
+            with connection:
+                _upsert(connection, rows, "IGNORE")
+            added += len(rows)
+    finally:
+        connection.close()
+    message = (f"Indeks portfolija: dodato {added} analiza, preskočeno {skipped} "
+               f"({time.perf_counter() - started:.1f} s)")
+    if logger:
+        logger.info(message)
+    else:
+        print(message)
+    return added
+
+
+def start_backfill(store, db_path=None):
+    """Backfill jednom po procesu, u pozadinskoj niti (prvo pokretanje posle nadogradnje)."""
+    global _backfill
+    with _lock:
+        if _backfill is None:
+            _backfill = threading.Thread(target=backfill, args=(store, db_path), name="fin-app-portfolio-backfill",
+                                         daemon=True)
+            _backfill.start()
+    return _backfill
+
+
+def query(client=None, user=None, since=None, until=None, grades=None, blockage_within_days=None, max_dts=None,
+          below_threshold=False, latest_only=False, limit=QUERY_LIMIT, db_path=None):
+    """Analize iz indeksa kao DataFrame, od najnovije. client se traži u nazivu (bez obzira na
+    velika slova i kvačice) ili PIB-u; grades su klase bonitetne ocene ('E', 'D'...);
+    blockage_within_days: blokada u toku ili poslednja blokada počela u tih N dana;
+    latest_only: samo poslednja analiza svakog klijenta."""
+    conditions, params = [], []
+    if client:
+        conditions.append("(a.klijent_kljuc LIKE ? OR a.pib = ?)")
+        params += [f"%{client_key(client)}%", client.strip()]
+    if user:
+        conditions.append("a.korisnik = ?")
+        params.append(user)
+    if since:
+        conditions.append("a.analizirano >= ?")
+        params.append(f"{since:%Y-%m-%d}")
+    if until:
+        conditions.append("a.analizirano < ?")
+        params.append(f"{until + timedelta(days=1):%Y-%m-%d}")
+    if grades:
+        conditions.append(f"a.bonitetna_klasa IN ({', '.join('?' for _ in grades)})")
+        params += [g.upper() for g in grades]
+    if blockage_within_days:
+        conditions.append("(a.blokada_u_toku = 1 OR a.nbs_blokada = 1 OR a.poslednja_blokada >= ?)")
+        params.append(f"{datetime.now() - timedelta(days=blockage_within_days):%Y-%m-%d}")
+    if max_dts is not None:
+        conditions.append("a.dts_ocena <= ?")
+        params.append(max_dts)
+    if below_threshold:
+        conditions.append("a.prolazi_prag = 0")
+    source = "analize"
+    if latest_only:
+        # jedan prolaz kroz indeks (klijent_kljuc, analizirano) umesto podupita za svaki red; dve analize
+        # sa istim vremenom (grupna analiza istog klijenta): poslednja po imenu JSON-a
+        source = ("(SELECT *, ROW_NUMBER() OVER (PARTITION BY klijent_kljuc "
+                  "ORDER BY analizirano DESC, json_name DESC) AS redosled FROM analize)")
+        conditions.append("a.redosled = 1")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    columns = ', '.join(f"a.{column}" for column in COLUMNS)
+    connection = _connect(db_path)
+    try:
+        return pd.read_sql_query(
+            f"SELECT {columns} FROM {source} a {where} ORDER BY a.analizirano DESC, a.json_name DESC LIMIT ?", connection,
+            params=params + [limit])
+    finally:
+        connection.close()
+
+
+def client_analyses(client_name, pib=None, limit=10, db_path=None):
+    """Analize jednog klijenta sa komentarom, od najnovije, kao rečnici. Klijent je isti po PIB-u;
+    po nazivu (bez obzira na velika slova i kvačice) samo kad PIB nije poznat."""
+    connection = _connect(db_path)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute(
+            "SELECT * FROM analize WHERE comment_name IS NOT NULL "
+            "AND (pib = ? OR (klijent_kljuc = ? AND (pib IS NULL OR ? IS NULL))) "
+            "ORDER BY analizirano DESC, json_name DESC LIMIT ?",
+            (pib, client_key(client_name), pib, limit))
+        return [dict(row) for row in rows]
+    finally:
+        connection.close()
+
+
+def users(db_path=None):
+    connection = _connect(db_path)
+    try:
+        return [user for (user,) in connection.execute("SELECT DISTINCT korisnik FROM analize ORDER BY korisnik")]
+    finally:
+        connection.close()
+
+
+def count(db_path=None):
+    connection = _connect(db_path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM analize").fetchone()[0]
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    import artifact_store
+
+    parser = argparse.ArgumentParser(description='Indeks portfolija: dopuna iz sačuvanih analiza u output/')
+    parser.add_argument('--output', default='output')
+    parser.add_argument('--db', default=None, help='podrazumevano output/portfolio.sqlite (PORTFOLIO_DB)')
+    args = parser.parse_args()
+    db = args.db or (DB_PATH if os.getenv("PORTFOLIO_DB") else os.path.join(args.output, "portfolio.sqlite"))
+    backfill(artifact_store.ArtifactStore(args.output, dirs=('json', 'komentari')), db)
+    print(f"Ukupno u indeksu: {count(db)}")
@@ -0,0 +1,128 @@
+import os
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import portfolio_index
+from risk_metrics import DTS_THRESHOLD, DTS_WEIGHTS, dts_raw, dts_frame, score_components
+
+# Godišnje ažuriranje DTS ocene za ceo portfolio bez LLM-a: poslednji sačuvan JSON svakog klijenta
+# (iz indeksa portfolija) se svede na ulaze, pa se komponente, ponderisani zbir i prag 3.2 računaju
+# jednim vektorskim prolazom. Izveštaj sadrži samo klijente kojima se promenio status u odnosu na
+# ocenu zapisanu u indeksu pri analizi; samo njih vredi ponovo slati na AI komentar.
+# izveštaj ide u output/rescoring/<datum>_dts.csv
+REPORT_DIR = "rescoring"
+
+STATUS_PASS = 'prolazi'
+STATUS_FAIL = 'ne prolazi'
+
+
+def load_portfolio(store, db_path=None, logger=None):
+    """Ulazi za DTS (dts_raw) za poslednju analizu svakog klijenta iz indeksa, kao DataFrame
+    zajedno sa kolonama indeksa (klijent, pib, analizirano, json_name, dts_ocena iz fajla i
+    dts_izracunata/prolazi_prag zapisani pri analizi)."""
+    analyses = portfolio_index.query(latest_only=True, limit=-1, db_path=db_path)
+    raw, loaded = [], []
+    for position, json_name in enumerate(analyses['json_name']):
+        try:
+            raw.append(dts_raw(store.read_json(json_name)))
+        except (OSError, ValueError) as e:
+            message = f"Analiza {json_name} nije učitana: {e}"
+            if logger:
+                logger.warning(message)
+            else:
+                print(message)
+            continue
+        loaded.append(position)
+    portfolio = analyses.iloc[loaded][['klijent', 'pib', 'korisnik', 'analizirano', 'json_name', 'dts_ocena',
+                                       'dts_izracunata', 'prolazi_prag']]
+    return portfolio.reset_index(drop=True), raw
+
+
+def _status(passes):
+    # True/False/None -> 'prolazi'/'ne prolazi'/NaN
+    return pd.Series(passes, dtype=object).map({True: STATUS_PASS, False: STATUS_FAIL})
+
+
+def rescore(portfolio, raw, now=None):
+    """DTS ocena za sve klijente danas (now), jednim prolazom po koloni. Prethodni status je ocena
+    zapisana u indeksu pri analizi (sa pravilima i parserom od tada), a kad ona nije bila potpuna,
+    ocena u fajlu."""
+    now = now or datetime.now()
+    current = score_components(dts_frame(raw, now))
+
+    recorded = pd.to_numeric(portfolio['dts_izracunata'], errors='coerce')
+    recorded_passes = pd.to_numeric(portfolio['prolazi_prag'], errors='coerce')
+    sheet_score = pd.to_numeric(portfolio['dts_ocena'], errors='coerce')
+    sheet_passes = np.where(sheet_score.notna(), sheet_score >= DTS_THRESHOLD, None)
+    previous_passes = np.where(recorded_passes.notna(), recorded_passes == 1, sheet_passes)
+
+    scored = portfolio.drop(columns=['dts_izracunata', 'prolazi_prag'])
+    scored['dts_pre'] = recorded.where(recorded.notna(), sheet_score).to_numpy()
+    scored['dts_sada'] = current['dts_ocena'].to_numpy()
+    scored['prethodni_status'] = _status(previous_passes).to_numpy()
+    scored['novi_status'] = _status(current['prolazi_prag']).to_numpy()
+    for component in DTS_WEIGHTS:
+        scored[component] = current[component].to_numpy()
+    scored['promenjen'] = scored['novi_status'].notna() & scored['prethodni_status'].notna() & \
+        (scored['novi_status'] != scored['prethodni_status'])
+    return scored
+
+
+def changed(scored):
+    """Klijenti sa promenjenim statusom, rangirani: prvo oni koji su pali ispod praga (najniža
+    nova ocena prva), pa oni koji su prešli prag."""
+    result = scored[scored['promenjen']].copy()
+    result['pao_ispod_praga'] = result['novi_status'] == STATUS_FAIL
+    result = result.sort_values(['pao_ispod_praga', 'dts_sada'], ascending=[False, True], kind='stable')
+    result = result.drop(columns=['promenjen'])
+    result.insert(0, 'rang', np.arange(1, len(result) + 1))
+    return result.reset_index(drop=True)
+
+
+def write_report(report, path):
+    """CSV ili Parquet (po ekstenziji)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.parquet'):
+        report.to_parquet(path, index=False)
+    else:
+        report.to_csv(path, index=False, encoding='utf-8')
+    return path
+
+
+def run(store, report_path=None, now=None, db_path=None, logger=None):
+    started = time.perf_counter()
+    portfolio, raw = load_portfolio(store, db_path, logger)
+    loaded = time.perf_counter()
+    scored = rescore(portfolio, raw, now)
+    report = changed(scored)
+    scored_at = time.perf_counter()
+    report_path = report_path or os.path.join(store.root, REPORT_DIR, f"{(now or datetime.now()):%Y-%m-%d}_dts.csv")
+    write_report(report, report_path)
+    message = (f"DTS za {len(scored)} klijenata (učitavanje {loaded - started:.2f} s, ocena {(scored_at - loaded) * 1000:.0f} ms): "
+               f"nepotpunih {scored['dts_sada'].isna().sum()}, promenjen status {len(report)} -> {report_path}")
+    if logger:
+        logger.info(message)
+    else:
+        print(message)
+    return report
+
+
+if __name__ == "__main__":
+    import artifact_store
+
+    parser = argparse.ArgumentParser(description='Ponovno računanje DTS ocene za ceo portfolio (bez AI komentara)')
+    parser.add_argument('--output', default='output')
+    parser.add_argument('--db', default=None, help='podrazumevano output/portfolio.sqlite (PORTFOLIO_DB)')
+    parser.add_argument('--report', default=None, help='.csv ili .parquet; podrazumevano output/rescoring/<datum>_dts.csv')
+    parser.add_argument('--date', default=None, help='datum ocene (YYYY-MM-DD), podrazumevano danas')
+    parser.add_argument('--backfill', action='store_true', help='prvo dopuni indeks portfolija iz output/json')
+    args = parser.parse_args()
+    db = args.db or (portfolio_index.DB_PATH if os.getenv("PORTFOLIO_DB") else os.path.join(args.output, "portfolio.sqlite"))
+    store = artifact_store.ArtifactStore(args.output, dirs=('json', 'komentari'))
+    if args.backfill:
+        portfolio_index.backfill(store, db)
+    run(store, args.report, datetime.strptime(args.date, '%Y-%m-%d') if args.date else None, db)
@@ -0,0 +1,197 @@
+import sys
+import json
+
+from rate_limiter import estimate_tokens
+from risk_metrics import normalize_label
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # bez tiktoken-a koristi se gruba procena (~4 karaktera po tokenu)
+    _encoding = None
+
+# "compact": tabele po kolonama, mape za dvokolonske tabele, bez null vrednosti i razmaka
+# "pretty": stari format (json.dumps sa indent=2)
+PROMPT_ENCODING = "compact"
+
+COLUMNS_KEY = "kolone"
+ROWS_KEY = "redovi"
+LABEL_COLUMN = "Atribut"
+
+ENCODING_NOTE = (
+    f'Tabele su zapisane kompaktno: {{"{COLUMNS_KEY}":[...],"{ROWS_KEY}":[[...],...]}} znači da je svaki red '
+    f'lista vrednosti redom po kolonama; {{"<naziv kolone vrednosti>":{{"<{LABEL_COLUMN}>":<vrednost>,...}}}} '
+    f'je tabela {LABEL_COLUMN}/vrednost. Prazne (null) vrednosti, kolone i redovi su izostavljeni.'
+)
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return estimate_tokens(text)
+
+
+def _is_table(value):
+    return isinstance(value, list) and value and all(isinstance(row, dict) for row in value)
+
+
+def _strip_row(row):
+    stripped = {k: v for k, v in row.items() if v is not None}
+    # red koji osim naziva (prve kolone) nema nijednu vrednost ne nosi podatak
+    if not stripped or list(stripped) == list(row)[:1]:
+        return None
+    return stripped
+
+
+def strip_nulls(data):
+    """Podaci kakve kompaktni format čuva: isto kao ulaz, ali bez null ćelija i praznih redova."""
+    result = {}
+    for section, value in data.items():
+        if _is_table(value):
+            result[section] = [r for r in map(_strip_row, value) if r is not None]
+        else:
+            result[section] = value
+    return result
+
+
+def _as_map(rows):
+    # dvokolonska tabela Atribut/<vrednost> sa jedinstvenim nazivima postaje mapa
+    keys = list(rows[0])
+    if len(keys) != 2 or keys[0] != LABEL_COLUMN or any(list(r) != keys for r in rows):
+        return None
+    labels = [r[LABEL_COLUMN] for r in rows]
+    if not all(isinstance(label, str) for label in labels) or len(set(labels)) != len(labels):
+        return None
+    return {keys[1]: {r[LABEL_COLUMN]: r[keys[1]] for r in rows if r[keys[1]] is not None}}
+
+
+def _as_columns(rows):
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    kept = [r for r in map(_strip_row, rows) if r is not None]
+    columns = [c for c in columns if any(c in r for r in kept)]
+    encoded = []
+    for row in kept:
+        values = [row.get(c) for c in columns]
+        while values and values[-1] is None:
+            values.pop()
+        encoded.append(values)
+    return {COLUMNS_KEY: columns, ROWS_KEY: encoded}
+
+
+def compact(data):
+    result = {}
+    for section, value in data.items():
+        if _is_table(value):
+            result[section] = _as_map(value) or _as_columns(value)
+        else:
+            result[section] = value
+    return result
+
+
+def expand(compacted):
+    """Obrnuto od compact(); rezultat je jednak strip_nulls(original)."""
+    result = {}
+    for section, value in compacted.items():
+        if isinstance(value, dict) and set(value) == {COLUMNS_KEY, ROWS_KEY}:
+            columns = value[COLUMNS_KEY]
+            result[section] = [{c: v for c, v in zip(columns, row) if v is not None} for row in value[ROWS_KEY]]
+        elif isinstance(value, dict) and len(value) == 1 and isinstance(next(iter(value.values())), dict):
+            value_column, mapping = next(iter(value.items()))
+            result[section] = [{LABEL_COLUMN: label, value_column: v} for label, v in mapping.items()]
+        else:
+            result[section] = value
+    return result
+
+
+def check_lossless(data, compacted):
+    """Lista (sekcija, red, kolona) koje bi se izgubile kompaktnim zapisom; prazna lista = bez gubitka."""
+    expected = strip_nulls(data)
+    restored = expand(compacted)
+    missing = []
+    for section in expected.keys() | restored.keys():
+        want, got = expected.get(section), restored.get(section)
+        if want == got:
+            continue
+        if not (isinstance(want, list) and isinstance(got, list)):
+            missing.append((section, None, None))
+            continue
+        for i, row in enumerate(want):
+            other = got[i] if i < len(got) and isinstance(got[i], dict) else {}
+            for column, v in (row.items() if isinstance(row, dict) else [(None, row)]):
+                if other.get(column) != v:
+                    missing.append((section, i, column))
+        if len(got) > len(want):
+            missing.append((section, len(want), None))
+    return missing
+
+
+def find_field(compacted, sections, needles):
+    """Vrednost iz kompaktnog zapisa po nazivu reda (mapa Atribut/vrednost, prva kolona tabele) ili
+    nazivu kolone (prvi red), kao što je model čita; needles su ključne reči iz normalize_label.
+    Prva sekcija iz sections koja ima takvu stavku; None ako je nema."""
+    def matches(name):
+        return all(n in normalize_label(name) for n in needles)
+
+    for section in sections:
+        value = compacted.get(section)
+        if not isinstance(value, dict):
+            continue
+        if set(value) == {COLUMNS_KEY, ROWS_KEY}:
+            columns, rows = value[COLUMNS_KEY], value[ROWS_KEY]
+            for i, column in enumerate(columns):
+                if matches(column) and rows and i < len(rows[0]):
+                    return rows[0][i]
+            for row in rows:
+                if row and matches(row[0]) and len(row) > 1:
+                    return row[1]
+        elif len(value) == 1 and isinstance(next(iter(value.values())), dict):
+            for label, v in next(iter(value.values())).items():
+                if matches(label):
+                    return v
+    return None
+
+
+def client_json_for_prompt(data, encoding=None, logger=None):
+    """JSON klijenta kao tekst za prompt; vraća (tekst, tokeni_pre, tokeni_posle).
+    Ako bi kompaktni zapis izgubio neko polje, koristi se stari format."""
+    encoding = encoding or PROMPT_ENCODING
+    pretty = json.dumps(data, indent=2, ensure_ascii=False)
+    tokens_before = count_tokens(pretty)
+    if encoding != "compact":
+        return pretty, tokens_before, tokens_before
+
+    compacted = compact(data)
+    missing = check_lossless(data, compacted)
+    if missing:
+        if logger:
+            logger.warning(f"Kompaktni JSON bi izgubio polja {missing[:5]}, koristi se pun format.")
+        return pretty, tokens_before, tokens_before
+
+    text = ENCODING_NOTE + "\n" + json.dumps(compacted, ensure_ascii=False, separators=(',', ':'))
+    tokens_after = count_tokens(text)
+    if logger:
+        logger.info(f"Tokeni JSON-a u promptu: {tokens_before} -> {tokens_after} ({1 - tokens_after / tokens_before:.0%} manje)")
+    return text, tokens_before, tokens_after
+
+
+if __name__ == "__main__":
+    # provera nad stvarnim fajlovima: python prompt_format.py <fajl.xlsx|fajl.json> ...
+    from excel_processor import to_JSON
+
+    failed = False
+    for path in sys.argv[1:]:
+        if path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            data = to_JSON(path)
+        missing = check_lossless(data, compact(data))
+        _, before, after = client_json_for_prompt(data)
+        print(f"{path}: tokeni {before} -> {after}, {'BEZ GUBITKA' if not missing else f'IZGUBLJENO: {missing}'}")
+        failed = failed or bool(missing)
+    sys.exit(1 if failed else 0)
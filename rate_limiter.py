@@ -0,0 +1,52 @@
+import time
+import random
+import threading
+
+
+def estimate_tokens(text):
+    # gruba procena (~4 karaktera po tokenu), dovoljna za TPM ograničenje
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Ograničava zahteve po minutu (RPM) i tokene po minutu (TPM) u kliznom prozoru.
+    Posle 429 odgovora svi pozivaoci pauziraju zajedno, a pauza raste dok greške traju."""
+
+    def __init__(self, rpm, tpm, window_seconds=60.0, max_backoff_seconds=60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window_seconds = window_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._lock = threading.Lock()
+        self._sent = []  # (vreme, tokeni)
+        self._blocked_until = 0.0
+        self._backoff = 1.0
+        self.throttled = 0
+
+    def acquire(self, tokens):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._sent = [(t, n) for t, n in self._sent if now - t < self.window_seconds]
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    used = sum(n for _, n in self._sent)
+                    # zahtev veći od celog TPM budžeta ipak prolazi kad je prozor prazan
+                    if len(self._sent) < self.rpm and (used + tokens <= self.tpm or not self._sent):
+                        self._sent.append((now, tokens))
+                        return
+                    wait = self._sent[0][0] + self.window_seconds - now
+            time.sleep(max(wait, 0.05))
+
+    def backoff(self, retry_after=None):
+        """Beleži 429 i vraća trajanje zajedničke pauze u sekundama."""
+        with self._lock:
+            self.throttled += 1
+            delay = retry_after if retry_after else self._backoff * random.uniform(0.5, 1.5)
+            self._backoff = min(self._backoff * 2, self.max_backoff_seconds)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            return delay
+
+    def success(self):
+        with self._lock:
+            self._backoff = max(self._backoff / 2, 1.0)
@@ -0,0 +1,313 @@
+import re
+import json
+import functools
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Deterministički izračuni koje je model ranije radio sam (DTS ocena, trendovi,
+# kašnjenje u odnosu na toleranciju, limit u odnosu na promet). Rezultat ide u prompt
+# kao gotov blok, pa model ne troši reasoning tokene na aritmetiku.
+
+DTS_WEIGHTS = {
+    'osnivanje': 0.05,
+    'sporovi': 0.10,
+    'blokade': 0.35,
+    'obezbedjenje': 0.30,
+    'likvidnost': 0.20,
+}
+DTS_THRESHOLD = 3.2
+
+# ključne reči u opisu sredstva obezbeđenja -> ocena (proverava se redom)
+COLLATERAL_SCORES = [
+    ('garanc', 5), ('avans', 5),
+    ('avaliran', 4),
+    ('kompenzac', 3),
+    ('menic', 2),
+    ('nema', 1), ('bez', 1),
+]
+
+YEAR_COLUMN = re.compile(r'^\d{4}$')
+
+# rečenica za uputstvo u promptu, uz blok iz metrics_prompt_block()
+METRICS_NOTE = (
+    "All arithmetic (weighted DTS score, year-over-year trends, payment delay vs. tolerance, requested limit "
+    "vs. turnover) is precomputed in the PRECOMPUTED METRICS block below; use those figures and do not recompute them."
+)
+
+
+def normalize_label(text):
+    text = str(text).lower().replace('đ', 'dj')
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+# nazivi redova i kolona se ponavljaju od klijenta do klijenta (portfolio_rescoring), normalizacija se pamti
+_label = functools.lru_cache(maxsize=4096, typed=True)(normalize_label)
+
+
+def to_number(value):
+    """Broj iz Excel vrednosti: 1,234.5 / 29,990.04- (minus na kraju) / 12%; '-', tekst i prazno -> None."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if np.isnan(value) else float(value)
+    text = str(value).strip().replace(',', '').rstrip('%')
+    if len(text) > 1 and text.endswith('-'):
+        text = '-' + text[:-1]
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def to_numbers(values):
+    # parsiranje po ćeliji je jeftinije od pandas .str operacija za tabele od par desetina redova
+    return pd.Series([to_number(v) for v in values], dtype=float)
+
+
+def find_value(rows, *needles):
+    """Vrednost iz tabele Atribut/Vrednost čiji naziv sadrži sve ključne reči."""
+    for row in rows or []:
+        keys = list(row)
+        if not keys:
+            continue
+        label = _label(row[keys[0]])
+        if all(n in label for n in needles):
+            return row[keys[1]] if len(keys) > 1 else None
+    return None
+
+
+def find_key(record, *needles):
+    for key, value in (record or {}).items():
+        if all(n in _label(key) for n in needles):
+            return value
+    return None
+
+
+def _column(rows, *needles):
+    if not rows:
+        return None
+    for key in rows[0]:
+        if all(n in _label(key) for n in needles):
+            return key
+    return None
+
+
+def score_components(inputs):
+    """Ocene DTS komponenti (1-5), ponderisani zbir i prolaz praga za tabelu ulaza
+    (jedan red po klijentu). Kolone: age_months, litigation_amount, blockage_days,
+    collateral_score, liquidity; NaN znači da podatak nije dostupan."""
+    age = inputs['age_months'].to_numpy(dtype=float)
+    litigation = inputs['litigation_amount'].to_numpy(dtype=float)
+    blockage = inputs['blockage_days'].to_numpy(dtype=float)
+    liquidity = inputs['liquidity'].to_numpy(dtype=float)
+
+    def select(value, conditions, choices, default):
+        scores = np.select(conditions, choices, default).astype(float)
+        scores[np.isnan(value)] = np.nan
+        return scores
+
+    scores = pd.DataFrame({
+        'osnivanje': select(age, [age < 3, age < 12, age < 24, age < 60], [1, 2, 3, 4], 5),
+        'sporovi': select(litigation, [litigation > 100_000, litigation >= 50_000, litigation >= 10_000, litigation > 0], [1, 2, 3, 4], 5),
+        'blokade': select(blockage, [blockage > 30, blockage >= 20, blockage >= 10, blockage > 0], [1, 2, 3, 4], 5),
+        'obezbedjenje': inputs['collateral_score'].to_numpy(dtype=float),
+        'likvidnost': select(liquidity, [liquidity < 0, liquidity <= 1, liquidity <= 1.5, liquidity <= 2], [1, 2, 3, 4], 5),
+    }, index=inputs.index)
+
+    weights = pd.Series(DTS_WEIGHTS)
+    scores['potpuno'] = scores[list(DTS_WEIGHTS)].notna().all(axis=1)
+    # sa nepoznatom komponentom zbir nije ocena (bio bi samo donja granica)
+    scores['dts_ocena'] = (scores[list(DTS_WEIGHTS)] * weights).sum(axis=1).round(2).where(scores['potpuno'])
+    scores['prolazi_prag'] = np.where(scores['potpuno'], scores['dts_ocena'] >= DTS_THRESHOLD, None)
+    return scores
+
+
+@functools.lru_cache(maxsize=1024)
+def _collateral_score(text):
+    if text is None:
+        return np.nan
+    normalized = normalize_label(text)
+    for needle, score in COLLATERAL_SCORES:
+        if needle in normalized:
+            return score
+    return np.nan
+
+
+def dts_raw(data):
+    """Ulazi za DTS ocenu iz jednog izlaza to_JSON, pre vektorskog dela (dts_frame): datum
+    osnivanja i sredstvo obezbeđenja ostaju tekst iz fajla."""
+    # zbirovi preko svih redova (u JSON-u su za velike listove samo najznačajniji redovi)
+    summary = data.get('zbirni_pregled') or {}
+
+    disputes = data.get('sudski sporovi') or []
+    amount_column = _column(disputes, 'iznos')
+    if (summary.get('sudski sporovi') or {}).get('ukupan_iznos') is not None:
+        litigation_amount = float(summary['sudski sporovi']['ukupan_iznos'])
+    elif not disputes:
+        litigation_amount = 0.0
+    elif amount_column:
+        litigation_amount = float(sum(to_number(r.get(amount_column)) or 0 for r in disputes))
+    else:
+        litigation_amount = np.nan
+
+    blockages = data.get('istorija_blokada') or []
+    days_column = _column(blockages, 'dana')
+    if (summary.get('istorija_blokada') or {}).get('ukupno_dana') is not None:
+        blockage_days = float(summary['istorija_blokada']['ukupno_dana'])
+    elif not blockages:
+        blockage_days = 0.0
+    elif days_column:
+        blockage_days = float(sum(to_number(r.get(days_column)) or 0 for r in blockages))
+    else:
+        blockage_days = np.nan
+
+    collateral = None
+    for section in ('predlogRSD', 'osnovne_informacije', 'prometRSD'):
+        collateral = find_value(data.get(section), 'obezbe')
+        if collateral is not None:
+            break
+
+    liquidity_row = next((r for r in data.get('finansijska_analizaEUR') or []
+                          if 'likvidnost' in _label(next(iter(r.values()), ''))), None)
+    liquidity = np.nan
+    if liquidity_row:
+        years = sorted(k for k in liquidity_row if YEAR_COLUMN.match(k))
+        values = [v for v in (to_number(liquidity_row[y]) for y in years) if v is not None]
+        if values:
+            liquidity = values[-1]
+
+    return {
+        'founded': find_value(data.get('osnovne_informacije'), 'osniv'),
+        'litigation_amount': litigation_amount,
+        'blockage_days': blockage_days,
+        'collateral': collateral,
+        'liquidity': liquidity,
+    }
+
+
+def dts_frame(raw, now=None):
+    """Tabela ulaza za score_components iz liste dts_raw rezultata (jedan red po klijentu).
+    now je jedan datum za sve ili niz datuma, po jedan za svaki red."""
+    raw = pd.DataFrame(list(raw), columns=['founded', 'litigation_amount', 'blockage_days', 'collateral', 'liquidity'])
+    now = pd.to_datetime(pd.Series(datetime.now() if now is None else now, index=raw.index))
+    # 'mixed': svaki datum se parsira za sebe, kao ranije jedan po jedan; dayfirst: srpski zapis
+    # dd.mm.yyyy (05.03.2010 je 5. mart), ISO (yyyy-mm-dd iz to_JSON) se čita isto kao i bez njega
+    founded = pd.to_datetime(raw['founded'].astype(object), errors='coerce', format='mixed', dayfirst=True)
+    return pd.DataFrame({
+        'age_months': (now - founded).dt.days / 30.44,
+        'litigation_amount': raw['litigation_amount'].astype(float),
+        'blockage_days': raw['blockage_days'].astype(float),
+        'collateral_score': raw['collateral'].map(_collateral_score).astype(float),
+        'liquidity': raw['liquidity'].astype(float),
+    })
+
+
+def dts_inputs(data, now=None):
+    """Sirovi ulazi za DTS ocenu iz izlaza to_JSON (jedan red za score_components)."""
+    return dts_frame([dts_raw(data)], now)
+
+
+def yearly_trends(rows):
+    """Promena u % između uzastopnih godina za svaki red tabele sa kolonama godina."""
+    if not rows:
+        return {}
+    label_column = next(iter(rows[0]), None)
+    years = sorted(c for c in rows[0] if YEAR_COLUMN.match(str(c)))
+    if len(years) < 2:
+        return {}
+    values = np.array([[to_number(row.get(y)) for y in years] for row in rows], dtype=float)
+    previous = values[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.round((values[:, 1:] - previous) / np.abs(previous) * 100, 1)
+    change[~np.isfinite(change)] = np.nan
+    periods = [f"{b}/{a}" for a, b in zip(years, years[1:])]
+    trends = {}
+    for row, row_change in zip(rows, change):
+        known = {p: float(c) for p, c in zip(periods, row_change) if not np.isnan(c)}
+        if known:
+            trends[str(row.get(label_column))] = known
+    return trends
+
+
+def delay_vs_tolerance(data):
+    delay = to_number(find_value(data.get('prometRSD'), 'kasnjenj'))
+    tolerance = to_number(find_key((data.get('bonitetna_ocena') or [{}])[0], 'toleranc'))
+    return {
+        'prosecno_kasnjenje_dana': delay,
+        'tolerancija_dana': tolerance,
+        # '-' ili prazno = tolerancija nije zadata, poređenje nije primenljivo
+        'prekoracuje': None if delay is None or tolerance is None else delay > tolerance,
+    }
+
+
+def limit_vs_turnover(data):
+    proposal = data.get('predlogRSD')
+    requested = to_number(find_value(proposal, 'trazen'))
+    existing = to_number(find_value(proposal, 'postojec'))
+    # godišnji promet: redovi čiji naziv sadrži "promet" i "god", redom kako su u fajlu
+    annual = []
+    for row in data.get('prometRSD') or []:
+        keys = list(row)
+        label = normalize_label(row[keys[0]]) if keys else ''
+        if len(keys) > 1 and 'promet' in label and 'god' in label:
+            annual.append(row[keys[1]])
+    turnover = to_numbers(annual).dropna()
+    last_turnover = float(turnover.iloc[-1]) if not turnover.empty else None
+    avg_turnover = float(turnover.mean()) if not turnover.empty else None
+
+    def ratio(a, b):
+        return round(a / b, 3) if a is not None and b else None
+
+    return {
+        'trazeni_limit': requested,
+        'postojeci_limit': existing,
+        'promena_limita_pct': round((requested - existing) / existing * 100, 1) if requested is not None and existing else None,
+        'godisnji_promet_poslednji': last_turnover,
+        'godisnji_promet_prosek': avg_turnover,
+        'limit_prema_prometu_poslednji': ratio(requested, last_turnover),
+        'limit_prema_prometu_prosek': ratio(requested, avg_turnover),
+    }
+
+
+def compute_risk_metrics(data, now=None):
+    inputs = dts_inputs(data, now)
+    scores = score_components(inputs).iloc[0]
+    sheet_score = to_number(find_key((data.get('bonitetna_ocena') or [{}])[0], 'dts'))
+
+    def clean(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        return value.item() if isinstance(value, np.generic) else value
+
+    return {
+        'dts': {
+            'ulazi': {k: clean(round(v, 2) if isinstance(v, float) else v) for k, v in inputs.iloc[0].items()},
+            'komponente': {k: clean(scores[k]) for k in DTS_WEIGHTS},
+            'ponderi': DTS_WEIGHTS,
+            'ocena': clean(scores['dts_ocena']),
+            'potpuno': bool(scores['potpuno']),
+            'prag': DTS_THRESHOLD,
+            'prolazi_prag': clean(scores['prolazi_prag']),
+            'ocena_iz_fajla': sheet_score,
+        },
+        'trendovi_finansijska_analizaEUR': yearly_trends(data.get('finansijska_analizaEUR')),
+        'trendovi_rezimeEUR': yearly_trends(data.get('rezimeEUR')),
+        'kasnjenje': delay_vs_tolerance(data),
+        'limit': limit_vs_turnover(data),
+    }
+
+
+def metrics_prompt_block(metrics):
+    return (
+        "--- START OF PRECOMPUTED METRICS ---\n"
+        "Deterministically computed from the client JSON; use these figures as given and do not recompute them. "
+        "null = data not available. `dts.ocena` is the weighted DTS score (components 1-5 × weights); it is null when some components "
+        "could not be determined, in which case the sheet value `dts.ocena_iz_fajla` is authoritative. "
+        "Trends are year-over-year changes in %; `kasnjenje.prekoracuje` = null means no tolerance is set (comparison not applicable). "
+        "`limit_prema_prometu_*` = requested limit / annual turnover.\n"
+        + json.dumps(metrics, ensure_ascii=False, separators=(',', ':'), default=str)
+        + "\n--- END OF PRECOMPUTED METRICS ---"
+    )
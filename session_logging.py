@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from collections import OrderedDict
+
+import upload_outbox
+
+# Logovi sesija idu kroz jedan red (QueueHandler) i jednu pozadinsku nit (QueueListener):
+# skript sesije samo stavi zapis u red. Nit upisuje u log fajl sesije, a fajlovi neaktivnih
+# sesija se zatvaraju. Log analize se ne kopira na zahtev korisnika: segment se odvoji
+# (rename) u istoj niti i šalje na Drive u grupama, u pozadini.
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOGGER_PREFIX = "FinAiApp.session."
+# najviše ovoliko otvorenih log fajlova; najdavnije korišćen se zatvara
+MAX_OPEN_FILES = 64
+IDLE_CLOSE_SECONDS = 15 * 60
+LOG_SHIP_INTERVAL_SECONDS = 30
+
+_lock = threading.Lock()
+_queue = queue.SimpleQueue()
+_listener = None
+_shipper = None
+_paths = {}
+# odvojeni segmenti koji čekaju slanje: (putanja, folder_id)
+_segments = []
+
+
+class SessionLogRouter(logging.Handler):
+    """Handler u niti QueueListener-a: zapis ide na stdout i u log fajl svoje sesije.
+    Otvoreni FileHandler-i su u ograničenom LRU registru; sve operacije nad fajlovima su u ovoj niti."""
+
+    def __init__(self, max_open=MAX_OPEN_FILES, idle_seconds=IDLE_CLOSE_SECONDS):
+        super().__init__()
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.formatter = logging.Formatter(LOG_FORMAT)
+        self.stream = logging.StreamHandler(sys.stdout)
+        self.stream.setFormatter(self.formatter)
+        # ime loggera -> (FileHandler, poslednji zapis)
+        self.open_files = OrderedDict()
+
+    def _file_handler(self, name):
+        entry = self.open_files.pop(name, None)
+        if entry is None:
+            path = _paths.get(name)
+            if path is None:
+                return None
+            # Watched: kompakcija (artifact_store) sme da arhivira i log otvorene sesije
+            handler = logging.handlers.WatchedFileHandler(path, encoding="utf-8")
+            handler.setFormatter(self.formatter)
+            entry = (handler, 0)
+            while len(self.open_files) >= self.max_open:
+                _, (oldest, _) = self.open_files.popitem(last=False)
+                oldest.close()
+        self.open_files[name] = (entry[0], time.monotonic())
+        return entry[0]
+
+    def _close(self, name):
+        entry = self.open_files.pop(name, None)
+        if entry:
+            entry[0].close()
+
+    def close_idle(self):
+        now = time.monotonic()
+        for name, (handler, used) in list(self.open_files.items()):
+            if now - used > self.idle_seconds:
+                handler.close()
+                del self.open_files[name]
+
+    def _rotate(self, name, segment_path, folder_id):
+        path = _paths.get(name)
+        self._close(name)
+        if not path or not os.path.exists(path):
+            return
+        try:
+            os.replace(path, segment_path)
+        except OSError as e:
+            self.stream.handle(logging.makeLogRecord({'name': name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                                      'msg': f"Log segment nije odvojen: {e}"}))
+            return
+        with _lock:
+            _segments.append((segment_path, folder_id))
+
+    def emit(self, record):
+        command = getattr(record, 'session_log_command', None)
+        if command == 'rotate':
+            self._rotate(record.name, record.segment_path, record.folder_id)
+            return
+        if command == 'close_idle':
+            self.close_idle()
+            return
+        self.stream.handle(record)
+        handler = self._file_handler(record.name)
+        if handler:
+            handler.handle(record)
+
+    def close(self):
+        for name in list(self.open_files):
+            self._close(name)
+        super().close()
+
+
+def _command(name, command, **fields):
+    _queue.put_nowait(logging.makeLogRecord({'name': name, 'msg': '', 'session_log_command': command, **fields}))
+
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is None:
+            _listener = logging.handlers.QueueListener(_queue, SessionLogRouter())
+            _listener.start()
+            # zapisi koji su još u redu se upisuju pre izlaska iz procesa
+            atexit.register(_listener.stop)
+
+
+def get_session_logger(log_path):
+    """Logger sesije koji piše u log_path preko reda; ne blokira skript ni kad je disk spor."""
+    _start_listener()
+    _start_shipper()
+    name = LOGGER_PREFIX + os.path.splitext(os.path.basename(log_path))[0]
+    logger = logging.getLogger(name)
+    with _lock:
+        _paths[name] = log_path
+        if not logger.handlers:
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(logging.handlers.QueueHandler(_queue))
+    return logger
+
+
+def rotate(logger, segment_path, folder_id):
+    """Odvaja dosadašnji log sesije u segment_path (posle svih zapisa koji su već u redu) i
+    stavlja ga u sledeću grupu za Drive; log sesije se nastavlja u praznom fajlu."""
+    _command(logger.name, 'rotate', segment_path=segment_path, folder_id=folder_id)
+
+
+def ship_segments(logger=None):
+    """Odvojene segmente predaje redu za upload (jedna grupa) i briše ih; vraća njihov broj."""
+    with _lock:
+        segments = _segments[:]
+        _segments.clear()
+    for path, folder_id in segments:
+        try:
+            upload_outbox.enqueue(path, folder_id)
+            os.remove(path)
+        except OSError as e:
+            message = f"Log segment {path} nije dodat u red za upload: {e}"
+            if logger:
+                logger.warning(message)
+            else:
+                print(message)
+    return len(segments)
+
+
+def _ship_forever():
+    while True:
+        time.sleep(LOG_SHIP_INTERVAL_SECONDS)
+        try:
+            ship_segments()
+            _command(LOGGER_PREFIX.rstrip('.'), 'close_idle')
+        except Exception as e:
+            print(f"Greška u slanju log segmenata: {e}")
+
+
+def _start_shipper():
+    global _shipper
+    with _lock:
+        if _shipper is None or not _shipper.is_alive():
+            _shipper = threading.Thread(target=_ship_forever, name="fin-app-session-logs", daemon=True)
+            _shipper.start()
+    return _shipper
@@ -0,0 +1,260 @@
+import os
+import re
+import heapq
+import functools
+import itertools
+from datetime import datetime, date
+
+from risk_metrics import normalize_label, to_number
+
+# Listovi 'Sudski sporovi', 'Blokade' i 'Povezana lica' mogu imati stotine redova. Čitaju se
+# red po red (openpyxl read-only), usput se računa zbirni pregled, a dalje (JSON, prompt) idu
+# samo zbirovi i najznačajnijih TOP_ROWS redova.
+TOP_ROWS = int(os.getenv("SHEET_TOP_ROWS", "20"))
+
+CLOSED_STATUS = ('zatvor', 'okoncan', 'zavrsen', 'resen', 'pravosnaz', 'arhiv', 'obustav', 'odbacen')
+ACTIVE_STATUS = ('aktiv', 'u toku', 'otvoren', 'u postupku')
+BANKRUPTCY_STATUS = ('stecaj', 'likvidac')
+INACTIVE_STATUS = ('brisan', 'neaktiv', 'ugasen')
+# reč ispred statusa koja ga poništava ("nije aktivan", "nije u toku"); predlog između se preskače
+NEGATIONS = ('ne', 'nije', 'nisu', 'nema', 'bez')
+PREPOSITIONS = ('u', 'na', 'pod')
+# poznate vrednosti NBS statusa povezanog lica (normalizovane) -> u blokadi; ostale se prepoznaju
+# po korenu 'blokad'/'blokir' bez negacije, osim kad je blokada ukinuta
+NBS_STATUS = {
+    'u blokadi': True, 'blokiran': True, 'blokiran racun': True, 'racun u blokadi': True,
+    'nije u blokadi': False, 'nema blokade': False, 'nema blokada': False, 'bez blokade': False,
+    'blokada ukinuta': False, 'ukinuta blokada': False, 'nije blokiran': False, 'deblokiran': False,
+    'aktivan': False, 'ok': False, '-': False, '': False,
+}
+BLOCKED_STATUS = ('blokad', 'blokir')
+LIFTED_STATUS = ('ukinut', 'skinut', 'prestal', 'zavrsen', 'okoncan')
+
+
+# statusi i uloge se ponavljaju iz reda u red, normalizacija teksta se pamti
+_label = functools.lru_cache(maxsize=4096)(normalize_label)
+
+
+def _format_date(value):
+    # kao ranije iz pandas-a: samo datum kad nema vremena
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d') if value.time() == datetime.min.time() else value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def iter_sheet_rows(worksheet, max_columns=None):
+    """Redovi lista kao rečnici po zaglavlju (prvi neprazan red); prazni redovi se preskaču.
+    Generator: u memoriji je samo tekući red."""
+    if getattr(worksheet, 'reset_dimensions', None):
+        # dimenzije u read-only fajlu umeju da budu pogrešne
+        worksheet.reset_dimensions()
+    header = None
+    for values in worksheet.iter_rows(values_only=True):
+        if max_columns is not None:
+            values = values[:max_columns]
+        if all(v is None or v == '' for v in values):
+            continue
+        if header is None:
+            header = [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(values)]
+            continue
+        yield {column: _format_date(values[i]) if i < len(values) else None for i, column in enumerate(header)}
+
+
+def _find_column(columns, *needles):
+    for column in columns:
+        if all(n in normalize_label(column) for n in needles):
+            return column
+    return None
+
+
+def _named(columns, name):
+    return next((c for c in columns if normalize_label(c).strip() == name), None)
+
+
+@functools.lru_cache(maxsize=64)
+def _stem_pattern(stems):
+    # koren mora biti na početku reči: 'aktiv' je u "aktivan", ali ne u "neaktivan"
+    return re.compile(r'\b(?:' + '|'.join(re.escape(s) for s in stems) + ')')
+
+
+def _mentions(label, stems):
+    """Da li normalizovan tekst sadrži reč koja počinje nekim od korena, a nije negirana."""
+    for match in _stem_pattern(stems).finditer(label):
+        words = label[:match.start()].split()
+        if words and words[-1] in PREPOSITIONS:
+            words = words[:-1]
+        if words and words[-1] in NEGATIONS:
+            continue
+        return True
+    return False
+
+
+@functools.lru_cache(maxsize=4096)
+def _status(text, closed=CLOSED_STATUS, active=ACTIVE_STATUS):
+    label = _label(text or '')
+    # zatvoreni i negativni oblici prvi: "Neaktivan", "nije u toku"
+    if _mentions(label, closed) or _mentions(label, INACTIVE_STATUS):
+        return 'zatvoren'
+    if _mentions(label, active):
+        return 'aktivan'
+    if _stem_pattern(active).search(label):
+        # aktivan oblik samo uz negaciju
+        return 'zatvoren'
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def _nbs_blocked(text):
+    label = ' '.join(_label(text or '').replace('.', ' ').split())
+    if label in NBS_STATUS:
+        return NBS_STATUS[label]
+    return _mentions(label, BLOCKED_STATUS) and not _mentions(label, LIFTED_STATUS)
+
+
+class TopRows:
+    """N redova sa najvećim ključem (heap); kod jednakog ključa prednost ima raniji red.
+    rows() ih vraća redom kojim su u listu."""
+
+    def __init__(self, n):
+        self.n = n
+        self._heap = []
+        self._order = itertools.count()
+
+    def add(self, key, row):
+        if self.n <= 0:
+            return
+        item = (key, -next(self._order), row)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def rows(self):
+        return [row for _, _, row in sorted(self._heap, key=lambda item: item[1], reverse=True)]
+
+
+def _max_date(current, value):
+    if isinstance(value, str) and value[:4].isdigit() and (current is None or value > current):
+        return value
+    return current
+
+
+def summarize_disputes(rows, top_n=None):
+    """(kolone, najznačajniji redovi, zbirni pregled) za 'Sudski sporovi'; značaj = aktivan, pa iznos."""
+    top = TopRows(TOP_ROWS if top_n is None else top_n)
+    summary = {'broj': 0, 'ukupan_iznos': 0.0, 'aktivnih': 0, 'aktivni_iznos': 0.0, 'zatvorenih': 0,
+               'nepoznat_status': 0, 'kao_tuzeni': 0, 'kao_tuzilac': 0, 'najstariji_datum': None, 'poslednji_datum': None}
+    columns = amount = status = role = date_column = None
+    oldest = None
+    for row in rows:
+        if columns is None:
+            columns = list(row)
+            amount = _find_column(columns, 'iznos')
+            status = _find_column(columns, 'status')
+            role = _find_column(columns, 'ulog') or _find_column(columns, 'stran')
+            date_column = _find_column(columns, 'datum')
+        value = to_number(row.get(amount)) if amount else None
+        state = _status(row.get(status)) if status else None
+
+        summary['broj'] += 1
+        summary['ukupan_iznos'] += value or 0
+        if state == 'aktivan':
+            summary['aktivnih'] += 1
+            summary['aktivni_iznos'] += value or 0
+        elif state == 'zatvoren':
+            summary['zatvorenih'] += 1
+        else:
+            summary['nepoznat_status'] += 1
+        party = _label(row.get(role) or '') if role else ''
+        summary['kao_tuzeni'] += 'tuzen' in party
+        summary['kao_tuzilac'] += 'tuzil' in party
+        if date_column:
+            started = row.get(date_column)
+            summary['poslednji_datum'] = _max_date(summary['poslednji_datum'], started)
+            if isinstance(started, str) and started[:4].isdigit() and (oldest is None or started < oldest):
+                oldest = started
+
+        top.add((state == 'aktivan', value or 0), row)
+
+    summary['najstariji_datum'] = oldest
+    if amount is None:
+        summary['ukupan_iznos'] = summary['aktivni_iznos'] = None
+    return _finish(top, summary, columns)
+
+
+def summarize_blockades(rows, top_n=None):
+    """(kolone, najznačajniji redovi, zbirni pregled) za 'Blokade'; značaj = u toku, pa iznos, pa broj dana."""
+    top = TopRows(TOP_ROWS if top_n is None else top_n)
+    summary = {'broj': 0, 'u_toku': 0, 'ukupno_dana': 0.0, 'najduza_dana': None, 'ukupan_iznos': 0.0,
+               'poslednja_od': None, 'poslednja_do': None}
+    columns = start = end = days = amount = None
+    for row in rows:
+        if columns is None:
+            columns = list(row)
+            start = _named(columns, 'od')
+            end = _named(columns, 'do')
+            days = _find_column(columns, 'dana')
+            amount = _find_column(columns, 'iznos')
+        active = bool(end) and row.get(end) in (None, '', 'NaT')
+        day_count = to_number(row.get(days)) if days else None
+        value = to_number(row.get(amount)) if amount else None
+
+        summary['broj'] += 1
+        summary['u_toku'] += active
+        summary['ukupno_dana'] += day_count or 0
+        if day_count is not None and (summary['najduza_dana'] is None or day_count > summary['najduza_dana']):
+            summary['najduza_dana'] = day_count
+        summary['ukupan_iznos'] += value or 0
+        if start:
+            summary['poslednja_od'] = _max_date(summary['poslednja_od'], row.get(start))
+        if end:
+            summary['poslednja_do'] = _max_date(summary['poslednja_do'], row.get(end))
+
+        top.add((active, value or 0, day_count or 0), row)
+
+    if days is None:
+        summary['ukupno_dana'] = None
+    if amount is None:
+        summary['ukupan_iznos'] = None
+    return _finish(top, summary, columns)
+
+
+def summarize_related(rows, top_n=None):
+    """(kolone, najznačajniji redovi, zbirni pregled) za 'Povezana lica'; prvo lica u blokadi ili stečaju."""
+    n = TOP_ROWS if top_n is None else top_n
+    top = TopRows(n)
+    summary = {'broj': 0, 'u_blokadi': 0, 'u_stecaju_ili_likvidaciji': 0, 'neaktivnih': 0, 'rizicna_lica': []}
+    columns = name = apr = nbs = None
+    for row in rows:
+        if columns is None:
+            columns = list(row)
+            name = columns[0] if columns else None
+            apr = _find_column(columns, 'apr')
+            nbs = _find_column(columns, 'nbs')
+        apr_status = _label(row.get(apr) or '') if apr else ''
+        # "Nema blokada", "nije u blokadi", "blokada ukinuta" nisu blokada
+        blocked = _nbs_blocked(row.get(nbs)) if nbs else False
+        bankrupt = _mentions(apr_status, BANKRUPTCY_STATUS)
+        inactive = _mentions(apr_status, INACTIVE_STATUS)
+
+        summary['broj'] += 1
+        summary['u_blokadi'] += blocked
+        summary['u_stecaju_ili_likvidaciji'] += bankrupt
+        summary['neaktivnih'] += inactive
+        if (blocked or bankrupt) and len(summary['rizicna_lica']) < n:
+            summary['rizicna_lica'].append(row.get(name))
+
+        top.add((blocked or bankrupt, inactive), row)
+
+    return _finish(top, summary, columns)
+
+
+def _finish(top, summary, columns):
+    for key, value in summary.items():
+        if isinstance(value, float):
+            summary[key] = round(value, 2)
+    rows = top.rows()
+    summary['prikazano_redova'] = len(rows)
+    return columns or [], rows, summary
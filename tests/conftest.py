@@ -0,0 +1,21 @@
+import os
+import sys
+
+# testovi se pokreću iz korena repozitorijuma (python -m pytest); moduli su na vrhu, ne u paketu
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import llm_client
+from fake_openai import FakeOpenAI
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Lokalni OpenAI servis; llm_client pravi nove klijente ka njemu, sa čistim circuit breaker-om."""
+    with FakeOpenAI() as server:
+        monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+        monkeypatch.setattr(llm_client, '_clients', {})
+        monkeypatch.setattr(llm_client, 'breaker', llm_client.CircuitBreaker())
+        monkeypatch.setattr(llm_client, 'metrics', llm_client._Metrics())
+        yield server
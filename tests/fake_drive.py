@@ -0,0 +1,80 @@
+"""Lažni Google Drive za testove, na nivou httplib2: googleapiclient pravi prave zahteve
+(files.list sa stranicama, files.create sa multipart uploadom), a odgovara ovaj objekat iz memorije.
+
+    drive = FakeDrive()
+    monkeypatch.setattr(google_drive_utils, '_authorized_http', lambda creds: drive)
+
+fail_list / fail_create = broj narednih zahteva te vrste koji dobijaju 500.
+"""
+import json
+import hashlib
+import threading
+from email.parser import BytesParser
+from urllib.parse import urlparse, parse_qs
+
+import httplib2
+
+
+class FakeDrive:
+
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.files = []
+        self.created = []
+        # broj zahteva za listanje (stranica) foldera
+        self.lists = 0
+        self.fail_list = 0
+        self.fail_create = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, content, folder_id):
+        with self._lock:
+            return self._add(name, content, folder_id)
+
+    def _add(self, name, content, folder_id):
+        file = {'id': f'drive-{len(self.files) + 1}', 'name': name, 'parents': [folder_id],
+                'md5Checksum': hashlib.md5(content).hexdigest()}
+        self.files.append(file)
+        return file
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        url = urlparse(uri)
+        query = parse_qs(url.query)
+        with self._lock:
+            if method == 'GET' and url.path.endswith('/files'):
+                return self._list(query)
+            if method == 'POST' and url.path.endswith('/upload/drive/v3/files'):
+                return self._create(body, headers)
+        return self._reply(404, {'error': {'message': f'nepoznat zahtev {method} {url.path}'}})
+
+    def _list(self, query):
+        self.lists += 1
+        if self.fail_list > 0:
+            self.fail_list -= 1
+            return self._reply(500, {'error': {'message': 'list nije uspeo'}})
+        folder_id = query['q'][0].split("'")[1]
+        files = [f for f in self.files if folder_id in f['parents']]
+        start = int(query.get('pageToken', ['0'])[0])
+        page = files[start:start + self.page_size]
+        response = {'files': [{'id': f['id'], 'md5Checksum': f['md5Checksum']} for f in page]}
+        if start + self.page_size < len(files):
+            response['nextPageToken'] = str(start + self.page_size)
+        return self._reply(200, response)
+
+    def _create(self, body, headers):
+        if self.fail_create > 0:
+            self.fail_create -= 1
+            return self._reply(500, {'error': {'message': 'upload nije uspeo'}})
+        # multipart/related: prvi deo su metapodaci (JSON), drugi sadržaj fajla
+        content_type = {k.lower(): v for k, v in headers.items()}['content-type']
+        body = body if isinstance(body, bytes) else body.encode('utf-8')
+        message = BytesParser().parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+        metadata_part, media_part = message.get_payload()
+        metadata = json.loads(metadata_part.get_payload())
+        file = self._add(metadata['name'], media_part.get_payload(decode=True), metadata['parents'][0])
+        self.created.append(file['name'])
+        return self._reply(200, {'id': file['id']})
+
+    @staticmethod
+    def _reply(status, payload):
+        return httplib2.Response({'status': status, 'content-type': 'application/json'}), json.dumps(payload).encode()
@@ -0,0 +1,159 @@
+"""Lokalni zamenski OpenAI servis za testove: /v1/responses (sa i bez strima), /v1/files i /v1/batches.
+
+    with FakeOpenAI() as server:
+        monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+
+fail_500 / fail_429 = broj narednih zahteva ka /v1/responses koji dobijaju tu grešku;
+batch zahtevi čiji prompt sadrži fail_marker završavaju u error fajlu.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DELTAS = ["Zdravo", " svete"]
+TEXT = "".join(DELTAS)
+USAGE = {
+    "input_tokens": 100, "output_tokens": 5, "total_tokens": 105,
+    "input_tokens_details": {"cached_tokens": 64}, "output_tokens_details": {"reasoning_tokens": 0},
+}
+
+
+def response_body(text=TEXT):
+    return {
+        "id": "resp_1", "object": "response", "created_at": 0, "model": "gpt-5", "status": "completed",
+        "output": [{"type": "message", "id": "msg_1", "role": "assistant", "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+        "usage": USAGE, "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, data, content_type='application/json', headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, obj, code=200, headers=None):
+        self._send(code, json.dumps(obj).encode(), headers=headers)
+
+    def do_GET(self):
+        server = self.server
+        parts = self.path.strip('/').split('/')
+        if parts[:2] == ['v1', 'batches'] and len(parts) == 3:
+            with server.lock:
+                batch = server.batches[parts[2]]
+                batch['polls'] += 1
+                if batch['polls'] >= server.polls_until_done and batch['status'] != 'completed':
+                    server.complete_batch(batch)
+                return self._json(server.batch_object(batch))
+        if parts[:2] == ['v1', 'files'] and parts[-1] == 'content':
+            return self._send(200, server.files[parts[2]].encode(), 'application/octet-stream')
+        self._json({"error": {"message": "not found"}}, 404)
+
+    def do_POST(self):
+        server = self.server
+        raw = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/v1/files':
+            # multipart: zadržavaju se samo JSONL linije zahteva
+            lines = [line for line in raw.decode('utf-8', 'replace').splitlines() if line.startswith('{"custom_id"')]
+            with server.lock:
+                file_id = f'file-{len(server.files)}'
+                server.files[file_id] = '\n'.join(lines)
+            return self._json({"id": file_id, "object": "file", "bytes": len(raw), "created_at": 0,
+                               "filename": "requests.jsonl", "purpose": "batch", "status": "processed"})
+        body = json.loads(raw)
+        if self.path == '/v1/batches':
+            with server.lock:
+                batch_id = f'batch_{len(server.batches)}'
+                server.batches[batch_id] = {'id': batch_id, 'input': body['input_file_id'], 'status': 'in_progress',
+                                            'polls': 0, 'output': None, 'errors': None,
+                                            'total': len(server.files[body['input_file_id']].splitlines()), 'failed': 0}
+                return self._json(server.batch_object(server.batches[batch_id]))
+
+        with server.lock:
+            server.requests.append(body)
+            if server.fail_500 > 0:
+                server.fail_500 -= 1
+                return self._json({"error": {"message": "boom", "type": "server_error"}}, 500)
+            if server.fail_429 > 0:
+                server.fail_429 -= 1
+                return self._json({"error": {"message": "rate limited", "type": "rate_limit"}}, 429,
+                                  headers={'retry-after': str(server.retry_after)})
+        if not body.get('stream'):
+            return self._json(response_body())
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        events = [{"type": "response.output_text.delta", "item_id": "msg_1", "output_index": 0, "content_index": 0,
+                   "delta": delta, "sequence_number": i, "logprobs": []} for i, delta in enumerate(DELTAS)]
+        events.append({"type": "response.completed", "response": response_body(), "sequence_number": len(DELTAS)})
+        for event in events:
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.files = {}
+        self.batches = {}
+        self.fail_500 = 0
+        self.fail_429 = 0
+        self.retry_after = 0.05
+        self.fail_marker = None
+        self.polls_until_done = 2
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_port}/v1'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def batch_object(self, batch):
+        done = batch['status'] == 'completed'
+        return {"id": batch['id'], "object": "batch", "endpoint": "/v1/responses", "input_file_id": batch['input'],
+                "completion_window": "24h", "status": batch['status'], "created_at": 0,
+                "output_file_id": batch['output'], "error_file_id": batch['errors'],
+                "request_counts": {"total": batch['total'], "failed": batch['failed'],
+                                   "completed": batch['total'] - batch['failed'] if done else 0}}
+
+    def complete_batch(self, batch):
+        output, errors = [], []
+        for line in self.files[batch['input']].splitlines():
+            request = json.loads(line)
+            if self.fail_marker and self.fail_marker in request['body']['input']:
+                errors.append({"id": "batch_req", "custom_id": request['custom_id'], "response": None,
+                               "error": {"code": "invalid_request", "message": "failed"}})
+            else:
+                body = response_body(f"Komentar za {request['custom_id']}")
+                output.append({"id": "batch_req", "custom_id": request['custom_id'], "error": None,
+                               "response": {"status_code": 200, "request_id": "req", "body": body}})
+        for key, records in (('output', output), ('errors', errors)):
+            if records:
+                file_id = f"{key}-{batch['id']}"
+                self.files[file_id] = '\n'.join(json.dumps(r) for r in records) + '\n'
+                batch[key] = file_id
+        batch['failed'] = len(errors)
+        batch['status'] = 'completed'
@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+import threading
+import logging.handlers
+
+from artifact_store import ArtifactStore
+
+
+def _names(timestamp, client='FIRMA DOO'):
+    return (f"json/{timestamp}_ana_{client}_data_for_ai.json",
+            f"komentari/{client}/{timestamp}_ana_{client}_ai_comment.txt")
+
+
+def _age(store, name, seconds):
+    entry = store._entries[name]
+    entry['created'] = entry['accessed'] = time.time() - seconds
+
+
+def test_quota_eviction_keeps_latest_analysis_per_client(tmp_path):
+    store = ArtifactStore(str(tmp_path), dirs=('json', 'komentari'), max_bytes=10 ** 9, min_age_seconds=0)
+    old, new = _names('2025-01-01_10-00-00'), _names('2025-02-01_10-00-00')
+    other = _names('2025-01-15_10-00-00', client='DRUGA DOO')
+    for age, names in ((300, old), (200, new), (250, other)):
+        for name in names:
+            store.write_bytes(name, b'x' * 100)
+            _age(store, name, age)
+    # najnovija analiza je i najdavnije korišćena
+    for name in new:
+        store._entries[name]['accessed'] -= 1000
+
+    store.max_bytes = 100
+    store._evict_over_quota()
+
+    assert set(store.names()) == set(new) | set(other)
+
+
+def test_age_expiry_keeps_latest_analysis_per_client(tmp_path):
+    store = ArtifactStore(str(tmp_path), dirs=('json', 'komentari', 'logs'), max_age_seconds=100)
+    old, new = _names('2025-01-01_10-00-00'), _names('2025-02-01_10-00-00')
+    for age, names in ((500, old), (400, new), (400, ('logs/sesija.log',))):
+        for name in names:
+            store.write_bytes(name, b'{}')
+            _age(store, name, age)
+
+    report = store.compact()
+
+    assert report['expired'] == 3
+    assert set(store.names()) == set(new)
+    assert all(os.path.exists(store.path(name)) for name in new)
+
+
+def test_compress_keeps_lines_appended_while_compressing(tmp_path):
+    store = ArtifactStore(str(tmp_path), dirs=('logs',))
+    name = 'logs/sesija.log'
+    path = store.path(name)
+    os.makedirs(os.path.dirname(path))
+    handler = logging.handlers.WatchedFileHandler(path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger('test.artifacts.compress')
+    logger.propagate = False
+    logger.addHandler(handler)
+    lines = 3000
+
+    def write():
+        for i in range(lines):
+            if i % 20 == 0:
+                time.sleep(0.002)
+            if i % 2:
+                logger.warning('handler %d', i)
+            else:
+                # dopisivanje otvaranjem po imenu (kao metrike)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(f'append {i}\n')
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    rounds = 0
+    while writer.is_alive():
+        if os.path.exists(path):
+            store._compress(name)
+            rounds += 1
+    writer.join()
+    store._compress(name)
+    assert rounds > 1
+    handler.close()
+    logger.removeHandler(handler)
+
+    written = store.read_text(name).splitlines()
+    assert len(written) == lines
+    assert {int(line.split()[1]) for line in written} == set(range(lines))
+    assert os.path.exists(path + '.gz')
+    assert not [f for f in os.listdir(os.path.dirname(path)) if f.endswith('.tmp')]
@@ -0,0 +1,54 @@
+import os
+import time
+
+from cache_utils import DiskCache
+
+
+def _age(cache, key, seconds):
+    path = cache._path(key)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_expiry_uses_write_time(tmp_path):
+    cache = DiskCache(str(tmp_path), max_age_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    _age(cache, 'a', 120)
+    _age(cache, 'b', 30)
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    # pristup ne podmlađuje unos: starost ostaje od upisa
+    assert time.time() - os.stat(cache._path('b')).st_mtime >= 29
+
+    _age(cache, 'b', 120)
+    cache.evict()
+    assert not os.listdir(tmp_path)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 6, evict_every=1000)
+    for key in 'abc':
+        cache.set(key, 'x' * 100)
+        _age(cache, key, 10)
+    cache.get('a')
+    cache.max_bytes = 250
+    cache.evict()
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+
+def test_scans_directory_only_when_due(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 6, evict_every=10)
+    scans = []
+    original = cache.evict
+    monkeypatch.setattr(cache, 'evict', lambda: (scans.append(1), original()))
+    for i in range(25):
+        cache.set(str(i), i)
+    # prvi upis (procena veličine) i zatim na svakih 10 upisa
+    assert len(scans) == 3
+
+    cache.max_bytes = 1
+    cache.set('veliki', 'x' * 100)
+    assert len(scans) == 4
@@ -0,0 +1,155 @@
+from datetime import datetime
+
+import pytest
+
+import client_delta
+import portfolio_index
+from artifact_store import ArtifactStore
+from client_delta import diff, mode, find_previous, stale, _material
+
+
+def _client(name='FIRMA DOO', pib='100200300', **changes):
+    client = {
+        'osnovne_informacije': [{'Atribut': 'Naziv', 'Vrednost': name},
+                                {'Atribut': 'Datum izveštaja', 'Vrednost': '2025-01-01'},
+                                {'Atribut': 'PIB', 'Vrednost': pib}],
+        'ocena_rizika': [{'Atribut': 'Broj blokada', 'Vrednost': 2}],
+        'predlogRSD': [{'Atribut': 'Kreditni limit', 'Vrednost RSD': 1_000_000}],
+        'finansijska_analizaEUR': [{'Pozicija': 'Poslovni prihodi', '2023': 500_000, '2024': 600_000}],
+        'istorija_blokada': [{'Od': '2024-01-01', 'Do': '2024-01-05', 'Broj dana': 4}],
+        'zbirni_pregled': {'istorija_blokada': {'broj': 1, 'ukupno_dana': 4.0, 'ukupan_iznos': 250_000.0}},
+    }
+    for section, value in changes.items():
+        client[section] = value
+    return client
+
+
+@pytest.mark.parametrize('path, before, after, material', [
+    # iznosi (i celi brojevi) preko praga
+    (('finansijska_analizaEUR', 'Poslovni prihodi', '2024'), 600_000, 603_000, False),
+    (('finansijska_analizaEUR', 'Poslovni prihodi', '2024'), 600_000, 610_000, True),
+    (('finansijska_analizaEUR', 'Poslovni prihodi', '2024'), '600,000.00', '600,500.00', False),
+    (('zbirni_pregled', 'istorija_blokada', 'ukupan_iznos'), 250_000.0, 250_100.0, False),
+    # brojevi, dani i limit tačno
+    (('ocena_rizika', 'Broj blokada', 'Vrednost'), 2, 3, True),
+    (('istorija_blokada', '2024-01-01', 'Broj dana'), 400, 401, True),
+    (('zbirni_pregled', 'istorija_blokada', 'ukupno_dana'), 400.0, 401.0, True),
+    (('zbirni_pregled', 'sudski sporovi', 'broj'), 150, 151, True),
+    (('predlogRSD', 'Kreditni limit', 'Vrednost RSD'), 1_000_000, 1_000_100, True),
+    (('predlogRSD', 'Kreditni limit', 'Vrednost RSD'), 1_000_000, 1_000_000.0, False),
+    # datumi izveštaja i prazne vrednosti
+    (('osnovne_informacije', 'Datum izveštaja', 'Vrednost'), '2025-01-01', '2025-02-01', False),
+    (('istorija_blokada', '2024-01-01', 'Do'), None, 'NaT', False),
+    (('istorija_blokada', '2024-01-01', 'Do'), 'NaT', '2024-01-05', True),
+])
+def test_material(path, before, after, material):
+    assert _material(path, before, after, 0.01) is material
+
+
+def test_small_amount_changes_and_report_dates_are_unchanged():
+    current = _client(
+        osnovne_informacije=[{'Atribut': 'Naziv', 'Vrednost': 'FIRMA DOO'},
+                             {'Atribut': 'Datum izveštaja', 'Vrednost': '2025-03-01'},
+                             {'Atribut': 'PIB', 'Vrednost': '100200300'}],
+        finansijska_analizaEUR=[{'Pozicija': 'Poslovni prihodi', '2023': 500_000, '2024': 601_000}],
+    )
+    delta = diff(_client(), current)
+    assert delta == {'sekcije': [], 'promene': [], 'ukupno_promena': 0}
+    assert mode(delta) == 'unchanged'
+
+
+def test_changed_values_and_rows_are_listed_by_section():
+    current = _client(
+        ocena_rizika=[{'Atribut': 'Broj blokada', 'Vrednost': 3}],
+        istorija_blokada=[{'Od': '2024-01-01', 'Do': '2024-01-05', 'Broj dana': 4},
+                          {'Od': '2025-02-01', 'Do': None, 'Broj dana': 10}],
+        zbirni_pregled={'istorija_blokada': {'broj': 2, 'ukupno_dana': 14.0, 'ukupan_iznos': 250_000.0}},
+    )
+    delta = diff(_client(), current)
+
+    assert delta['sekcije'] == ['ocena_rizika', 'istorija_blokada', 'zbirni_pregled']
+    assert delta['ukupno_promena'] == 4
+    changes = {(c['sekcija'], c['stavka'], c['polje']): (c['pre'], c['posle']) for c in delta['promene']}
+    assert changes[('ocena_rizika', 'Broj blokada', 'Vrednost')] == (2, 3)
+    # nov red ide ceo
+    assert changes[('istorija_blokada', '2025-02-01', None)] == (None, current['istorija_blokada'][1])
+    assert changes[('zbirni_pregled', 'istorija_blokada', 'ukupno_dana')] == (4.0, 14.0)
+    assert mode(delta) == 'delta'
+
+
+def test_too_many_changed_sections_is_full(monkeypatch):
+    monkeypatch.setattr(client_delta, 'DELTA_MAX_SECTIONS', 1)
+    current = _client(ocena_rizika=[{'Atribut': 'Broj blokada', 'Vrednost': 3}],
+                      predlogRSD=[{'Atribut': 'Kreditni limit', 'Vrednost RSD': 500_000}])
+    delta = diff(_client(), current)
+    assert delta['sekcije'] == ['ocena_rizika', 'predlogRSD']
+    assert mode(delta) == 'full'
+
+
+@pytest.fixture
+def stored(tmp_path):
+    store = ArtifactStore(str(tmp_path / 'output'), dirs=('json', 'komentari'))
+    db_path = str(tmp_path / 'portfolio.sqlite')
+
+    def save(timestamp, client_json, name, files=True, **versions):
+        json_name = f"json/{timestamp}_ana_{name}_data_for_ai.json"
+        comment_name = f"komentari/{name}/{timestamp}_ana_{name}_ai_comment.txt"
+        if files:
+            store.write_json(json_name, client_json)
+            store.write_text(comment_name, f"komentar {timestamp}")
+        portfolio_index.record_analysis(client_json, json_name, comment_name, 'ana', name,
+                                        analyzed_at=datetime.strptime(timestamp, '%Y-%m-%d_%H-%M-%S'), db_path=db_path,
+                                        **versions)
+        return json_name
+
+    return store, db_path, save
+
+
+def test_find_previous_uses_latest_indexed_analysis_with_files(stored):
+    store, db_path, save = stored
+    save('2025-01-01_10-00-00', _client(), 'FIRMA DOO')
+    latest = save('2025-02-01_10-00-00', _client(), 'FIRMA DOO')
+    # novija analiza čiji fajlovi više ne postoje se preskače
+    save('2025-03-01_10-00-00', _client(), 'FIRMA DOO', files=False)
+    # ime koje se završava istim nazivom je drugi klijent
+    save('2025-04-01_10-00-00', _client('NOVA FIRMA DOO', pib='999'), 'NOVA FIRMA DOO')
+
+    found = find_previous(store, _client(), 'FIRMA DOO', db_path=db_path)
+    assert found['json_name'] == latest and found['analizirano'] == '2025-02-01 10:00:00'
+    assert find_previous(store, _client('DRUGA DOO', pib='555'), 'DRUGA DOO', db_path=db_path) is None
+
+
+def test_find_previous_matches_pib_before_name(stored):
+    store, db_path, save = stored
+    renamed = save('2025-01-01_10-00-00', _client('FIRMA DOO'), 'FIRMA DOO')
+    save('2025-02-01_10-00-00', _client('Firma AD', pib='777'), 'Firma AD')
+
+    # isti PIB pod novim nazivom
+    assert find_previous(store, _client('FIRMA AD'), 'FIRMA AD', db_path=db_path)['json_name'] == renamed
+    # bez PIB-a: po nazivu, bez obzira na velika slova
+    assert find_previous(store, _client('firma ad', pib=None), 'firma ad', db_path=db_path)['klijent'] == 'Firma AD'
+
+
+def test_previous_comment_is_stale_for_other_prompt_policy_or_dts(stored):
+    store, db_path, save = stored
+    client = _client()
+    # osnovana 01.06.2024: 11 meseci na dan prethodne analize, 13 meseci dva meseca kasnije (druga DTS ocena)
+    client['osnovne_informacije'].append({'Atribut': 'Datum osnivanja', 'Vrednost': '01.06.2024'})
+    save('2025-05-01_10-00-00', client, 'FIRMA DOO', prompt_version='shared-3', policy_version='p1')
+    previous = find_previous(store, client, 'FIRMA DOO', db_path=db_path)
+    unchanged = diff(client, client)
+
+    assert stale(previous, client, client, 'shared-3', 'p1', datetime(2025, 5, 20)) == []
+    assert mode(unchanged, []) == 'unchanged'
+    assert stale(previous, client, client, 'shared-4', 'p1', datetime(2025, 5, 20)) == ['verzija prompta']
+    assert stale(previous, client, client, 'shared-3', 'p2', datetime(2025, 5, 20)) == ['politika modela']
+    reasons = stale(previous, client, client, 'shared-3', 'p1', datetime(2025, 7, 1))
+    assert reasons == ['DTS ocena']
+    assert mode(unchanged, reasons) == 'full'
+
+
+def test_backfilled_analysis_without_versions_is_stale(stored):
+    store, db_path, save = stored
+    save('2025-05-01_10-00-00', _client(), 'FIRMA DOO')
+    previous = find_previous(store, _client(), 'FIRMA DOO', db_path=db_path)
+    assert stale(previous, _client(), _client(), 'shared-3', 'p1', datetime(2025, 5, 2)) == ['verzija prompta', 'politika modela']
@@ -0,0 +1,59 @@
+import io
+import os
+import json
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import comment_generator
+import excel_processor
+from cache_utils import DiskCache
+from benchmarks.workbook_generator import make_workbook
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # output/ i keševi u privremenom direktorijumu; parsiranje u nitima umesto procesa
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(comment_generator, 'openai_api_key', 'test-key')
+    monkeypatch.setattr(comment_generator, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(excel_processor, 'json_cache', DiskCache(str(tmp_path / 'cache' / 'json')))
+    monkeypatch.setattr(comment_generator, 'comment_cache', DiskCache(str(tmp_path / 'cache' / 'komentari')))
+    return tmp_path
+
+
+def test_openai_batch_round_trip(fake_openai, workdir):
+    ok = make_workbook(str(workdir / 'timok.xlsx'), seed=1)
+    failing = make_workbook(str(workdir / 'takovo.xlsx'), seed=2)
+    fake_openai.fail_marker = 'KOMPANIJA TAKOVO DOO'
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch_id = comment_generator.submit_openai_batch([ok, failing], parse_workers=1)
+        written, failures = comment_generator.collect_openai_batch(batch_id, poll_seconds=0)
+
+    assert written == 1
+    assert list(failures) == [failing]
+    with open(os.path.join(comment_generator.BATCH_DIR, f'{batch_id}.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    item = next(item for item in manifest['items'].values() if item['file_path'] == ok)
+    comments = os.listdir(os.path.join('output', 'KOMPANIJA TIMOK DOO', 'comments'))
+    assert len(comments) == 1
+    # komentar iz batch-a je i u kešu, pod istim ključem kao kod pojedinačne analize
+    assert comment_generator.comment_cache.get(item['cache_key']).startswith('Komentar za req-')
+    assert len(fake_openai.batches) == 1 and fake_openai.batches[batch_id]['polls'] >= 2
+
+
+def test_rate_limit_backs_off_through_shared_limiter(fake_openai, workdir, monkeypatch):
+    monkeypatch.setattr(excel_processor, 'comment_cache', DiskCache(str(workdir / 'cache' / 'komentari')))
+    fake_openai.fail_429 = 2
+    limiter = comment_generator.RateLimiter(rpm=100, tpm=10 ** 7)
+    client_json = {'osnovne_informacije': [{'Atribut': 'Naziv', 'Vrednost': 'Kupac d.o.o.'}]}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        comment = comment_generator.generate_with_backoff('prompt', client_json, limiter)
+
+    assert comment == 'Zdravo svete'
+    # svaki 429 je prošao kroz zajednički limiter, a ne kroz ponovne pokušaje klijenta
+    assert limiter.throttled == 2
+    assert len(fake_openai.requests) == 3
@@ -0,0 +1,151 @@
+import io
+import contextlib
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import excel_processor
+from excel_processor import WorkbookSnapshot, parse_record, _parse_book
+from cache_utils import DiskCache
+from benchmarks.workbook_generator import make_workbook
+from fake_openai import DELTAS, TEXT
+
+# regioni kao u parse_record: (usecols, skiprows, nrows, header)
+REGIONS = [
+    ('A:B', 0, 3, None),
+    ('A:D', 4, None, 0),
+    ('B:D', 4, 2, 0),
+    ('A:C', 1, 1, 1),
+    ('C:D', 0, 20, None),
+    (None, 2, None, 0),
+]
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['a1', 1])
+    ws.append([])
+    ws.append(['a3', 3.0, 'N/A', '12'])
+    ws.append([None, True, '=1/0', ' 14 '])
+    ws.append(['h1', None, 'h3', 'h1'])
+    ws.append(['x', datetime(2024, 1, 31), 'NA', 2.5])
+    ws.append(['y', None, 'tekst', 1])
+    ws.append([])
+    path = tmp_path / 'sveska.xlsx'
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize('usecols, skiprows, nrows, header', REGIONS)
+def test_read_matches_read_excel(workbook, usecols, skiprows, nrows, header):
+    expected = pd.read_excel(workbook, engine='openpyxl', usecols=usecols, skiprows=skiprows, nrows=nrows, header=header)
+    with WorkbookSnapshot(workbook) as book:
+        result = book.read(0, usecols=usecols, skiprows=skiprows, nrows=nrows, header=header)
+    pd.testing.assert_frame_equal(result, expected, check_column_type=False, check_index_type=False)
+
+
+def test_read_out_of_range_columns(workbook):
+    with WorkbookSnapshot(workbook) as book, pytest.raises(ValueError):
+        book.read(0, usecols='A:K')
+
+
+def test_parse_record_bytes_and_path(tmp_path):
+    path = make_workbook(str(tmp_path / 'sveska.xlsm'), disputes=10, blockades=5, related=3, history=4, seed=7)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from_path = parse_record(path).to_dict()
+        with open(path, 'rb') as f:
+            from_bytes = parse_record(f.read()).to_dict()
+    assert from_path == from_bytes
+    assert from_path['osnovne_informacije'] and from_path['bonitetna_ocena']
+
+
+def test_streamed_comment_is_cached(fake_openai, tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_processor, 'comment_cache', DiskCache(str(tmp_path)))
+    client_json = {'osnovne_informacije': [{'Atribut': 'Naziv', 'Vrednost': 'Kupac d.o.o.'}]}
+    deltas, usage = [], {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        comment, from_cache = excel_processor.generate_AIcomment_cached(
+            'prompt', 'test-key', client_json, 'v-test', on_delta=deltas.append, usage=usage)
+    assert (comment, from_cache) == (TEXT, False)
+    assert deltas == DELTAS
+    assert fake_openai.requests[-1]['stream'] is True
+    assert usage['output_tokens'] == 5 and usage['cached_tokens'] == 64
+
+    # pogodak u kešu: ceo komentar jednom, bez novog zahteva
+    deltas.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        comment, from_cache = excel_processor.generate_AIcomment_cached(
+            'prompt', 'test-key', client_json, 'v-test', on_delta=deltas.append)
+    assert (comment, from_cache) == (TEXT, True)
+    assert deltas == [TEXT] and len(fake_openai.requests) == 1
+
+
+class _PandasBook(WorkbookSnapshot):
+    # isti parse, ali svaki region čita pd.read_excel: referentni izlaz za poređenje
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.file_path = file_path
+
+    def read(self, sheet=0, usecols=None, skiprows=0, nrows=None, header=0):
+        return pd.read_excel(self.file_path, sheet_name=sheet, engine='openpyxl', usecols=usecols,
+                             skiprows=skiprows, nrows=nrows, header=header)
+
+
+# regioni koje čita _parse_book: (list, usecols, skiprows, nrows, header)
+PARSE_REGIONS = [
+    (0, 'E:F', 4, 12, None), (0, 'E:F', 18, 29, None), (0, 'I:J', 9, 11, None), (0, 'I:N', 26, 21, 0),
+    (0, 'E:F', 50, 6, None), (0, 'L:O', 7, 1, 1), (0, 'L:M', 10, 1, None), (0, 'L:M', 11, 1, None),
+    (0, 'I:K', 52, None, 0), ('Rezime (EUR)', None, 3, 30, 0),
+]
+
+
+def _irregular(path):
+    """Generisana sveska sa onim što pandas tumači posebno: duplirana i prazna zaglavlja,
+    NA tekstovi, True/False kao tekst, brojevi kao tekst i greške u formulama."""
+    from openpyxl import load_workbook
+    wb = load_workbook(path, keep_vba=True)
+    kupac, rezime = wb['Kupac'], wb['Rezime (EUR)']
+    kupac.cell(27, 11, 'Pozicija')          # duplirano zaglavlje -> 'Pozicija.1'
+    kupac.cell(27, 13).value = None         # prazno zaglavlje -> 'Unnamed: 4'
+    for row, value in zip(range(28, 34), ['N/A', 'NA', '#N/A', 'null', ' ', 'nan']):
+        kupac.cell(row, 12).value = value
+    kupac.cell(6, 6, 'True')
+    kupac.cell(7, 6, 'n/a')
+    kupac.cell(20, 6, ' 12 ')
+    kupac.cell(21, 6, '=1/0')
+    rezime.cell(4, 5, 'Pozicija')
+    rezime.cell(5, 3, 'NULL')
+    for row in range(5, 9):
+        rezime.cell(row, 7, 'false' if row % 2 else 'TRUE')
+    wb.save(path)
+    return path
+
+
+@pytest.fixture(params=[(1, False), (2, False), (5, False), (1, True), (4, True)], ids=lambda p: f"seed{p[0]}{'-irregular' if p[1] else ''}")
+def generated_workbook(request, tmp_path):
+    seed, irregular = request.param
+    path = make_workbook(str(tmp_path / 'sveska.xlsm'), disputes=15, blockades=10, related=6, history=5, seed=seed)
+    return _irregular(path) if irregular else path
+
+
+def test_parse_regions_match_read_excel(generated_workbook):
+    with WorkbookSnapshot(generated_workbook) as book:
+        for sheet, usecols, skiprows, nrows, header in PARSE_REGIONS:
+            expected = pd.read_excel(generated_workbook, sheet_name=sheet, engine='openpyxl', usecols=usecols,
+                                     skiprows=skiprows, nrows=nrows, header=header)
+            result = book.read(sheet, usecols=usecols, skiprows=skiprows, nrows=nrows, header=header)
+            pd.testing.assert_frame_equal(result, expected, check_column_type=False, check_index_type=False,
+                                          obj=f"{sheet} {usecols} skiprows={skiprows}")
+
+
+def test_client_json_matches_read_excel(generated_workbook):
+    # JSON koji ide modelu mora biti isti kao kad regione čita pd.read_excel
+    with contextlib.redirect_stdout(io.StringIO()):
+        with _PandasBook(generated_workbook) as book:
+            expected = _parse_book(book).to_dict()
+        result = parse_record(generated_workbook).to_dict()
+    assert result == expected
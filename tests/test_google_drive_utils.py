@@ -0,0 +1,87 @@
+import hashlib
+import logging
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import google_drive_utils
+from fake_drive import FakeDrive
+
+FOLDER = 'folder-1'
+logger = logging.getLogger('test.drive')
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    drive = FakeDrive(page_size=2)
+    monkeypatch.setattr(google_drive_utils, '_service', None)
+    monkeypatch.setattr(google_drive_utils, '_authorized_http', lambda creds: drive)
+    monkeypatch.setattr(google_drive_utils, '_folder_cache', {})
+    return drive
+
+
+@pytest.fixture
+def creds():
+    return Credentials(token='test-token')
+
+
+def test_list_folder_md5_reads_all_pages(drive, creds):
+    for i in range(5):
+        drive.add(f'f{i}.json', f'sadržaj {i}'.encode(), FOLDER)
+    drive.add('drugi.json', b'drugi folder', 'folder-2')
+    existing = google_drive_utils.list_folder_md5(creds, FOLDER)
+    assert len(existing) == 5
+    assert existing[hashlib.md5('sadržaj 3'.encode()).hexdigest()] == 'drive-4'
+
+
+def test_upload_many_skips_files_already_in_folder(drive, creds, tmp_path):
+    on_disk = tmp_path / 'KLIJENT.json'
+    on_disk.write_bytes(b'{"a": 1}')
+    existing = drive.add('stari.json', b'{"a": 1}', FOLDER)
+    workbook = bytes(range(256)) * 10
+    in_memory = str(tmp_path / 'sveska.xlsx')
+
+    result = google_drive_utils.upload_drive_many([str(on_disk), in_memory], creds, FOLDER, logger,
+                                                  data={in_memory: workbook})
+
+    assert result[str(on_disk)] == existing['id']
+    assert drive.created == ['sveska.xlsx']
+    assert drive.files[-1]['md5Checksum'] == hashlib.md5(workbook).hexdigest()
+
+
+def test_failed_upload_returns_none_and_succeeds_on_retry(drive, creds, tmp_path):
+    path = tmp_path / 'komentar.txt'
+    path.write_text('AI komentar', encoding='utf-8')
+    drive.fail_list = 1
+    drive.fail_create = 1
+
+    # ni listanje ni upload nisu uspeli: None, da bi outbox pokušao ponovo
+    assert google_drive_utils.upload_drive_many([str(path)], creds, FOLDER, logger) == {str(path): None}
+    first = google_drive_utils.upload_drive_many([str(path)], creds, FOLDER, logger)
+    assert first[str(path)] is not None
+    # treći put je fajl već u folderu
+    assert google_drive_utils.upload_drive_many([str(path)], creds, FOLDER, logger) == first
+    assert drive.created == ['komentar.txt']
+
+
+def test_folder_listing_is_cached_and_updated_by_uploads(drive, creds, tmp_path, monkeypatch):
+    for i in range(5):
+        drive.add(f'f{i}.json', f'sadržaj {i}'.encode(), FOLDER)
+    first, second = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    first.write_text('prvi', encoding='utf-8')
+    second.write_text('drugi', encoding='utf-8')
+
+    uploaded = google_drive_utils.upload_drive_many([str(first)], creds, FOLDER, logger)
+    lists = drive.lists
+    assert lists == 3  # 5 fajlova, po 2 na stranici
+    # drugo slanje ne lista folder ponovo, a fajl poslat malopre prepoznaje iz keša
+    again = google_drive_utils.upload_drive_many([str(first), str(second)], creds, FOLDER, logger)
+    assert drive.lists == lists
+    assert again[str(first)] == uploaded[str(first)]
+    assert drive.created == ['a.txt', 'b.txt']
+
+    # posle isteka keša folder se čita ponovo
+    monkeypatch.setattr(google_drive_utils, 'FOLDER_CACHE_SECONDS', 0)
+    google_drive_utils.upload_drive_many([str(second)], creds, FOLDER, logger)
+    assert drive.lists > lists
+    assert drive.created == ['a.txt', 'b.txt']
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import types
+import signal
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import job_runner
+
+
+def test_parse_pool_does_not_rerun_script(tmp_path, monkeypatch):
+    # kao pod Streamlit-om: __main__ je lažni modul sa __file__ skripta aplikacije
+    marker = tmp_path / 'izvrseno'
+    script = tmp_path / 'app.py'
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    script_main = types.ModuleType('__main__')
+    script_main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, '__main__', script_main)
+    monkeypatch.setattr(job_runner, '_parse_pool', None)
+
+    pool = job_runner.parse_pool()
+    try:
+        pids = {pool.submit(os.getpid).result() for _ in range(6)}
+        # radni proces koji pade se zamenjuje novim; ni on ne izvršava skriptu
+        os.kill(pids.pop(), signal.SIGKILL)
+        pids = {pool.submit(os.getpid).result() for _ in range(6)}
+        assert os.getpid() not in pids
+        assert sys.modules['__main__'] is script_main
+        assert not marker.exists()
+    finally:
+        pool.shutdown()
+
+
+@pytest.fixture
+def parse_pool(monkeypatch):
+    monkeypatch.setattr(job_runner, '_parse_pool', None)
+    pool = job_runner.parse_pool()
+    yield pool
+    pool.shutdown()
+
+
+def test_parse_pool_recovers_after_worker_is_killed(parse_pool):
+    pid = parse_pool.submit(os.getpid).result()
+    broken = job_runner._parse_pool
+    os.kill(pid, signal.SIGKILL)
+    deadline = time.time() + 5
+    while not broken._broken and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert parse_pool.submit(sum, [1, 2, 3]).result(timeout=30) == 6
+    assert job_runner._parse_pool is not broken
+
+
+def test_parse_pool_retries_once_when_task_kills_worker(parse_pool, monkeypatch):
+    created = []
+    make_pool = job_runner.ProcessPoolExecutor
+
+    def counting_pool(*args, **kwargs):
+        created.append(make_pool(*args, **kwargs))
+        return created[-1]
+    monkeypatch.setattr(job_runner, 'ProcessPoolExecutor', counting_pool)
+
+    # zadatak koji obara proces i drugi put: greška ide pozivaocu, a bazen ostaje upotrebljiv
+    with pytest.raises(BrokenProcessPool):
+        parse_pool.submit(os._exit, 1).result(timeout=30)
+    assert len(created) == 2
+    assert parse_pool.submit(os.getpid).result(timeout=30) != os.getpid()
+
+
+def test_transient_params_dropped_when_job_finishes():
+    def work(job, data):
+        assert job.params['data'] == data
+        return {'size': len(data)}
+
+    job_id = job_runner.submit('ana', ['parse'], work, {'data': b'x' * 10},
+                               params={'name': 'a.xlsx', 'data': b'x' * 10}, transient_params=('data',))
+    job = job_runner.get_job(job_id)
+    deadline = time.time() + 5
+    while job.finished is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.status == 'done' and job.result == {'size': 10}
+    assert job.params == {'name': 'a.xlsx'}
@@ -0,0 +1,59 @@
+import pytest
+from openai import RateLimitError
+
+import llm_client
+
+
+def test_rate_limit_reaches_caller_without_retry(fake_openai):
+    fake_openai.fail_429 = 1
+    with pytest.raises(RateLimitError):
+        llm_client.create_response('test-key', retry_rate_limits=False, model='gpt-5', input='x')
+    assert len(fake_openai.requests) == 1
+    assert llm_client.stats()['retries'] == 0
+    # 429 nije kvar servisa
+    assert llm_client.stats()['circuit'] == 'closed'
+
+
+def test_rate_limit_retried_by_default(fake_openai):
+    fake_openai.fail_429 = 1
+    response = llm_client.create_response('test-key', model='gpt-5', input='x')
+    assert response.output_text == 'Zdravo svete'
+    assert len(fake_openai.requests) == 2
+    assert llm_client.stats()['retries'] == 1
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, 'BACKOFF_BASE_SECONDS', 0.01)
+
+
+def test_server_errors_retried_then_succeed(fake_openai, fast_backoff):
+    fake_openai.fail_500 = 2
+    response = llm_client.create_response('test-key', model='gpt-5', input='x')
+    assert response.output_text == 'Zdravo svete'
+    stats = llm_client.stats()
+    assert (stats['retries'], stats['failures'], stats['circuit']) == (2, 0, 'closed')
+    # isti klijent i keep-alive konekcija za sve pokušaje
+    assert stats['reused_connections'] >= 1
+
+
+def test_stream_retried_before_first_event(fake_openai, fast_backoff):
+    fake_openai.fail_500 = 1
+    events = list(llm_client.stream_response('test-key', model='gpt-5', input='x'))
+    deltas = [event.delta for event in events if event.type == 'response.output_text.delta']
+    assert ''.join(deltas) == 'Zdravo svete'
+    assert llm_client.stats()['retries'] == 1
+
+
+def test_circuit_opens_after_repeated_failures(fake_openai, fast_backoff, monkeypatch):
+    monkeypatch.setattr(llm_client, 'breaker', llm_client.CircuitBreaker(failure_threshold=3, cooldown_seconds=60))
+    fake_openai.fail_500 = 10
+    # treći neuspeh otvara circuit, četvrti pokušaj se ne šalje
+    with pytest.raises(llm_client.CircuitOpenError):
+        llm_client.create_response('test-key', model='gpt-5', input='x')
+    assert len(fake_openai.requests) == 3
+    assert llm_client.stats()['circuit'] == 'open'
+    with pytest.raises(llm_client.CircuitOpenError):
+        llm_client.create_response('test-key', model='gpt-5', input='x')
+    assert len(fake_openai.requests) == 3
+    assert llm_client.stats()['rejected'] == 2
@@ -0,0 +1,109 @@
+import json
+import importlib
+
+import pytest
+
+import model_routing
+from model_routing import DEFAULT_POLICY, classify, route, load_policy
+
+
+def _client(grade='B2', blokada='Nema', sporovi='Nema', blockages=None, summary=None):
+    client = {
+        'bonitetna_ocena': [{'Bonitetna ocena': grade, 'DTS ocena': 'A'}],
+        'ocena_rizika': [{'Atribut': 'NBS blokada', 'Vrednost': blokada},
+                         {'Atribut': 'Sudski sporovi', 'Vrednost': sporovi}],
+        'istorija_blokada': blockages or [],
+    }
+    if summary is not None:
+        client['zbirni_pregled'] = {'istorija_blokada': summary}
+    return client
+
+
+@pytest.mark.parametrize('grade, tier', [
+    ('A1', 'nizak'), ('b3', 'nizak'), ('C1', 'srednji'), ('D2', 'visok'), ('E', 'visok'), ('', 'srednji'),
+])
+def test_grade_rules(grade, tier):
+    assert classify(_client(grade=grade))[0] == tier
+
+
+def test_clean_client_with_disputes_or_past_blockages_is_not_low_risk():
+    tier, reasons = classify(_client(sporovi='Ima'))
+    assert tier == 'srednji' and 'sporovi' in reasons
+    tier, reasons = classify(_client(blockages=[{'Od': '2024-01-01', 'Do': '2024-01-05', 'Broj dana': 4}]))
+    assert tier == 'srednji' and 'ranije blokade' in reasons
+
+
+def test_nbs_blockage_is_high_risk():
+    tier, reasons = classify(_client(grade='A1', blokada='Da'))
+    assert tier == 'visok' and reasons == ['NBS blokada']
+
+
+@pytest.mark.parametrize('days, tier', [(30, 'srednji'), (31, 'visok')])
+def test_blockage_days_rule(days, tier):
+    rows = [{'Od': '2024-01-01', 'Do': '2024-01-20', 'Broj dana': days - 10},
+            {'Od': '2024-03-01', 'Do': '2024-03-10', 'Broj dana': 10}]
+    assert classify(_client(grade='A1', blockages=rows))[0] == tier
+    # zbir iz zbirnog pregleda (svi redovi lista) ima prednost nad prikazanim redovima
+    summary = {'broj': 2, 'ukupno_dana': float(days), 'u_toku': 0}
+    assert classify(_client(grade='A1', blockages=rows[:1], summary=summary))[0] == tier
+
+
+def test_active_blockage_is_high_risk():
+    rows = [{'Od': '2025-05-01', 'Do': 'NaT', 'Broj dana': 2}]
+    assert classify(_client(grade='A1', blockages=rows)) == ('visok', ['blokada u toku'])
+
+
+def test_policy_rules_change_classification():
+    policy = load_policy()
+    policy['rules']['high_risk_blockage_days'] = 5
+    rows = [{'Od': '2024-01-01', 'Do': '2024-01-10', 'Broj dana': 9}]
+    assert classify(_client(grade='A1', blockages=rows), policy) == ('visok', ['9 dana blokade'])
+
+
+def test_route_returns_tier_settings():
+    settings = route(_client(grade='A1'))
+    assert settings['tier'] == 'nizak'
+    assert settings['model'] == DEFAULT_POLICY['tiers']['nizak']['model']
+    assert settings['max_output_tokens'] == DEFAULT_POLICY['tiers']['nizak']['max_output_tokens']
+    assert route(_client(grade='E1'))['reasoning'] == {'effort': 'high'}
+
+
+def test_policy_override_is_merged(tmp_path):
+    path = tmp_path / 'policy.json'
+    path.write_text(json.dumps({'tiers': {'nizak': {'model': 'gpt-5-nano'}}, 'rules': {'low_risk_grades': ['A']}}))
+    policy = load_policy(str(path))
+    assert policy['tiers']['nizak']['model'] == 'gpt-5-nano'
+    assert policy['tiers']['nizak']['max_output_tokens'] == DEFAULT_POLICY['tiers']['nizak']['max_output_tokens']
+    assert policy['rules']['high_risk_blockage_days'] == 30
+    assert classify(_client(grade='B1'), policy)[0] == 'srednji'
+    # podrazumevana politika se ne menja
+    assert DEFAULT_POLICY['tiers']['nizak']['model'] != 'gpt-5-nano'
+
+
+@pytest.mark.parametrize('content', [
+    '{"tiers": {"nizak": ',
+    '["nizak"]',
+    '{"tiers": {"nizak": "gpt-5-nano"}}',
+    '{"rules": ["A"]}',
+    '{"tiers": {"kritican": {"model": "gpt-5"}}}',
+])
+def test_invalid_policy_override_falls_back_to_default(tmp_path, monkeypatch, capsys, content):
+    path = tmp_path / 'policy.json'
+    path.write_text(content)
+    monkeypatch.setenv('AI_ROUTING_POLICY', str(path))
+
+    assert load_policy() == load_policy(str(tmp_path / 'nema.json')) == model_routing._default_policy()
+    assert 'AI_ROUTING_POLICY' in capsys.readouterr().out
+
+    # ni uvoz modula ne pada zbog lošeg fajla
+    importlib.reload(model_routing)
+    assert model_routing.POLICY == model_routing._default_policy()
+    monkeypatch.delenv('AI_ROUTING_POLICY')
+    importlib.reload(model_routing)
+
+
+def test_policy_version_follows_policy():
+    policy = load_policy()
+    assert model_routing.policy_version(policy) == model_routing.policy_version(load_policy())
+    policy['tiers']['nizak']['model'] = 'gpt-5-nano'
+    assert model_routing.policy_version(policy) != model_routing.policy_version(load_policy())
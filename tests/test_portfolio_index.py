@@ -0,0 +1,102 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import portfolio_index
+from artifact_store import ArtifactStore
+
+
+def test_old_database_gets_added_columns(tmp_path):
+    db_path = str(tmp_path / 'portfolio.sqlite')
+    old_columns = [c for c in portfolio_index.COLUMNS if c not in portfolio_index.ADDED_COLUMNS]
+    connection = sqlite3.connect(db_path)
+    connection.execute(f"CREATE TABLE analize ({', '.join(old_columns)}, PRIMARY KEY (json_name))")
+    connection.execute("INSERT INTO analize (json_name, analizirano, klijent_kljuc) VALUES ('json/a.json', '2025-01-01', 'a')")
+    connection.commit()
+    connection.close()
+
+    assert portfolio_index.query(db_path=db_path)[list(portfolio_index.ADDED_COLUMNS)].isna().all().all()
+    assert portfolio_index.count(db_path) == 1
+
+
+def _client(name, pib, blockage=None, nbs='Nema'):
+    client = {
+        'osnovne_informacije': [{'Atribut': 'Naziv', 'Vrednost': name}, {'Atribut': 'PIB', 'Vrednost': pib}],
+        'ocena_rizika': [{'Atribut': 'NBS blokada', 'Vrednost': nbs}],
+        'bonitetna_ocena': [{'Bonitetna ocena': 'B1', 'DTS ocena': 3.5}],
+    }
+    if blockage:
+        client['zbirni_pregled'] = {'istorija_blokada': blockage}
+    return client
+
+
+def _save(store, timestamp, client, name, user='ana'):
+    json_name = f"json/{timestamp}_{user}_{name}_data_for_ai.json"
+    comment_name = f"komentari/{name}/{timestamp}_{user}_{name}_ai_comment.txt"
+    store.write_json(json_name, client)
+    store.write_text(comment_name, 'komentar')
+    return json_name, comment_name
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / 'output'), dirs=('json', 'komentari'))
+
+
+def test_backfill_is_idempotent_and_keeps_recorded_rows(store, tmp_path):
+    db_path = str(tmp_path / 'portfolio.sqlite')
+    _save(store, '2025-01-01_10-00-00', _client('FIRMA DOO', '1'), 'FIRMA DOO')
+    _save(store, '2025-01-02_10-00-00', _client('DRUGA DOO', '2'), 'DRUGA DOO')
+    recorded = _save(store, '2025-01-03_10-00-00', _client('FIRMA DOO', '1'), 'FIRMA DOO')
+    # analiza upisana pre backfill-a, sa nivoom rizika i režimom
+    portfolio_index.record_analysis(_client('FIRMA DOO', '1'), *recorded, 'ana', 'FIRMA DOO',
+                                    analyzed_at=datetime(2025, 1, 3, 10), tier='nizak', mode='delta', db_path=db_path)
+
+    assert portfolio_index.backfill(store, db_path) == 2
+    assert portfolio_index.backfill(store, db_path) == 0
+    rows = portfolio_index.query(db_path=db_path)
+    assert len(rows) == 3 and rows['json_name'].is_unique
+    row = rows[rows['json_name'] == recorded[0]].iloc[0]
+    assert (row['nivo_rizika'], row['rezim']) == ('nizak', 'delta')
+    backfilled = rows[rows['json_name'] != recorded[0]]
+    assert backfilled['comment_name'].notna().all() and backfilled['nivo_rizika'].isna().all()
+
+
+def test_latest_only_returns_one_row_per_client(store, tmp_path):
+    db_path = str(tmp_path / 'portfolio.sqlite')
+    for timestamp in ('2025-01-01_10-00-00', '2025-02-01_10-00-00-1', '2025-02-01_10-00-00-2'):
+        _save(store, timestamp, _client('FIRMA DOO', '1'), 'FIRMA DOO')
+    _save(store, '2025-01-15_10-00-00', _client('Druga doo', '2'), 'Druga doo')
+    _save(store, '2025-01-20_10-00-00', _client('DRUGA DOO', '2'), 'DRUGA DOO', user='mika')
+    portfolio_index.backfill(store, db_path)
+
+    latest = portfolio_index.query(latest_only=True, db_path=db_path)
+    # dve analize u istoj sekundi (grupa): jedna, poslednja po imenu
+    assert latest['json_name'].tolist() == ['json/2025-02-01_10-00-00-2_ana_FIRMA DOO_data_for_ai.json',
+                                            'json/2025-01-20_10-00-00_mika_DRUGA DOO_data_for_ai.json']
+    # filter se primenjuje na poslednju analizu, a ne bira poslednju među filtriranim
+    assert portfolio_index.query(latest_only=True, user='ana', db_path=db_path)['klijent'].tolist() == ['FIRMA DOO']
+    assert len(portfolio_index.query(db_path=db_path)) == 5
+
+
+def test_blockage_within_days(store, tmp_path):
+    db_path = str(tmp_path / 'portfolio.sqlite')
+    today = datetime.now()
+    recent = {'broj': 1, 'u_toku': 0, 'ukupno_dana': 3.0, 'poslednja_od': f"{today - timedelta(days=10):%Y-%m-%d}"}
+    old = {'broj': 1, 'u_toku': 0, 'ukupno_dana': 3.0, 'poslednja_od': f"{today - timedelta(days=400):%Y-%m-%d}"}
+    active = {'broj': 1, 'u_toku': 1, 'ukupno_dana': 3.0, 'poslednja_od': f"{today - timedelta(days=400):%Y-%m-%d}"}
+    clients = {'NEDAVNA': _client('NEDAVNA', '1', recent), 'STARA': _client('STARA', '2', old),
+               'U TOKU': _client('U TOKU', '3', active), 'NBS': _client('NBS', '4', nbs='Da'),
+               'BEZ': _client('BEZ', '5')}
+    for i, (name, client) in enumerate(clients.items()):
+        _save(store, f"2025-01-0{i + 1}_10-00-00", client, name)
+    portfolio_index.backfill(store, db_path)
+
+    def found(days):
+        return set(portfolio_index.query(blockage_within_days=days, db_path=db_path)['klijent'])
+
+    assert found(30) == {'NEDAVNA', 'U TOKU', 'NBS'}
+    assert found(5) == {'U TOKU', 'NBS'}
+    assert found(500) == {'NEDAVNA', 'STARA', 'U TOKU', 'NBS'}
+    assert found(None) == set(clients)
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import portfolio_index
+import portfolio_rescoring
+from artifact_store import ArtifactStore
+from portfolio_rescoring import STATUS_PASS, STATUS_FAIL, load_portfolio, rescore, changed
+
+NOW = datetime(2026, 1, 1)
+
+
+def _portfolio(rows):
+    """rows: (klijent, dts_ocena iz fajla, dts_izracunata, prolazi_prag pri analizi, dts_raw ulazi)."""
+    portfolio = pd.DataFrame([{
+        'klijent': name, 'pib': str(i), 'korisnik': 'ana', 'analizirano': '2025-01-01 10:00:00',
+        'json_name': f'json/{name}.json', 'dts_ocena': sheet, 'dts_izracunata': recorded, 'prolazi_prag': passes,
+    } for i, (name, sheet, recorded, passes, _) in enumerate(rows)])
+    return portfolio, [raw for *_, raw in rows]
+
+
+# (osnivanje, sporovi, blokade, obezbeđenje, likvidnost) -> ocena danas
+FELL_LOW = ('01.01.2010', 0.0, 25.0, 'Menice', 1.2)     # 5, 5, 2, 2, 3 -> 2.65
+FELL = ('01.01.2010', 0.0, 15.0, 'Menice', 1.2)         # 5, 5, 3, 2, 3 -> 3.0
+ROSE = ('01.01.2010', 0.0, 0.0, 'Menice', 1.2)          # 5, 5, 5, 2, 3 -> 3.7
+ROSE_HIGH = ('01.01.2010', 0.0, 0.0, 'Garancija', 3.0)  # 5, 5, 5, 5, 5 -> 5.0
+NO_DATE = (None, 0.0, 0.0, 'Garancija', 3.0)
+
+
+@pytest.fixture
+def scored():
+    portfolio, raw = _portfolio([
+        ('PAO', 3.5, 3.4, 1, FELL),
+        ('BEZ PROMENE', 2.5, 2.0, 0, FELL_LOW),
+        ('PRESAO IZ FAJLA', 2.9, np.nan, None, ROSE_HIGH),
+        ('PAO NISKO', 3.3, 3.3, 1, FELL_LOW),
+        ('PRESAO', 3.0, np.nan, None, ROSE),
+        ('NEPOTPUN', 3.5, 3.6, 1, NO_DATE),
+    ])
+    return rescore(portfolio, raw, NOW)
+
+
+def test_pass_to_fail_against_recorded_score(scored):
+    row = scored.set_index('klijent').loc['PAO']
+    assert (row['prethodni_status'], row['novi_status']) == (STATUS_PASS, STATUS_FAIL)
+    assert (row['dts_pre'], row['dts_sada']) == (3.4, 3.0)
+    assert row['promenjen']
+    assert not scored.set_index('klijent').loc['BEZ PROMENE', 'promenjen']
+
+
+def test_incomplete_recorded_score_falls_back_to_sheet(scored):
+    row = scored.set_index('klijent').loc['PRESAO IZ FAJLA']
+    assert (row['dts_pre'], row['prethodni_status']) == (2.9, STATUS_FAIL)
+    assert (row['dts_sada'], row['novi_status']) == (5.0, STATUS_PASS)
+    # bez datuma osnivanja današnja ocena nije potpuna: status se ne poredi
+    row = scored.set_index('klijent').loc['NEPOTPUN']
+    assert np.isnan(row['dts_sada']) and pd.isna(row['novi_status']) and not row['promenjen']
+
+
+def test_changed_ranks_fallen_clients_first(scored):
+    report = changed(scored)
+    assert report['klijent'].tolist() == ['PAO NISKO', 'PAO', 'PRESAO', 'PRESAO IZ FAJLA']
+    assert report['rang'].tolist() == [1, 2, 3, 4]
+    assert report['pao_ispod_praga'].tolist() == [True, True, False, False]
+    assert report['dts_sada'].tolist() == [2.65, 3.0, 3.7, 5.0]
+
+
+def _client(name, founded, blockage_days):
+    return {
+        'osnovne_informacije': [{'Atribut': 'Naziv', 'Vrednost': name}, {'Atribut': 'Datum osnivanja', 'Vrednost': founded}],
+        'predlogRSD': [{'Atribut': 'Sredstvo obezbeđenja', 'Vrednost RSD': 'Menice'}],
+        'finansijska_analizaEUR': [{'Pozicija': 'Opšti racio likvidnosti', '2024': 1.2}],
+        'zbirni_pregled': {'sudski sporovi': {'ukupan_iznos': 0.0}, 'istorija_blokada': {'ukupno_dana': blockage_days}},
+    }
+
+
+def test_run_scores_latest_analysis_of_each_client(tmp_path):
+    store = ArtifactStore(str(tmp_path / 'output'), dirs=('json', 'komentari'))
+    db_path = str(tmp_path / 'portfolio.sqlite')
+    analyses = [('2024-06-01_10-00-00', 'FIRMA DOO', '01.01.2010', 0.0),
+                ('2025-06-01_10-00-00', 'FIRMA DOO', '01.01.2010', 15.0),
+                ('2025-06-01_11-00-00', 'NOVA DOO', '01.10.2024', 0.0)]
+    for timestamp, name, founded, days in analyses:
+        store.write_json(f"json/{timestamp}_ana_{name}_data_for_ai.json", _client(name, founded, days))
+    portfolio_index.backfill(store, db_path)
+
+    portfolio, raw = load_portfolio(store, db_path)
+    assert portfolio['klijent'].tolist() == ['NOVA DOO', 'FIRMA DOO'] and len(raw) == 2
+    assert portfolio['analizirano'].tolist() == ['2025-06-01 11:00:00', '2025-06-01 10:00:00']
+
+    # NOVA DOO: 8 meseci pri analizi (3.55 -> prolazi), 15 meseci danas (3.6); FIRMA DOO: 3.0 i pre i sada
+    report = portfolio_rescoring.run(store, str(tmp_path / 'dts.csv'), NOW, db_path)
+    assert report.empty
+    assert pd.read_csv(tmp_path / 'dts.csv').empty
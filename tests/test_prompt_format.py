@@ -0,0 +1,47 @@
+import io
+import re
+import contextlib
+
+import pytest
+
+from excel_processor import to_JSON
+from prompt_format import compact, expand, strip_nulls, find_field
+from prompts import STATIC_INSTRUCTIONS, REFERENCED_FIELDS
+from risk_metrics import find_value, find_key
+from benchmarks.workbook_generator import make_workbook
+
+
+@pytest.fixture(scope='module')
+def client_json(tmp_path_factory):
+    path = make_workbook(str(tmp_path_factory.mktemp('sveska') / 'sveska.xlsm'), seed=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return to_JSON(path)
+
+
+def _original_value(data, sections, needles):
+    for section in sections:
+        rows = data.get(section) or []
+        value = find_key(rows[0], *needles) if rows else None
+        if value is None:
+            value = find_value(rows, *needles)
+        if value is not None:
+            return value
+    return None
+
+
+def test_compact_round_trip(client_json):
+    assert expand(compact(client_json)) == strip_nulls(client_json)
+
+
+@pytest.mark.parametrize('label', list(REFERENCED_FIELDS))
+def test_referenced_fields_are_reachable_after_compact(client_json, label):
+    sections, needles = REFERENCED_FIELDS[label]
+    value = find_field(compact(client_json), sections, needles)
+    assert value is not None
+    assert value == _original_value(client_json, sections, needles)
+    # uputstva navode stavku po nazivu
+    assert label in STATIC_INSTRUCTIONS
+
+
+def test_instructions_have_no_positional_references():
+    assert not re.search(r"\[\s*\d+\s*\]", STATIC_INSTRUCTIONS)
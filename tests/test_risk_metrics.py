@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_metrics import DTS_THRESHOLD, dts_raw, dts_frame, dts_inputs, score_components, compute_risk_metrics
+
+NOW = datetime(2026, 1, 1)
+
+
+def _inputs(age_months=100.0, litigation_amount=0.0, blockage_days=0.0, collateral_score=5.0, liquidity=3.0):
+    return pd.DataFrame([{'age_months': age_months, 'litigation_amount': litigation_amount,
+                          'blockage_days': blockage_days, 'collateral_score': collateral_score, 'liquidity': liquidity}])
+
+
+@pytest.mark.parametrize('component, column, value, expected', [
+    ('osnivanje', 'age_months', 2.99, 1), ('osnivanje', 'age_months', 3, 2), ('osnivanje', 'age_months', 11.99, 2),
+    ('osnivanje', 'age_months', 12, 3), ('osnivanje', 'age_months', 24, 4), ('osnivanje', 'age_months', 59.9, 4),
+    ('osnivanje', 'age_months', 60, 5),
+    ('sporovi', 'litigation_amount', 100_000.01, 1), ('sporovi', 'litigation_amount', 100_000, 2),
+    ('sporovi', 'litigation_amount', 50_000, 2), ('sporovi', 'litigation_amount', 49_999, 3),
+    ('sporovi', 'litigation_amount', 10_000, 3), ('sporovi', 'litigation_amount', 9_999, 4),
+    ('sporovi', 'litigation_amount', 0, 5),
+    ('blokade', 'blockage_days', 31, 1), ('blokade', 'blockage_days', 30, 2), ('blokade', 'blockage_days', 20, 2),
+    ('blokade', 'blockage_days', 19, 3), ('blokade', 'blockage_days', 10, 3), ('blokade', 'blockage_days', 9, 4),
+    ('blokade', 'blockage_days', 0, 5),
+    ('likvidnost', 'liquidity', -0.01, 1), ('likvidnost', 'liquidity', 0, 2), ('likvidnost', 'liquidity', 1, 2),
+    ('likvidnost', 'liquidity', 1.5, 3), ('likvidnost', 'liquidity', 2, 4), ('likvidnost', 'liquidity', 2.01, 5),
+])
+def test_component_band_edges(component, column, value, expected):
+    assert score_components(_inputs(**{column: value}))[component].iloc[0] == expected
+
+
+def test_threshold_is_inclusive():
+    # 3*0.05 + 5*0.10 + 3*0.35 + 3*0.30 + 3*0.20 = 3.2
+    at_threshold = _inputs(age_months=18, litigation_amount=0, blockage_days=15, collateral_score=3, liquidity=1.2)
+    below = _inputs(age_months=6, litigation_amount=0, blockage_days=15, collateral_score=3, liquidity=1.2)
+    scores = score_components(pd.concat([at_threshold, below], ignore_index=True))
+    assert scores['dts_ocena'].tolist() == [DTS_THRESHOLD, 3.15]
+    assert scores['prolazi_prag'].tolist() == [True, False]
+
+
+def test_missing_component_gives_no_score():
+    scores = score_components(_inputs(collateral_score=np.nan))
+    assert not scores['potpuno'].iloc[0]
+    assert np.isnan(scores['dts_ocena'].iloc[0]) and scores['prolazi_prag'].iloc[0] is None
+
+
+def _client(founded, collateral='Avalirane menice', liquidity=1.2):
+    return {
+        'osnovne_informacije': [{'Atribut': 'Datum osnivanja', 'Vrednost': founded}],
+        'predlogRSD': [{'Atribut': 'Sredstvo obezbeđenja', 'Vrednost RSD': collateral}],
+        'finansijska_analizaEUR': [{'Pozicija': 'Opšti racio likvidnosti', '2023': 0.8, '2024': liquidity}],
+        'zbirni_pregled': {'sudski sporovi': {'ukupan_iznos': 20_000.0}, 'istorija_blokada': {'ukupno_dana': 0.0}},
+    }
+
+
+@pytest.mark.parametrize('founded, expected', [
+    ('05.03.2010', datetime(2010, 3, 5)),
+    ('05.03.2010.', datetime(2010, 3, 5)),
+    ('13.03.2010', datetime(2010, 3, 13)),
+    ('2010-03-05 00:00:00', datetime(2010, 3, 5)),
+    (datetime(2010, 3, 5), datetime(2010, 3, 5)),
+])
+def test_founded_date_is_read_day_first(founded, expected):
+    frame = dts_frame([dts_raw(_client(founded))], NOW)
+    assert frame['age_months'].iloc[0] == pytest.approx((NOW - expected).days / 30.44)
+
+
+def test_age_band_from_serbian_date():
+    # 01.02.2025 je 1. februar (11 meseci -> 2), 02.01.2025 je 2. januar (12 meseci -> 3);
+    # čitani mesec-pa-dan bi zamenili ocene
+    now = datetime(2026, 1, 10)
+    assert score_components(dts_inputs(_client('01.02.2025'), now))['osnivanje'].iloc[0] == 2
+    assert score_components(dts_inputs(_client('02.01.2025'), now))['osnivanje'].iloc[0] == 3
+
+
+def test_raw_to_score_end_to_end():
+    # osnivanje 5, sporovi 3, blokade 5, obezbeđenje 4 (avalirane menice), likvidnost 3
+    metrics = compute_risk_metrics(_client('05.03.2010'), now=NOW)['dts']
+    assert metrics['komponente'] == {'osnivanje': 5, 'sporovi': 3, 'blokade': 5, 'obezbedjenje': 4, 'likvidnost': 3}
+    assert metrics['ocena'] == 4.1 and metrics['prolazi_prag'] is True
+
+    frame = dts_frame([dts_raw(_client('05.03.2010')), dts_raw(_client('05.03.2010', collateral='Nema', liquidity=-1))], NOW)
+    scores = score_components(frame)
+    assert scores['dts_ocena'].tolist() == [4.1, 2.8]
+    assert scores['prolazi_prag'].tolist() == [True, False]
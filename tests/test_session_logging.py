@@ -0,0 +1,100 @@
+import os
+import logging
+
+import pytest
+
+import session_logging
+from session_logging import SessionLogRouter, LOGGER_PREFIX
+
+
+@pytest.fixture
+def sessions(monkeypatch, tmp_path):
+    count = session_logging.MAX_OPEN_FILES + 2
+    paths = {f"{LOGGER_PREFIX}sesija{i}": str(tmp_path / f"sesija{i}.log") for i in range(count)}
+    monkeypatch.setattr(session_logging, '_paths', dict(paths))
+    monkeypatch.setattr(session_logging, '_segments', [])
+    router = SessionLogRouter(max_open=session_logging.MAX_OPEN_FILES, idle_seconds=60)
+    yield router, list(paths), paths
+    router.close()
+
+
+def _log(router, name, message):
+    router.emit(logging.makeLogRecord({'name': name, 'levelno': logging.INFO, 'levelname': 'INFO', 'msg': message}))
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_more_sessions_than_open_files_closes_least_recently_used(sessions):
+    router, names, paths = sessions
+    limit = session_logging.MAX_OPEN_FILES
+    handlers = {}
+    for name in names[:limit]:
+        _log(router, name, "start")
+        handlers[name] = router.open_files[name][0]
+    # prva sesija je ponovo korišćena: izbacuju se druga, pa treća
+    _log(router, names[0], "opet")
+    for name in names[limit:]:
+        _log(router, name, "start")
+        handlers[name] = router.open_files[name][0]
+
+    assert len(router.open_files) == limit
+    assert names[1] not in router.open_files and names[2] not in router.open_files
+    assert handlers[names[1]].stream is None and handlers[names[2]].stream is None
+    assert all(handlers[name].stream is not None for name in router.open_files)
+    assert list(router.open_files)[-3:] == [names[0]] + names[limit:]
+
+    # zatvorena sesija se ponovo otvara i nastavlja isti fajl
+    _log(router, names[1], "nastavak")
+    assert names[1] in router.open_files and len(router.open_files) == limit
+    assert [line.rsplit(' - ', 1)[-1] for line in _read(paths[names[1]]).splitlines()] == ['start', 'nastavak']
+
+
+def test_close_idle_closes_only_idle_handlers(sessions, monkeypatch):
+    router, names, _ = sessions
+    clock = [1000.0]
+    monkeypatch.setattr(session_logging.time, 'monotonic', lambda: clock[0])
+    _log(router, names[0], "stara")
+    clock[0] += 30
+    _log(router, names[1], "nova")
+    idle = router.open_files[names[0]][0]
+    clock[0] += 40
+
+    router.emit(logging.makeLogRecord({'name': LOGGER_PREFIX.rstrip('.'), 'msg': '', 'session_log_command': 'close_idle'}))
+
+    assert list(router.open_files) == [names[1]]
+    assert idle.stream is None
+
+
+def test_rotated_segments_are_enqueued_and_removed(sessions, monkeypatch, tmp_path):
+    router, names, paths = sessions
+    enqueued = []
+
+    def enqueue(path, folder_id):
+        enqueued.append((os.path.basename(path), folder_id, _read(path)))
+        return f"id-{len(enqueued)}"
+
+    monkeypatch.setattr(session_logging.upload_outbox, 'enqueue', enqueue)
+    segments = [str(tmp_path / f"segment{i}.log") for i in range(3)]
+    for i, name in enumerate(names[:2]):
+        _log(router, name, f"analiza {i}")
+        handler = router.open_files[name][0]
+        router.emit(logging.makeLogRecord({'name': name, 'msg': '', 'session_log_command': 'rotate',
+                                           'segment_path': segments[i], 'folder_id': 'folder-1'}))
+        assert handler.stream is None and name not in router.open_files
+        assert not os.path.exists(paths[name])
+    # sesija bez log fajla nema segment
+    router.emit(logging.makeLogRecord({'name': names[2], 'msg': '', 'session_log_command': 'rotate',
+                                       'segment_path': segments[2], 'folder_id': 'folder-1'}))
+    _log(router, names[0], "posle rotacije")
+
+    assert session_logging.ship_segments() == 2
+    assert [(name, folder) for name, folder, _ in enqueued] == [('segment0.log', 'folder-1'), ('segment1.log', 'folder-1')]
+    assert 'analiza 0' in enqueued[0][2] and 'analiza 1' in enqueued[1][2]
+    assert not any(os.path.exists(path) for path in segments)
+    assert session_logging._segments == []
+    assert session_logging.ship_segments() == 0
+    # log sesije se nastavlja u novom fajlu
+    assert _read(paths[names[0]]).strip().endswith('posle rotacije') and 'analiza 0' not in _read(paths[names[0]])
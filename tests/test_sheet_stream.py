@@ -0,0 +1,53 @@
+import pytest
+
+from sheet_stream import summarize_disputes, summarize_related, _status
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Aktivan', 'aktivan'),
+    ('U toku', 'aktivan'),
+    ('Otvoren', 'aktivan'),
+    ('Neaktivan', 'zatvoren'),
+    ('NEAKTIVAN', 'zatvoren'),
+    ('Nije aktivan', 'zatvoren'),
+    ('Nije u toku', 'zatvoren'),
+    ('Pravosnažno okončan', 'zatvoren'),
+    ('Brisan', 'zatvoren'),
+    ('Nezatvoren', None),
+    ('', None),
+])
+def test_status_checks_negative_forms_first(text, expected):
+    assert _status(text) == expected
+
+
+def test_inactive_disputes_are_not_counted_as_active():
+    rows = [
+        {'Tužilac': 'A', 'Status': 'Aktivan', 'Iznos': 100},
+        {'Tužilac': 'B', 'Status': 'Neaktivan', 'Iznos': 5000},
+        {'Tužilac': 'C', 'Status': 'Nije u toku', 'Iznos': 700},
+    ]
+    _, top, summary = summarize_disputes(rows, top_n=1)
+    assert summary['aktivnih'] == 1
+    assert summary['aktivni_iznos'] == 100
+    assert summary['zatvorenih'] == 2
+    assert top == [rows[0]]
+
+
+def test_related_blockade_status_is_negation_aware():
+    statuses = ['U blokadi', 'Nije u blokadi', 'Blokada ukinuta', 'Nema blokade', 'Bez blokade', 'Račun blokiran', 'Aktivan']
+    rows = [{'Naziv': f'PL {i}', 'Status APR': 'Aktivno', 'Status NBS': status} for i, status in enumerate(statuses)]
+    _, _, summary = summarize_related(rows)
+    assert summary['u_blokadi'] == 2
+    assert summary['rizicna_lica'] == ['PL 0', 'PL 5']
+
+
+def test_related_apr_status_matches_whole_words():
+    rows = [
+        {'Naziv': 'A', 'Status APR': 'Neaktivan', 'Status NBS': ''},
+        {'Naziv': 'B', 'Status APR': 'U stečaju', 'Status NBS': ''},
+        {'Naziv': 'C', 'Status APR': 'Nije u stečaju', 'Status NBS': ''},
+    ]
+    _, _, summary = summarize_related(rows)
+    assert summary['neaktivnih'] == 1
+    assert summary['u_stecaju_ili_likvidaciji'] == 1
+    assert summary['rizicna_lica'] == ['B']
@@ -0,0 +1,87 @@
+import os
+import logging
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import google_drive_utils
+import upload_outbox
+from fake_drive import FakeDrive
+
+FOLDER = 'folder-1'
+logger = logging.getLogger('test.outbox')
+
+
+@pytest.fixture
+def drive(monkeypatch, tmp_path):
+    drive = FakeDrive()
+    monkeypatch.setattr(google_drive_utils, '_service', None)
+    monkeypatch.setattr(google_drive_utils, '_authorized_http', lambda creds: drive)
+    monkeypatch.setattr(google_drive_utils, '_folder_cache', {})
+    monkeypatch.setattr(upload_outbox, 'google_drive_auth', lambda logger: Credentials(token='test-token'))
+    monkeypatch.setattr(upload_outbox, 'OUTBOX_DIR', str(tmp_path / 'outbox'))
+    monkeypatch.setattr(upload_outbox, 'METRICS_PATH', str(tmp_path / 'logs' / 'outbox.metrics.jsonl'))
+    monkeypatch.setattr(upload_outbox, '_schedule', {})
+    monkeypatch.setattr(upload_outbox, '_in_memory', {})
+    monkeypatch.setattr(upload_outbox, '_last_scan', None)
+    return drive
+
+
+def _make_due(entry_id):
+    # preskače čekanje između pokušaja
+    upload_outbox._schedule[entry_id] = 0
+
+
+def test_entry_is_retried_with_backoff_and_shipped(drive):
+    entry_id = upload_outbox.enqueue_data('KLIJENT.json', b'{"a": 1}', FOLDER)
+    drive.fail_list = 1
+    drive.fail_create = 1
+
+    assert upload_outbox.ship_once(logger) == 0
+    entry, = upload_outbox.status([entry_id])
+    assert entry['status'] == 'pending' and entry['attempts'] == 1
+    assert entry['next_attempt'] > upload_outbox.time.time() + upload_outbox.RETRY_BASE_SECONDS * 0.5
+    # zapis koji čeka se ne šalje (ni ne čita) pre svog vremena
+    assert upload_outbox.ship_once(logger) == 0
+    assert upload_outbox.status([entry_id])[0]['attempts'] == 1
+
+    _make_due(entry_id)
+    assert upload_outbox.ship_once(logger) == 1
+    entry, = upload_outbox.status([entry_id])
+    assert entry['status'] == 'done' and entry['drive_id'] == drive.files[-1]['id']
+    assert drive.created == ['KLIJENT.json']
+    assert entry_id not in upload_outbox._schedule
+
+
+def test_entry_moves_to_failed_after_max_attempts(drive, monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(upload_outbox, 'MAX_ATTEMPTS', 3)
+    source = tmp_path / 'komentar.txt'
+    source.write_text('AI komentar', encoding='utf-8')
+    entry_id = upload_outbox.enqueue(str(source), FOLDER)
+    drive.fail_list = 100
+    drive.fail_create = 100
+
+    with caplog.at_level(logging.ERROR, logger='test.outbox'):
+        for _ in range(5):
+            _make_due(entry_id)
+            upload_outbox.ship_once(logger)
+
+    entry, = upload_outbox.status([entry_id])
+    assert entry['status'] == 'failed' and entry['attempts'] == 3
+    outbox = upload_outbox.OUTBOX_DIR
+    assert not os.path.exists(os.path.join(outbox, f'{entry_id}.json'))
+    assert os.path.exists(os.path.join(outbox, 'failed', f'{entry_id}.json'))
+    assert os.path.exists(os.path.join(outbox, 'failed', entry_id, 'komentar.txt'))
+    assert entry_id not in upload_outbox._schedule
+    assert 'odustao posle 3 pokušaja' in caplog.text
+
+
+def test_pending_entries_are_picked_up_after_restart(drive):
+    entry_id = upload_outbox.enqueue_data('KLIJENT.json', b'{"b": 2}', FOLDER)
+    # novi proces: raspored i sadržaj iz memorije ne postoje, red se čita sa diska
+    upload_outbox._schedule.clear()
+    upload_outbox._in_memory.clear()
+    upload_outbox._last_scan = None
+
+    assert upload_outbox.ship_once(logger) == 1
+    assert upload_outbox.status([entry_id])[0]['status'] == 'done'
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import logging
+import threading
+from collections import defaultdict
+
+import analysis_metrics
+from google_drive_utils import google_drive_auth, upload_drive_many
+
+# Svi upload-i na Google Drive idu kroz red na disku: analiza samo upiše fajl u red,
+# a pozadinska nit ga šalje i ponavlja pokušaje. Red preživljava restart procesa.
+OUTBOX_DIR = os.path.join("output", "outbox")
+SHIP_INTERVAL_SECONDS = 5
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 15 * 60
+# posle ovoliko neuspelih pokušaja zapis se premešta u output/outbox/failed i više se ne šalje
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+FAILED_DIR_NAME = "failed"
+# raspored slanja se drži u memoriji; ceo red se ponovo čita sa diska samo ovako retko
+# (zapisi iz drugih procesa, brisanje starih završenih zapisa)
+RESCAN_SECONDS = 15 * 60
+# završeni zapisi se čuvaju radi prikaza statusa, pa se brišu
+DONE_RETENTION_SECONDS = 24 * 3600
+# trajanje slanja na Drive ide među metrike faza (pregled u admin delu aplikacije)
+METRICS_PATH = os.path.join("output", "logs", analysis_metrics.OUTBOX_METRICS_NAME)
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_shipper = None
+# sadržaj fajlova dodatih iz memorije (enqueue_data): prvi pokušaj slanja ne čita disk;
+# posle neuspeha ili restarta koristi se kopija na disku
+_in_memory = {}
+# ID zapisa -> vreme sledećeg pokušaja (time.time()) za zapise koji čekaju slanje
+_schedule = {}
+_last_scan = None
+
+
+def _get_logger():
+    logger = logging.getLogger("FinAiApp.outbox")
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+def _entry_path(entry_id):
+    return os.path.join(OUTBOX_DIR, f"{entry_id}.json")
+
+
+def _failed_path(entry_id):
+    return os.path.join(OUTBOX_DIR, FAILED_DIR_NAME, f"{entry_id}.json")
+
+
+def _data_path(entry):
+    # fajl se čuva pod originalnim imenom jer se tako i uploaduje
+    return os.path.join(OUTBOX_DIR, entry['id'], entry['name'])
+
+
+def _write_entry(entry):
+    path = _entry_path(entry['id'])
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_entry(entry_id, include_failed=False):
+    paths = [_entry_path(entry_id), _failed_path(entry_id)] if include_failed else [_entry_path(entry_id)]
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def enqueue(file_path, folder_id):
+    """Kopira fajl u red za upload i vraća ID zapisa; original se posle može obrisati."""
+    entry_id = uuid.uuid4().hex[:12]
+    name = os.path.basename(file_path)
+    data_path = _data_path({'id': entry_id, 'name': name})
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    try:
+        # hard link ne kopira sadržaj; ako nije moguć (drugi disk), pravi se kopija
+        os.link(file_path, data_path)
+    except OSError:
+        shutil.copyfile(file_path, data_path)
+    return _add_entry(entry_id, name, folder_id)
+
+
+def _add_entry(entry_id, name, folder_id):
+    _write_entry({
+        'id': entry_id,
+        'name': name,
+        'folder_id': folder_id,
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt': 0,
+        'drive_id': None,
+        'error': None,
+        'created': time.time(),
+        'finished': None,
+    })
+    with _lock:
+        _schedule[entry_id] = 0
+    _wake.set()
+    return entry_id
+
+
+def enqueue_data(name, data, folder_id):
+    """Kao enqueue, ali za sadržaj koji je već u memoriji (npr. fajl iz st.file_uploader).
+    Na disk se upisuje jednom, samo radi trajnosti reda."""
+    entry_id = uuid.uuid4().hex[:12]
+    name = os.path.basename(name)
+    data_path = _data_path({'id': entry_id, 'name': name})
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    with open(data_path, 'wb') as f:
+        f.write(data)
+    with _lock:
+        _in_memory[entry_id] = data
+    return _add_entry(entry_id, name, folder_id)
+
+
+def status(entry_ids):
+    """Stanje zapisa ('pending', 'done', 'failed'); nepoznat ID se vraća kao 'failed'."""
+    result = []
+    for entry_id in entry_ids:
+        entry = _read_entry(entry_id, include_failed=True)
+        if entry is None:
+            entry = {'id': entry_id, 'name': '', 'status': 'failed', 'attempts': 0, 'error': "Zapis ne postoji u redu za upload."}
+        result.append(entry)
+    return result
+
+
+def _scan(now):
+    """Čita ceo red sa diska: briše stare završene zapise i puni raspored slanja."""
+    global _last_scan
+    schedule = {}
+    if os.path.isdir(OUTBOX_DIR):
+        for name in os.listdir(OUTBOX_DIR):
+            if not name.endswith('.json'):
+                continue
+            entry = _read_entry(name[:-len('.json')])
+            if entry is None:
+                continue
+            if entry['status'] == 'done' and now - entry['finished'] > DONE_RETENTION_SECONDS:
+                try:
+                    os.remove(_entry_path(entry['id']))
+                except OSError:
+                    pass
+            elif entry['status'] == 'pending':
+                schedule[entry['id']] = entry['next_attempt']
+    with _lock:
+        _schedule.clear()
+        _schedule.update(schedule)
+        _last_scan = now
+
+
+def _pending_entries():
+    now = time.time()
+    if _last_scan is None or now - _last_scan >= RESCAN_SECONDS:
+        _scan(now)
+    with _lock:
+        due = [entry_id for entry_id, next_attempt in _schedule.items() if next_attempt <= now]
+    entries = []
+    for entry_id in due:
+        entry = _read_entry(entry_id)
+        if entry is None or entry['status'] != 'pending':
+            with _lock:
+                _schedule.pop(entry_id, None)
+            continue
+        entries.append(entry)
+    return entries
+
+
+def _next_wait():
+    """Koliko shipper može da spava: do prvog zapisa kome dolazi red, najviše do ponovnog čitanja reda."""
+    now = time.time()
+    with _lock:
+        next_attempt = min(_schedule.values(), default=None)
+        last_scan = _last_scan
+    wait = RESCAN_SECONDS - (now - last_scan) if last_scan is not None else 0
+    if next_attempt is not None:
+        wait = min(wait, next_attempt - now)
+    return max(wait, SHIP_INTERVAL_SECONDS)
+
+
+def _fail(entry, error, logger):
+    """Zapis bez daljih pokušaja: premešta se (sa fajlom) u output/outbox/failed."""
+    entry.update(status='failed', error=error, finished=time.time())
+    with _lock:
+        _schedule.pop(entry['id'], None)
+        _in_memory.pop(entry['id'], None)
+    failed_dir = os.path.dirname(_failed_path(entry['id']))
+    os.makedirs(failed_dir, exist_ok=True)
+    data_dir = os.path.dirname(_data_path(entry))
+    if os.path.isdir(data_dir):
+        shutil.move(data_dir, os.path.join(failed_dir, entry['id']))
+    _write_entry(entry)
+    os.replace(_entry_path(entry['id']), _failed_path(entry['id']))
+    logger.error(f"Upload '{entry['name']}' je odustao posle {entry['attempts']} pokušaja ({error}); "
+                 f"zapis je premešten u {failed_dir}.")
+
+
+def ship_once(logger=None):
+    """Šalje sve zapise kojima je došao red; vraća broj uspešno uploadovanih."""
+    logger = logger or _get_logger()
+    entries = _pending_entries()
+    if not entries:
+        return 0
+
+    for entry in entries:
+        if not os.path.exists(_data_path(entry)):
+            _fail(entry, "Fajl za upload više ne postoji.", logger)
+    entries = [e for e in entries if e['status'] == 'pending']
+
+    creds = google_drive_auth(logger)
+    by_folder = defaultdict(list)
+    for entry in entries:
+        by_folder[entry['folder_id']].append(entry)
+
+    shipped = 0
+    for folder_id, folder_entries in by_folder.items():
+        paths = [_data_path(entry) for entry in folder_entries]
+        with _lock:
+            in_memory = {path: _in_memory.pop(entry['id']) for path, entry in zip(paths, folder_entries)
+                         if entry['id'] in _in_memory}
+        started = time.perf_counter()
+        uploaded = upload_drive_many(paths, creds, folder_id, logger, data=in_memory) if creds else {}
+        _record_metrics(time.perf_counter() - started, paths, uploaded, logger)
+
+        for data_path, entry in zip(paths, folder_entries):
+            drive_id = uploaded.get(data_path)
+            if drive_id:
+                entry.update(status='done', drive_id=drive_id, error=None, finished=time.time())
+                _write_entry(entry)
+                with _lock:
+                    _schedule.pop(entry['id'], None)
+                shutil.rmtree(os.path.dirname(data_path), ignore_errors=True)
+                shipped += 1
+                continue
+            entry['attempts'] += 1
+            error = "Upload nije uspeo." if creds else "Autentifikacija za Google Drive nije uspela."
+            if entry['attempts'] >= MAX_ATTEMPTS:
+                _fail(entry, error, logger)
+                continue
+            # eksponencijalno čekanje po zapisu; jitter da se zapisi iz istog neuspeha ne šalju opet zajedno
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (entry['attempts'] - 1))
+            delay *= random.uniform(0.8, 1.2)
+            entry.update(next_attempt=time.time() + delay, error=error)
+            _write_entry(entry)
+            with _lock:
+                _schedule[entry['id']] = entry['next_attempt']
+            logger.warning(f"Upload '{entry['name']}' nije uspeo (pokušaj {entry['attempts']}), novi pokušaj za {delay:.0f} s.")
+    return shipped
+
+
+def _record_metrics(duration_s, paths, uploaded, logger):
+    try:
+        os.makedirs(os.path.dirname(METRICS_PATH), exist_ok=True)
+        analysis_metrics.write(METRICS_PATH, {
+            'ts': time.time(),
+            'analysis': None,
+            'stage': 'drive_upload',
+            'ms': round(duration_s * 1000, 1),
+            'files': len(paths),
+            'uploaded': sum(1 for p in paths if uploaded.get(p)),
+            'bytes': sum(os.path.getsize(p) for p in paths if os.path.exists(p)),
+        })
+    except OSError as e:
+        logger.warning(f"Metrika slanja na Drive nije upisana: {e}")
+
+
+def _ship_forever():
+    logger = _get_logger()
+    while True:
+        try:
+            ship_once(logger)
+        except Exception as e:
+            logger.error(f"Greška u slanju reda za upload: {e}")
+        _wake.wait(_next_wait())
+        _wake.clear()
+
+
+def start_shipper():
+    """Pokreće pozadinsku nit za slanje (jednom po procesu); zaostali zapisi iz
+    prethodnog pokretanja se šalju odmah."""
+    global _shipper
+    with _lock:
+        if _shipper is None or not _shipper.is_alive():
+            _shipper = threading.Thread(target=_ship_forever, name="fin-app-outbox", daemon=True)
+            _shipper.start()
+    return _shipper